@@ -5,5 +5,8 @@ class BaseChunker:
     def chunk(self, *args, **kwargs):
         raise NotImplementedError("chunk method must be implemented")
 
+    def chunk_many(self, input_strings):
+        return [self.chunk(s) for s in input_strings]
+
     def __call__(self, *args, **kwargs):
         return self.chunk(*args, **kwargs)
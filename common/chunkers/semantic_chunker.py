@@ -1,42 +1,132 @@
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
 from common.chunkers.base_chunker import BaseChunker
 from common.embeddings.embedding_services import EmbeddingModel
-from langchain_experimental.text_splitter import (
-    SemanticChunker as LangChainSemanticChunker,
-)
 
 
 class SemanticChunker(BaseChunker):
+    """SemanticChunker.
+    Splits text into sentences and starts a new chunk wherever the embedding of a
+    sentence (with `buffer_size` neighbours on each side) moves far enough away from
+    the next one. Sentences from every input document are embedded together, in
+    batches of `batch_size`, through the embedding service (and its cache).
+    """
+
     def __init__(
         self,
         embedding_serivce: EmbeddingModel,
         breakpoint_threshold_type: str = "percentile",
         breakpoint_threshold_amount: float = 0.95,
+        buffer_size: int = 1,
+        sentence_split_regex: str = r"(?<=[.?!])\s+",
+        batch_size: int = 256,
     ):
+        if breakpoint_threshold_type not in (
+            "percentile",
+            "standard_deviation",
+            "interquartile",
+            "gradient",
+        ):
+            raise ValueError(
+                f"Got unexpected `breakpoint_threshold_type`: {breakpoint_threshold_type}"
+            )
         self.emb_model = embedding_serivce
         self.btt = breakpoint_threshold_type
         self.bta = breakpoint_threshold_amount
+        self.buffer_size = buffer_size
+        self.sentence_split = re.compile(sentence_split_regex)
+        self.batch_size = batch_size
 
-    def chunk(self, input_string):
-        text_splitter = LangChainSemanticChunker(
-            self.emb_model.embeddings,
-            breakpoint_threshold_type=self.btt,
-            breakpoint_threshold_amount=self.bta,
-        )
+    def _combine(self, sentences: List[str]) -> List[str]:
+        # each sentence with its `buffer_size` neighbours on either side
+        b = self.buffer_size
+        return [
+            " ".join(sentences[max(i - b, 0) : i + b + 1])
+            for i in range(len(sentences))
+        ]
 
-        chunks = text_splitter.create_documents([input_string])
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self.emb_model.embed_documents(texts[i : i + self.batch_size]))
+        return np.asarray(vectors, dtype=np.float32)
 
-        return [x.page_content for x in chunks]
+    def _breakpoints(self, distances: np.ndarray) -> np.ndarray:
+        if self.btt == "percentile":
+            arr = distances
+            threshold = np.percentile(distances, self.bta)
+        elif self.btt == "standard_deviation":
+            arr = distances
+            threshold = np.mean(distances) + self.bta * np.std(distances)
+        elif self.btt == "interquartile":
+            arr = distances
+            q1, q3 = np.percentile(distances, [25, 75])
+            threshold = np.mean(distances) + self.bta * (q3 - q1)
+        else:
+            arr = np.gradient(distances) if len(distances) > 1 else np.zeros_like(distances)
+            threshold = np.percentile(arr, self.bta)
+        return np.flatnonzero(arr > threshold)
 
-    def split_documents(self, input_docs, ):
-        text_splitter = LangChainSemanticChunker(
-            self.emb_model.embeddings,
-            breakpoint_threshold_type=self.btt,
-            breakpoint_threshold_amount=self.bta,
-        )
+    def chunk_many(self, input_strings: List[str]) -> List[List[str]]:
+        """Chunk Many.
+        Chunk several documents, embedding all of their sentences together.
+
+        Args:
+            input_strings (List[str]):
+                The documents to chunk.
+        Returns:
+            The chunks of each document, in the same order as input_strings.
+        """
+        doc_sentences = [self.sentence_split.split(s) for s in input_strings]
+
+        # a document with a single sentence is a single chunk, no need to embed it
+        to_embed = [i for i, s in enumerate(doc_sentences) if len(s) > 1]
+        combined = []
+        for i in to_embed:
+            combined.extend(self._combine(doc_sentences[i]))
+        if len(combined) == 0:
+            return doc_sentences
 
-        chunks = text_splitter.split_documents(input_docs)
+        embeddings = self._embed(combined)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        embeddings /= norms
 
-        return chunks
+        results = list(doc_sentences)
+        offset = 0
+        for i in to_embed:
+            sentences = doc_sentences[i]
+            e = embeddings[offset : offset + len(sentences)]
+            offset += len(sentences)
+
+            # cosine distance between each sentence and the next
+            distances = 1 - np.einsum("ij,ij->i", e[:-1], e[1:])
+            chunks = []
+            start = 0
+            for end in self._breakpoints(distances):
+                chunks.append(" ".join(sentences[start : end + 1]))
+                start = end + 1
+            if start < len(sentences):
+                chunks.append(" ".join(sentences[start:]))
+            results[i] = chunks
+
+        return results
+
+    def chunk(self, input_string):
+        return self.chunk_many([input_string])[0]
+
+    def split_documents(self, input_docs, ):
+        input_docs = list(input_docs)
+        chunks = self.chunk_many([doc.page_content for doc in input_docs])
+        return [
+            Document(page_content=chunk, metadata=dict(doc.metadata))
+            for doc, doc_chunks in zip(input_docs, chunks)
+            for chunk in doc_chunks
+        ]
 
     def __call__(self, input_string):
         return self.chunk(input_string)
@@ -5,13 +5,16 @@ from fastapi.security import HTTPBasic
 from pymilvus.exceptions import MilvusException
 from pyTigerGraph import TigerGraphConnection
 
+from common.db.schema_cache import schema_cache
+from common.embeddings.embedding_cache import EmbeddingCache, QueryEmbeddingCache
 from common.embeddings.embedding_services import (
     AWS_Bedrock_Embedding,
     AzureOpenAI_Ada002,
     OpenAI_Embedding,
     VertexAI_PaLM_Embedding,
 )
-from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+from common.embeddings.local_embedding_store import LocalEmbeddingStore
+from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore, index_options
 from common.embeddings.tigergraph_embedding_store import TigerGraphEmbeddingStore
 from common.llm_services import (
     AWS_SageMaker_Endpoint,
@@ -79,6 +82,9 @@ else:
         db_config = json.load(f)
 
 embedding_store_type = db_config.get("embedding_store", "tigergraph")
+# the InquiryAI function document index can be kept in-process ("local") instead
+inquiry_embedding_store_type = db_config.get("inquiry_embedding_store", embedding_store_type)
+local_embedding_store_config = db_config.get("local_embedding_store", {})
 reuse_embedding = db_config.get("reuse_embedding", True)
 
 if MILVUS_CONFIG is None or (
@@ -114,6 +120,26 @@ elif llm_config["embedding_service"]["embedding_model_service"].lower() == "bedr
 else:
     raise Exception("Embedding service not implemented")
 
+embedding_cache_config = db_config.get("embedding_cache", {})
+if embedding_cache_config.get("enabled", False):
+    embedding_service.set_cache(
+        EmbeddingCache(
+            path=embedding_cache_config.get("path", "embedding_cache.db"),
+            max_entries=embedding_cache_config.get("max_entries", 100_000),
+        )
+    )
+
+query_embedding_cache_config = db_config.get("query_embedding_cache", {})
+if query_embedding_cache_config.get("enabled", True):
+    embedding_service.set_query_cache(
+        QueryEmbeddingCache(
+            max_entries=query_embedding_cache_config.get("max_entries", 1024),
+            ttl_seconds=query_embedding_cache_config.get("ttl_seconds", 3600),
+        )
+    )
+
+schema_cache.ttl_seconds = db_config.get("schema_cache", {}).get("ttl_seconds", 300)
+
 def get_llm_service(llm_config) -> LLM_Model:
     if llm_config["completion_service"]["llm_service"].lower() == "openai":
         return OpenAI(llm_config["completion_service"])
@@ -142,27 +168,28 @@ if os.getenv("INIT_EMBED_STORE", "true") == "true":
             f"Milvus enabled for host {milvus_config['host']} at port {milvus_config['port']}"
         )
 
-        try:
-            embedding_store = MilvusEmbeddingStore(
-                embedding_service,
-                host=milvus_config["host"],
-                port=milvus_config["port"],
-                collection_name="tg_inquiry_documents",
-                metric_type=milvus_config.get("metric_type", "COSINE"),
-                support_ai_instance=False,
-                username=milvus_config.get("username", ""),
-                password=milvus_config.get("password", ""),
-                alias=milvus_config.get("alias", "default"),
-            )
-            service_status["embedding_store"] = {"status": "ok", "error": None}
-        except MilvusException as e:
-            embedding_store = None
-            service_status["embedding_store"] = {"status": "milvus error", "error": str(e)}
-            raise
-        except Exception as e:
-            embedding_store = None
-            service_status["embedding_store"] = {"status": "embedding error", "error": str(e)}
-            raise
+        if inquiry_embedding_store_type != "local":
+            try:
+                embedding_store = MilvusEmbeddingStore(
+                    embedding_service,
+                    host=milvus_config["host"],
+                    port=milvus_config["port"],
+                    collection_name="tg_inquiry_documents",
+                    metric_type=milvus_config.get("metric_type", "COSINE"),
+                    support_ai_instance=False,
+                    username=milvus_config.get("username", ""),
+                    password=milvus_config.get("password", ""),
+                    alias=milvus_config.get("alias", "default"),
+                )
+                service_status["embedding_store"] = {"status": "ok", "error": None}
+            except MilvusException as e:
+                embedding_store = None
+                service_status["embedding_store"] = {"status": "milvus error", "error": str(e)}
+                raise
+            except Exception as e:
+                embedding_store = None
+                service_status["embedding_store"] = {"status": "embedding error", "error": str(e)}
+                raise
 
         support_collection_name = milvus_config.get("collection_name", "tg_support_documents")
         LogWriter.info(
@@ -182,6 +209,7 @@ if os.getenv("INIT_EMBED_STORE", "true") == "true":
                 text_field=milvus_config.get("text_field", "document_content"),
                 vertex_field=milvus_config.get("vertex_field", "vertex_id"),
                 alias=milvus_config.get("alias", "default"),
+                **index_options(milvus_config),
             )
             service_status["supportai_embedding_store"] = {"status": "ok", "error": None}
         except MilvusException as e:
@@ -213,6 +241,24 @@ if os.getenv("INIT_EMBED_STORE", "true") == "true":
         service_status["embedding_store"] = {"status": "ok", "error": None}
         service_status["supportai_embedding_store"] = {"status": "ok", "error": None}
 
+    if inquiry_embedding_store_type == "local":
+        LogWriter.info(
+            f"Using the local embedding store for InquiryAI at {local_embedding_store_config.get('path', 'local_embeddings')}"
+        )
+        try:
+            embedding_store = LocalEmbeddingStore(
+                embedding_service,
+                path=local_embedding_store_config.get("path", "local_embeddings"),
+                collection_name="tg_inquiry_documents",
+                support_ai_instance=False,
+                snapshot_every=local_embedding_store_config.get("snapshot_every", 1000),
+            )
+            service_status["embedding_store"] = {"status": "ok", "error": None}
+        except Exception as e:
+            embedding_store = None
+            service_status["embedding_store"] = {"status": "embedding error", "error": str(e)}
+            raise
+
 if DOC_PROCESSING_CONFIG is None or (
     DOC_PROCESSING_CONFIG.endswith(".json")
     and not os.path.exists(DOC_PROCESSING_CONFIG)
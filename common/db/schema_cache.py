@@ -0,0 +1,215 @@
+"""Graph schema snapshots shared by the agent tools.
+
+Mapping a question to the schema, validating the mapping and generating Cypher
+all read the graph's schema. Rather than each of them asking TigerGraph for
+every vertex and edge type, the schema is fetched with one call per graph and
+kept as a SchemaSnapshot, which also memoizes the prompt fragments built from it.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import cached_property
+from typing import Dict, List, Union
+
+from common.logs.log import req_id_cv
+from common.logs.logwriter import LogWriter
+
+logger = logging.getLogger(__name__)
+
+
+def _attr_rep(attr: dict) -> str:
+    return attr["AttributeName"] + " of type " + attr["AttributeType"]["Name"]
+
+
+class SchemaSnapshot:
+    """SchemaSnapshot.
+    An immutable view of a graph's schema, as returned by getSchema().
+    Derived values are computed once per snapshot.
+    """
+
+    def __init__(self, schema: dict):
+        self.schema = schema
+        self.version = hashlib.sha1(
+            json.dumps(schema, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        self._vertices = {v["Name"]: v for v in schema.get("VertexTypes", [])}
+        self._edges = {e["Name"]: e for e in schema.get("EdgeTypes", [])}
+
+    @cached_property
+    def vertex_types(self) -> List[str]:
+        return list(self._vertices)
+
+    @cached_property
+    def edge_types(self) -> List[str]:
+        return list(self._edges)
+
+    def vertex_type(self, vertex_type: str) -> dict:
+        return self._vertices[vertex_type]
+
+    def edge_type(self, edge_type: str) -> dict:
+        return self._edges[edge_type]
+
+    def vertex_attrs(self, vertex_type: str) -> List[str]:
+        return [a["AttributeName"] for a in self._vertices[vertex_type]["Attributes"]]
+
+    def edge_attrs(self, edge_type: str) -> List[str]:
+        return [a["AttributeName"] for a in self._edges[edge_type]["Attributes"]]
+
+    def edge_source(self, edge_type: str) -> Union[str, set]:
+        # same as getEdgeSourceVertexType: a set when the edge has several source types
+        edge = self._edges[edge_type]
+        if edge["FromVertexTypeName"] != "*" or "EdgePairs" not in edge:
+            return edge["FromVertexTypeName"]
+        return {pair["From"] for pair in edge["EdgePairs"]}
+
+    def edge_target(self, edge_type: str) -> Union[str, set]:
+        edge = self._edges[edge_type]
+        if edge["ToVertexTypeName"] != "*" or "EdgePairs" not in edge:
+            return edge["ToVertexTypeName"]
+        return {pair["To"] for pair in edge["EdgePairs"]}
+
+    @cached_property
+    def vertices_info(self) -> List[Dict]:
+        """Vertex types and their attributes, as given to MapQuestionToSchema's prompt"""
+        return [
+            {"vertex": v, "attributes": self.vertex_attrs(v)} for v in self.vertex_types
+        ]
+
+    @cached_property
+    def edges_info(self) -> List[Dict]:
+        """Edge types and their endpoints, as given to MapQuestionToSchema's prompt"""
+        return [
+            {"edge": e, "source": self.edge_source(e), "target": self.edge_target(e)}
+            for e in self.edge_types
+        ]
+
+    @cached_property
+    def schema_rep(self) -> str:
+        """Text description of the schema, for prompts that generate queries or reports"""
+        vertex_schema = []
+        for vert in self.vertex_types:
+            details = self._vertices[vert]
+            primary_id = details["PrimaryId"]["AttributeName"]
+            attributes = "\n\t\t".join([_attr_rep(attr) for attr in details["Attributes"]])
+            if attributes == "":
+                attributes = "No attributes"
+            vertex_schema.append(f"{vert}\n\tPrimary Id Attribute: {primary_id}\n\tAttributes: \n\t\t{attributes}")
+
+        edge_schema = []
+        for edge in self.edge_types:
+            details = self._edges[edge]
+            from_vertex = details["FromVertexTypeName"]
+            to_vertex = details["ToVertexTypeName"]
+            direction = "Directed" if details["IsDirected"] else "Undirected"
+            attributes = "\n\t\t".join([_attr_rep(attr) for attr in details["Attributes"]])
+            if attributes == "":
+                attributes = "No attributes"
+            if from_vertex == "*" or to_vertex == "*":
+                pairs = [(pair["From"], pair["To"]) for pair in details.get("EdgePairs", [])]
+            else:
+                pairs = [(from_vertex, to_vertex)]
+            for from_vertex, to_vertex in pairs:
+                edge_info = f"""From Vertex: {from_vertex}\n\tTo Vertex: {to_vertex}"""
+                edge_schema.append(f"""{edge}\n\t{edge_info}\n\tEdge direction: {direction}\n\tAttributes: \n\t\t{attributes}""")
+
+        return f"""The schema of the graph is as follows:
+Vertex Types:
+{chr(10).join(vertex_schema)}
+
+Edge Types:
+{chr(10).join(edge_schema)}
+"""
+
+
+class SchemaCache:
+    """SchemaCache.
+    SchemaSnapshots per (host, graph). A snapshot is served for ttl_seconds,
+    then the schema is fetched again; if its version (a hash of its content)
+    is unchanged, the existing snapshot and its memoized prompt fragments are kept.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        """Initialize a SchemaCache.
+
+        Args:
+            ttl_seconds (float):
+                How long a snapshot is served before checking the schema again.
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(conn) -> tuple:
+        return (conn.host, conn.graphname)
+
+    def _fresh(self, key) -> SchemaSnapshot:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def _update(self, key, conn, schema: dict) -> SchemaSnapshot:
+        snapshot = SchemaSnapshot(schema)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0].version == snapshot.version:
+            snapshot = entry[0]
+        else:
+            LogWriter.info(
+                f"request_id={req_id_cv.get()} schema snapshot of graph {conn.graphname} is at version {snapshot.version}"
+            )
+        self._entries[key] = (snapshot, time.monotonic() + self.ttl_seconds)
+        return snapshot
+
+    def get(self, conn) -> SchemaSnapshot:
+        """Get the schema snapshot of conn's graph, fetching it if missing or expired.
+
+        Args:
+            conn (TigerGraphConnectionProxy):
+                Connection to the graph.
+        """
+        key = self._key(conn)
+        snapshot = self._fresh(key)
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        # one fetch per graph at a time, concurrent questions wait for it
+        with lock:
+            snapshot = self._fresh(key)
+            if snapshot is not None:
+                return snapshot
+            return self._update(key, conn, conn.getSchema(udts=False, force=True))
+
+    async def aget(self, conn) -> SchemaSnapshot:
+        """Same as get, for an async connection (AsyncTigerGraphConnectionProxy).
+        Concurrent misses may each fetch the schema, which is harmless."""
+        key = self._key(conn)
+        snapshot = self._fresh(key)
+        if snapshot is not None:
+            return snapshot
+        return self._update(key, conn, await conn.getSchema(udts=False, force=True))
+
+    def invalidate(self, conn=None):
+        """Drop the snapshot of conn's graph, or every snapshot if conn is None,
+        e.g. after running a schema change job."""
+        with self._lock:
+            if conn is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(conn), None)
+
+
+schema_cache = SchemaCache()
+
+
+def get_schema(conn) -> SchemaSnapshot:
+    return schema_cache.get(conn)
+
+
+async def aget_schema(conn) -> SchemaSnapshot:
+    return await schema_cache.aget(conn)
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Iterable, Tuple, List
 import logging
@@ -37,6 +38,23 @@ class EmbeddingStore(ABC):
         """
         pass
 
+    async def aget_embedded_ids(self, ids: List[str]) -> set:
+        """Get Embedded IDs.
+        Find which of many documents already have embeddings.
+        Stores that can check many ids in one request override this;
+        the default checks them one at a time with has_embeddings.
+        Args:
+            ids (List[str]):
+                IDs of the documents to check
+        Returns:
+            The set of ids that have embeddings
+        """
+        embedded = set()
+        for id in ids:
+            if await asyncio.to_thread(self.has_embeddings, [id]):
+                embedded.add(id)
+        return embedded
+
     @abstractmethod
     def remove_embeddings(self, ids: List[str]) -> None:
         """Remove Embeddings.
@@ -65,6 +83,24 @@ class EmbeddingStore(ABC):
         """
         pass
 
+    async def aretrieve_similar(self, query_embedding: List[float], top_k: int = 10, **kwargs):
+        """Async Retrieve Similar.
+        Same as retrieve_similar. Stores with an async client override this;
+        the default runs retrieve_similar in a thread.
+        """
+        return await asyncio.to_thread(
+            self.retrieve_similar, query_embedding, top_k=top_k, **kwargs
+        )
+
+    async def aretrieve_similar_with_score(self, query_embedding: List[float], top_k: int = 10, **kwargs):
+        """Async Retrieve Similar With Score.
+        Same as retrieve_similar_with_score. Stores with an async client override this;
+        the default runs retrieve_similar_with_score in a thread.
+        """
+        return await asyncio.to_thread(
+            self.retrieve_similar_with_score, query_embedding, top_k=top_k, **kwargs
+        )
+
     @abstractmethod
     def add_connection_parameters(self, query_params: dict) -> dict:
         """Add Connection Parameters.
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """EmbeddingCache.
+    Content-addressed, on-disk cache of embeddings keyed by (model name, sha256 of text).
+    Backed by SQLite so it can be shared between processes that mount the same file.
+    The least recently used entries are evicted once the cache grows past max_entries.
+    """
+
+    def __init__(self, path: str = "embedding_cache.db", max_entries: int = 100_000):
+        """Initialize an EmbeddingCache.
+
+        Args:
+            path (str):
+                Location of the SQLite database file. Created if it doesn't exist.
+            max_entries (int):
+                Number of embeddings to keep before evicting the least recently used ones.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    sha TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (model, sha)
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)"
+            )
+            self._db.commit()
+            self._size = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _dump(vector: List[float]) -> bytes:
+        # embedding APIs produce float32 values, so this round-trips without loss
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _load(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up cached embeddings.
+
+        Args:
+            model (str):
+                Name of the embedding model.
+            texts (Iterable[str]):
+                Texts to look up.
+        Returns:
+            A dict mapping each text that was found to its embedding.
+        """
+        shas = {}
+        for text in texts:
+            shas.setdefault(self.key(text), []).append(text)
+        if not shas:
+            return {}
+
+        found = {}
+        keys = list(shas.keys())
+        try:
+            with self._lock:
+                # stay under SQLite's bound-parameter limit
+                for i in range(0, len(keys), 500):
+                    part = keys[i : i + 500]
+                    rows = self._db.execute(
+                        f"SELECT sha, vector FROM embeddings WHERE model = ? AND sha IN ({','.join('?' * len(part))})",
+                        [model, *part],
+                    ).fetchall()
+                    for sha, blob in rows:
+                        vector = self._load(blob)
+                        for text in shas[sha]:
+                            found[text] = vector
+                    if rows:
+                        self._db.executemany(
+                            "UPDATE embeddings SET accessed = ? WHERE model = ? AND sha = ?",
+                            [(time.time(), model, sha) for sha, _ in rows],
+                        )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+        return found
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(text)
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Store embeddings in the cache.
+
+        Args:
+            model (str):
+                Name of the embedding model.
+            texts (List[str]):
+                Texts that were embedded.
+            vectors (List[List[float]]):
+                Embeddings of the texts. Must have identical indexing to texts.
+        """
+        now = time.time()
+        rows = [
+            (model, self.key(text), self._dump(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                cur = self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, sha, vector, accessed) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._size += max(cur.rowcount, 0)
+                if self._size > self.max_entries:
+                    self._evict()
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model: str, text: str, vector: List[float]):
+        self.put_many(model, [text], [vector])
+
+    def _evict(self):
+        # the in-memory size is only an estimate when other processes share the file
+        self._size = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+            self._size -= overflow
+            logger.info(f"Evicted {overflow} entries from the embedding cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class QueryEmbeddingCache:
+    """QueryEmbeddingCache.
+    In-memory LRU cache of query embeddings with a time-to-live, keyed by
+    (model name, normalized text). Sits in front of the remote embedding call
+    (and the on-disk EmbeddingCache) on the request path, where the same
+    question is often embedded several times.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        """Initialize a QueryEmbeddingCache.
+
+        Args:
+            max_entries (int):
+                Number of embeddings to keep before evicting the least recently used ones.
+            ttl_seconds (float):
+                How long an embedding is served from the cache. None keeps them until evicted.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # whitespace and unicode form don't change the question
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def put(self, model: str, text: str, vector: List[float]):
+        key = (model, self.normalize(text))
+        expires = None if self.ttl_seconds is None else time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (vector, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
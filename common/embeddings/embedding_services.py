@@ -1,10 +1,14 @@
+import asyncio
+import contextvars
 import logging
 import os
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 from langchain.schema.embeddings import Embeddings
 
+from common.embeddings.embedding_cache import EmbeddingCache, QueryEmbeddingCache
 from common.logs.log import req_id_cv
 from common.logs.logwriter import LogWriter
 from common.metrics.prometheus_metrics import metrics
@@ -28,10 +32,70 @@ class EmbeddingModel(Embeddings):
         self.embeddings = None
         self.model_name = model_name
         self.base_url = config.get("base_url")
+        self.cache: Optional[EmbeddingCache] = None
+        self.query_cache: Optional[QueryEmbeddingCache] = None
         LogWriter.info(
             f"request_id={req_id_cv.get()} instantiated OpenAI model_name={model_name}"
         )
 
+    def set_cache(self, cache: Optional[EmbeddingCache]):
+        """Set Cache.
+        Serve repeated texts from a content-addressed embedding cache.
+
+        Args:
+            cache (EmbeddingCache):
+                The cache to use, or None to disable caching.
+        """
+        self.cache = cache
+
+    def set_query_cache(self, query_cache: Optional[QueryEmbeddingCache]):
+        """Set Query Cache.
+        Serve repeated queries (embed_query, aembed_query) from an in-memory cache.
+
+        Args:
+            query_cache (QueryEmbeddingCache):
+                The cache to use, or None to disable it.
+        """
+        self.query_cache = query_cache
+
+    @property
+    def _query_cache_model(self) -> str:
+        # some providers embed queries and documents differently (e.g. Vertex AI's
+        # RETRIEVAL_QUERY and RETRIEVAL_DOCUMENT), so the on-disk cache keeps them apart
+        return self.model_name + ":query"
+
+    def _cached_query(self, question: str) -> Optional[List[float]]:
+        # in-memory cache first, then the on-disk cache
+        if self.query_cache is not None:
+            cached = self.query_cache.get(self.model_name, question)
+            if cached is not None:
+                metrics.query_embedding_cache_hits_total.labels(self.model_name).inc()
+                return cached
+            metrics.query_embedding_cache_misses_total.labels(self.model_name).inc()
+        if self.cache is not None:
+            cached = self.cache.get(self._query_cache_model, question)
+            if cached is not None:
+                if self.query_cache is not None:
+                    self.query_cache.put(self.model_name, question, cached)
+                return cached
+        return None
+
+    def _store_query(self, question: str, vector: List[float]):
+        if self.query_cache is not None:
+            self.query_cache.put(self.model_name, question, vector)
+        if self.cache is not None:
+            self.cache.put(self._query_cache_model, question, vector)
+
+    def _cached(self, texts: List[str]) -> tuple[dict, List[str]]:
+        # returns the cached embeddings and the unique texts that still need embedding
+        cached = self.cache.get_many(self.model_name, texts) if self.cache is not None else {}
+        missing = [t for t in dict.fromkeys(texts) if t not in cached]
+        return cached, missing
+
+    def _store(self, texts: List[str], vectors: List[List[float]]):
+        if self.cache is not None:
+            self.cache.put_many(self.model_name, texts, vectors)
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed Documents.
         Generate embeddings for a list of documents.
@@ -42,15 +106,21 @@ class EmbeddingModel(Embeddings):
         Returns:
             Nested lists of floats that contain embeddings.
         """
+        cached, missing = self._cached(texts)
+        if not missing:
+            return [cached[t] for t in texts]
+
         start_time = time.time()
         metrics.llm_inprogress_requests.labels(self.model_name).inc()
 
         try:
             LogWriter.info(f"request_id={req_id_cv.get()} ENTRY embed_documents()")
-            docs = self.embeddings.embed_documents(texts)
+            docs = self.embeddings.embed_documents(missing)
             LogWriter.info(f"request_id={req_id_cv.get()} EXIT embed_documents()")
             metrics.llm_success_response_total.labels(self.model_name).inc()
-            return docs
+            self._store(missing, docs)
+            cached.update(zip(missing, docs))
+            return [cached[t] for t in texts]
         except Exception as e:
             metrics.llm_query_error_total.labels(self.model_name).inc()
             raise e
@@ -70,6 +140,12 @@ class EmbeddingModel(Embeddings):
             question (str):
                 A string to embed.
         """
+        cached = self._cached_query(question)
+        if cached is not None:
+            return cached
+        return self._embed_query(question)
+
+    def _embed_query(self, question: str) -> List[float]:
         start_time = time.time()
         metrics.llm_inprogress_requests.labels(self.model_name).inc()
 
@@ -81,6 +157,7 @@ class EmbeddingModel(Embeddings):
             query_embedding = self.embeddings.embed_query(question)
             LogWriter.info(f"request_id={req_id_cv.get()} EXIT embed_query()")
             metrics.llm_success_response_total.labels(self.model_name).inc()
+            self._store_query(question, query_embedding)
             return query_embedding
         except Exception as e:
             metrics.llm_query_error_total.labels(self.model_name).inc()
@@ -93,6 +170,90 @@ class EmbeddingModel(Embeddings):
                 duration
             )
 
+    def _cached_queries(self, questions: List[str]) -> tuple[dict, List[str]]:
+        # returns the cached query embeddings and the unique questions that still need embedding
+        found = {}
+        for question in questions:
+            if question not in found:
+                cached = self._cached_query(question)
+                if cached is not None:
+                    found[question] = cached
+        missing = [q for q in dict.fromkeys(questions) if q not in found]
+        return found, missing
+
+    def embed_queries(self, questions: List[str]) -> List[List[float]]:
+        """Embed Queries.
+        Embed several queries, serving repeats from the query cache and
+        embedding the rest concurrently, each with embed_query.
+
+        Args:
+            questions (List[str]):
+                The strings to embed.
+        Returns:
+            Nested lists of floats that contain embeddings.
+        """
+        found, missing = self._cached_queries(questions)
+        if len(missing) == 1:
+            found[missing[0]] = self._embed_query(missing[0])
+        elif missing:
+            ctx = contextvars.copy_context()
+            with ThreadPoolExecutor(max_workers=min(len(missing), 8)) as pool:
+                vectors = pool.map(lambda q: ctx.copy().run(self._embed_query, q), missing)
+                found.update(zip(missing, vectors))
+        return [found[q] for q in questions]
+
+    async def aembed_queries(self, questions: List[str]) -> List[List[float]]:
+        """Embed Queries Async.
+        Same as embed_queries, with the aembed_query calls gathered.
+
+        Args:
+            questions (List[str]):
+                The strings to embed.
+        Returns:
+            Nested lists of floats that contain embeddings.
+        """
+        found, missing = self._cached_queries(questions)
+        if missing:
+            vectors = await asyncio.gather(*(self._aembed_query(q) for q in missing))
+            found.update(zip(missing, vectors))
+        return [found[q] for q in questions]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed Documents Async.
+        Generate embeddings for a list of documents in a single request.
+
+        Args:
+            texts (List[str]):
+                List of documents to embed.
+        Returns:
+            Nested lists of floats that contain embeddings.
+        """
+        cached, missing = self._cached(texts)
+        if not missing:
+            return [cached[t] for t in texts]
+
+        start_time = time.time()
+        metrics.llm_inprogress_requests.labels(self.model_name).inc()
+
+        try:
+            LogWriter.info(f"request_id={req_id_cv.get()} ENTRY aembed_documents()")
+            docs = await self.embeddings.aembed_documents(missing)
+            LogWriter.info(f"request_id={req_id_cv.get()} EXIT aembed_documents()")
+            metrics.llm_success_response_total.labels(self.model_name).inc()
+            self._store(missing, docs)
+            cached.update(zip(missing, docs))
+            return [cached[t] for t in texts]
+        except Exception as e:
+            metrics.llm_query_error_total.labels(self.model_name).inc()
+            raise e
+        finally:
+            metrics.llm_request_total.labels(self.model_name).inc()
+            metrics.llm_inprogress_requests.labels(self.model_name).dec()
+            duration = time.time() - start_time
+            metrics.llm_request_duration_seconds.labels(self.model_name).observe(
+                duration
+            )
+
     async def aembed_query(self, question: str) -> List[float]:
         """Embed Query Async.
         Embed a string.
@@ -105,8 +266,15 @@ class EmbeddingModel(Embeddings):
         # metrics.llm_inprogress_requests.labels(self.model_name).inc()
 
         # try:
+        cached = self._cached_query(question)
+        if cached is not None:
+            return cached
+        return await self._aembed_query(question)
+
+    async def _aembed_query(self, question: str) -> List[float]:
         logger.debug_pii(f"aembed_query() embedding question={question}")
         query_embedding = await self.embeddings.aembed_query(question)
+        self._store_query(question, query_embedding)
         # metrics.llm_success_response_total.labels(self.model_name).inc()
         return query_embedding
         # except Exception as e:
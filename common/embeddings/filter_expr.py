@@ -0,0 +1,196 @@
+"""Milvus-style boolean filter expressions, evaluated over metadata dicts.
+
+Supports the subset CoPilot writes: `and`/`or`/`not` (also `&&`, `||`, `!`),
+parentheses, comparisons (`==`, `!=`, `<`, `<=`, `>`, `>=`), `in` / `not in`
+with list literals, `like` with `%` wildcards, and string, number, boolean
+and list literals. For example:
+
+    custom_query == true and graphname == 'Demo'
+    vertex_id in ["a", "b"]
+    vertex_id like "%_1"
+"""
+import re
+from typing import Any, Callable, List
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<op>==|!=|<=|>=|&&|\|\||<|>|!|\(|\)|\[|\]|,)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""",
+    re.VERBOSE,
+)
+_KEYWORDS = {"and", "or", "not", "in", "like", "true", "false"}
+
+
+class FilterExprError(ValueError):
+    pass
+
+
+def _tokenize(expr: str) -> List[tuple]:
+    tokens = []
+    pos = 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if m is None:
+            raise FilterExprError(f"Unexpected character at {pos} in filter: {expr}")
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "name" and value.lower() in _KEYWORDS:
+            kind, value = "op", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+def _like(pattern: str) -> Callable[[Any], bool]:
+    regex = re.compile(
+        "^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$", re.S
+    )
+    return lambda v: isinstance(v, str) and regex.match(v) is not None
+
+
+def _compare(op: str, a, b) -> bool:
+    try:
+        if op == "==":
+            return a == b
+        if op == "!=":
+            return a != b
+        if a is None or b is None:
+            return False
+        if op == "<":
+            return a < b
+        if op == "<=":
+            return a <= b
+        if op == ">":
+            return a > b
+        return a >= b
+    except TypeError:
+        return False
+
+
+class _Parser:
+    """
+    Recursive descent over:
+        or_expr   := and_expr (("or" | "||") and_expr)*
+        and_expr  := not_expr (("and" | "&&") not_expr)*
+        not_expr  := ("not" | "!") not_expr | atom
+        atom      := "(" or_expr ")" | name comparison
+    """
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        self.tokens = _tokenize(expr)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        if tok[0] is None:
+            raise FilterExprError(f"Unexpected end of filter: {self.expr}")
+        self.pos += 1
+        return tok
+
+    def _expect(self, value: str):
+        tok = self._next()
+        if tok != ("op", value):
+            raise FilterExprError(f"Expected '{value}', got '{tok[1]}' in filter: {self.expr}")
+
+    def parse(self) -> Callable[[dict], bool]:
+        pred = self._or()
+        if self.pos != len(self.tokens):
+            raise FilterExprError(f"Unexpected '{self._peek()[1]}' in filter: {self.expr}")
+        return pred
+
+    def _or(self):
+        preds = [self._and()]
+        while self._peek() in (("op", "or"), ("op", "||")):
+            self.pos += 1
+            preds.append(self._and())
+        return preds[0] if len(preds) == 1 else lambda r: any(p(r) for p in preds)
+
+    def _and(self):
+        preds = [self._not()]
+        while self._peek() in (("op", "and"), ("op", "&&")):
+            self.pos += 1
+            preds.append(self._not())
+        return preds[0] if len(preds) == 1 else lambda r: all(p(r) for p in preds)
+
+    def _not(self):
+        if self._peek() in (("op", "not"), ("op", "!")):
+            self.pos += 1
+            pred = self._not()
+            return lambda r: not pred(r)
+        return self._atom()
+
+    def _atom(self):
+        kind, value = self._next()
+        if (kind, value) == ("op", "("):
+            pred = self._or()
+            self._expect(")")
+            return pred
+        if kind != "name":
+            raise FilterExprError(f"Expected a field name, got '{value}' in filter: {self.expr}")
+        field = value
+
+        kind, op = self._next()
+        if (kind, op) == ("op", "not"):
+            self._expect("in")
+            values = self._list()
+            return lambda r: r.get(field) not in values
+        if (kind, op) == ("op", "in"):
+            values = self._list()
+            return lambda r: r.get(field) in values
+        if (kind, op) == ("op", "like"):
+            pattern = self._literal()
+            if not isinstance(pattern, str):
+                raise FilterExprError(f"like needs a string pattern in filter: {self.expr}")
+            match = _like(pattern)
+            return lambda r: match(r.get(field))
+        if kind == "op" and op in ("==", "!=", "<", "<=", ">", ">="):
+            literal = self._literal()
+            return lambda r: _compare(op, r.get(field), literal)
+        raise FilterExprError(f"Expected a comparison after '{field}' in filter: {self.expr}")
+
+    def _list(self) -> list:
+        self._expect("[")
+        values = []
+        if self._peek() == ("op", "]"):
+            self.pos += 1
+            return values
+        while True:
+            values.append(self._literal())
+            kind, value = self._next()
+            if value == "]":
+                return values
+            if value != ",":
+                raise FilterExprError(f"Expected ',' or ']', got '{value}' in filter: {self.expr}")
+
+    def _literal(self):
+        kind, value = self._next()
+        if kind == "string":
+            return re.sub(r"\\(.)", r"\1", value[1:-1])
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if (kind, value) == ("op", "true"):
+            return True
+        if (kind, value) == ("op", "false"):
+            return False
+        if (kind, value) == ("op", "["):
+            self.pos -= 1
+            return self._list()
+        raise FilterExprError(f"Expected a value, got '{value}' in filter: {self.expr}")
+
+
+def compile_expr(expr: str) -> Callable[[dict], bool]:
+    """
+    Compile a filter expression into a predicate over a record (metadata dict).
+    Fields missing from the record compare as None. An empty expression matches everything.
+    """
+    if expr is None or not expr.strip():
+        return lambda r: True
+    return _Parser(expr).parse()
@@ -0,0 +1,680 @@
+import base64
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from glob import glob
+from typing import Iterable, List, Optional, Tuple
+
+import Levenshtein as lev
+import numpy as np
+from langchain_core.documents.base import Document
+
+from common.embeddings import search_results
+from common.embeddings.base_embedding_store import EmbeddingStore
+from common.embeddings.embedding_services import EmbeddingModel
+from common.embeddings.filter_expr import compile_expr
+from common.logs.log import req_id_cv
+from common.logs.logwriter import LogWriter
+
+logger = logging.getLogger(__name__)
+
+# collections are shared by every store in the process, one per directory,
+# so two stores never write the same files
+_collections = {}
+_collections_lock = threading.Lock()
+
+
+class _Collection:
+    """
+    One collection of a LocalEmbeddingStore, kept in a directory as:
+      CURRENT            the generation of the live snapshot
+      vectors.<gen>.npy  the snapshot's unit-norm vectors, memory-mapped on load
+      records.<gen>.json the snapshot's pks, texts and metadatas
+      log.<gen>.jsonl    adds and deletes made since the snapshot, replayed on load
+
+    Rows added after the snapshot live in an in-memory delta next to the mapped vectors.
+    Deleting only sets a tombstone: the row is dropped by the next snapshot, which is taken
+    every `snapshot_every` logged rows (or by calling snapshot()).
+    """
+
+    def __init__(self, path: str, snapshot_every: int = 1000):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.lock = threading.RLock()
+        self.gen = 0
+        self.dim = None
+        self.next_pk = 1
+        self.pks = []
+        self.texts = []
+        self.metadatas = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.base = None
+        self.delta = None
+        self.n_delta = 0
+        self.by_pk = {}
+        self.logged = 0
+        self.version = 0
+        # filter expression -> (version, mask), for the filters searches repeat
+        self._masks = {}
+        # metadata field -> value -> pks, for lookups by vertex id
+        self._indexes = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+        self._log = open(self._file("log", "jsonl"), "a")
+
+    def __len__(self):
+        return len(self.by_pk)
+
+    def _file(self, name: str, ext: str, gen: int = None) -> str:
+        return os.path.join(self.path, f"{name}.{self.gen if gen is None else gen}.{ext}")
+
+    def _load(self):
+        current = os.path.join(self.path, "CURRENT")
+        if os.path.exists(current):
+            with open(current) as f:
+                self.gen = int(f.read().strip())
+            with open(self._file("records", "json")) as f:
+                records = json.load(f)
+            self.dim = records["dim"]
+            self.next_pk = records["next_pk"]
+            self.pks = records["pks"]
+            self.texts = records["texts"]
+            self.metadatas = records["metadatas"]
+            self.alive = np.ones(len(self.pks), dtype=bool)
+            if len(self.pks) > 0:
+                self.base = np.load(self._file("vectors", "npy"), mmap_mode="r")
+            self.by_pk = {pk: i for i, pk in enumerate(self.pks)}
+
+        log_path = self._file("log", "jsonl")
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                lines = f.readlines()
+            valid = 0
+            for n, line in enumerate(lines):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # only the last line can be torn, by a crash mid-write:
+                    # cut it off so the next entry starts on a fresh line
+                    if n != len(lines) - 1:
+                        raise
+                    logger.warning(f"Dropping a partly written entry at the end of {log_path}")
+                    os.truncate(log_path, valid)
+                    break
+                valid += len(line)
+                if not line.endswith(b"\n"):
+                    with open(log_path, "ab") as f:
+                        f.write(b"\n")
+                if entry["op"] == "add":
+                    vectors = np.frombuffer(base64.b64decode(entry["vectors"]), dtype=np.float32)
+                    self._add_rows(
+                        entry["pks"], entry["texts"], entry["metadatas"], vectors.reshape(len(entry["pks"]), -1)
+                    )
+                else:
+                    self._delete_rows(entry["pks"])
+                self.logged += len(entry["pks"])
+
+    def _grow(self, n: int):
+        capacity = 0 if self.delta is None else len(self.delta)
+        if self.n_delta + n > capacity:
+            delta = np.zeros((max(2 * capacity, self.n_delta + n, 64), self.dim), dtype=np.float32)
+            if self.n_delta:
+                delta[: self.n_delta] = self.delta[: self.n_delta]
+            self.delta = delta
+
+    def _add_rows(self, pks: List[int], texts: List[str], metadatas: List[dict], vectors: np.ndarray):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match the collection's {self.dim}"
+            )
+        self._grow(len(pks))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.delta[self.n_delta : self.n_delta + len(pks)] = vectors / norms
+        self.n_delta += len(pks)
+
+        for pk, text, metadata in zip(pks, texts, metadatas):
+            self.by_pk[pk] = len(self.pks)
+            self.pks.append(pk)
+            self.texts.append(text)
+            self.metadatas.append(metadata)
+            self.next_pk = max(self.next_pk, pk + 1)
+            for field, index in self._indexes.items():
+                index[metadata.get(field)].add(pk)
+        self.alive = np.concatenate([self.alive, np.ones(len(pks), dtype=bool)])
+        self.version += 1
+
+    def _delete_rows(self, pks: list) -> list:
+        deleted = [pk for pk in pks if pk in self.by_pk]
+        for pk in deleted:
+            row = self.by_pk.pop(pk)
+            self.alive[row] = False
+            for field, index in self._indexes.items():
+                index[self.metadatas[row].get(field)].discard(pk)
+        if deleted:
+            self.version += 1
+        return deleted
+
+    def lookup(self, field: str, values: Iterable) -> np.ndarray:
+        """
+        Live rows whose metadata `field` is one of `values`. The first lookup on a field
+        indexes it (value -> pks), and the index is kept up to date from then on.
+        """
+        with self.lock:
+            index = self._indexes.get(field)
+            if index is None:
+                index = defaultdict(set)
+                for pk, row in self.by_pk.items():
+                    index[self.metadatas[row].get(field)].add(pk)
+                self._indexes[field] = index
+            rows = [self.by_pk[pk] for v in set(values) for pk in index.get(v, ())]
+            return np.asarray(sorted(rows), dtype=np.int64)
+
+    def _write_log(self, entry: dict, n: int):
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+        self.logged += n
+        if self.logged >= self.snapshot_every:
+            self.snapshot()
+
+    def add(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict], pks: List[int] = None) -> List[int]:
+        if len(texts) == 0:
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            if pks is None:
+                pks = list(range(self.next_pk, self.next_pk + len(texts)))
+            self._add_rows(pks, texts, metadatas, vectors)
+            entry = {
+                "op": "add",
+                "pks": pks,
+                "texts": texts,
+                "metadatas": metadatas,
+                # raw float32, exact and much cheaper to write than JSON numbers
+                "vectors": base64.b64encode(vectors.tobytes()).decode(),
+            }
+            self._write_log(entry, len(pks))
+            return pks
+
+    def delete(self, pks: List[int]) -> List[int]:
+        with self.lock:
+            deleted = self._delete_rows(pks)
+            if deleted:
+                self._write_log({"op": "delete", "pks": deleted}, len(deleted))
+            return deleted
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        if self.dim is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        n_base = 0 if self.base is None else len(self.base)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_base = rows < n_base
+        if in_base.any():
+            out[in_base] = self.base[rows[in_base]]
+        if (~in_base).any():
+            out[~in_base] = self.delta[rows[~in_base] - n_base]
+        return out
+
+    def record(self, row: int) -> dict:
+        return {**self.metadatas[row], "pk": self.pks[row]}
+
+    def mask(self, expr: str = None, cache: bool = True) -> np.ndarray:
+        """
+        Rows that are alive and match the filter expression
+        """
+        if not expr:
+            return self.alive
+        hit = self._masks.get(expr)
+        if hit is not None and hit[0] == self.version:
+            return hit[1]
+        match = compile_expr(expr)
+        mask = self.alive.copy()
+        for row in np.flatnonzero(mask):
+            mask[row] = match(self.record(row))
+        if cache:
+            if len(self._masks) >= 64:
+                self._masks.clear()
+            self._masks[expr] = (self.version, mask)
+        return mask
+
+    def search(self, query: List[float], k: int, expr: str = None) -> List[Tuple[int, float]]:
+        """
+        Exact cosine search: the k most similar live rows matching `expr`, as (row, similarity).
+        Rows are renumbered by snapshots, so hold the lock until they've been read.
+        """
+        with self.lock:
+            if self.dim is None or len(self.by_pk) == 0:
+                return []
+            q = np.asarray(query, dtype=np.float32)
+            q /= np.linalg.norm(q) or 1
+            parts = []
+            if self.base is not None:
+                parts.append(self.base @ q)
+            if self.n_delta:
+                parts.append(self.delta[: self.n_delta] @ q)
+            sims = np.concatenate(parts)
+            sims[~self.mask(expr)] = -np.inf
+
+        return [
+            (int(r), float(sims[r]))
+            for r in search_results.top_indices(sims, k)
+            if np.isfinite(sims[r])
+        ]
+
+    def snapshot(self):
+        """
+        Write the live rows as a new generation, then switch CURRENT over to it.
+        A crash at any point leaves either the old or the new generation complete.
+        """
+        with self.lock:
+            live = np.flatnonzero(self.alive)
+            gen = self.gen + 1
+            if len(live) > 0:
+                vectors = self.vectors(live)
+                np.save(self._file("vectors", "npy", gen), vectors)
+            records = {
+                "dim": self.dim,
+                "next_pk": self.next_pk,
+                "pks": [self.pks[r] for r in live],
+                "texts": [self.texts[r] for r in live],
+                "metadatas": [self.metadatas[r] for r in live],
+            }
+            with open(self._file("records", "json", gen), "w") as f:
+                json.dump(records, f)
+            open(self._file("log", "jsonl", gen), "w").close()
+
+            tmp = os.path.join(self.path, "CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(str(gen))
+            os.replace(tmp, os.path.join(self.path, "CURRENT"))
+
+            self._log.close()
+            old = self.gen
+            self.gen = gen
+            self.pks = records["pks"]
+            self.texts = records["texts"]
+            self.metadatas = records["metadatas"]
+            self.alive = np.ones(len(live), dtype=bool)
+            self.by_pk = {pk: i for i, pk in enumerate(self.pks)}
+            self.base = np.load(self._file("vectors", "npy"), mmap_mode="r") if len(live) > 0 else None
+            self.delta = None
+            self.n_delta = 0
+            self.logged = 0
+            self.version += 1
+            self._log = open(self._file("log", "jsonl"), "a")
+
+            for name, ext in (("vectors", "npy"), ("records", "json"), ("log", "jsonl")):
+                if os.path.exists(self._file(name, ext, old)):
+                    os.remove(self._file(name, ext, old))
+
+    def close(self):
+        with self.lock:
+            self._log.close()
+
+
+def _open_collection(path: str, snapshot_every: int) -> _Collection:
+    path = os.path.abspath(path)
+    with _collections_lock:
+        if path not in _collections:
+            _collections[path] = _Collection(path, snapshot_every)
+        return _collections[path]
+
+
+class LocalEmbeddingStore(EmbeddingStore):
+    """LocalEmbeddingStore
+
+    An EmbeddingStore that runs inside the service process, for small indexes such as
+    InquiryAI's function documents (a few thousand vectors), where a round trip to an
+    external vector database costs more than the search itself.
+
+    Search is exact (cosine) over unit-norm vectors. Each collection is a directory under
+    `path` holding a memory-mapped snapshot plus a log of the adds and deletes made since,
+    so the index survives restarts. Filters use the Milvus expression syntax
+    (e.g. `graphname == 'all'`).
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingModel,
+        path: str = "local_embeddings",
+        support_ai_instance: bool = False,
+        collection_name: str = "tg_documents",
+        vector_field: str = "vector_field",
+        text_field: str = "text",
+        vertex_field: str = "vertex_id",
+        snapshot_every: int = 1000,
+    ):
+        """Initialize the LocalEmbeddingStore
+
+        Args:
+            embedding_service (EmbeddingModel):
+                Embeds the texts that are added without a vector.
+            path (str, optional):
+                Directory the collections are kept in. Defaults to "local_embeddings".
+            support_ai_instance (bool, optional):
+                Whether the store holds SupportAI vertices. Otherwise the pyTigerGraph
+                function documents are loaded into an empty collection.
+            collection_name (str, optional):
+                The collection used when a method isn't given one.
+            snapshot_every (int, optional):
+                Number of logged rows after which a new snapshot is written. Defaults to 1000.
+        """
+        self.embedding_service = embedding_service
+        self.path = path
+        self.support_ai_instance = support_ai_instance
+        self.collection_name = collection_name
+        self.vector_field = vector_field
+        self.text_field = text_field
+        self.vertex_field = vertex_field
+        self.snapshot_every = snapshot_every
+
+        if not self.support_ai_instance:
+            self.load_documents()
+
+    def collection(self, collection_name: str = None) -> _Collection:
+        return _open_collection(
+            os.path.join(self.path, collection_name or self.collection_name),
+            self.snapshot_every,
+        )
+
+    def set_collection_name(self, collection_name: str = "tg_documents", vector_field: str = None, text_field: str = None, vertex_field: str = None):
+        self.collection_name = collection_name
+        if vector_field:
+            self.vector_field = vector_field
+        if text_field:
+            self.text_field = text_field
+        if vertex_field:
+            self.vertex_field = vertex_field
+
+    def check_collection_exists(self, collection_name: str = None) -> bool:
+        return len(self.collection(collection_name)) > 0
+
+    def load_documents(self):
+        if self.check_collection_exists():
+            LogWriter.info("Local embedding store already initialized, skipping initial document load")
+            return
+
+        texts = []
+        metadatas = []
+        for path in sorted(glob("./common/tg_documents/*.json")):
+            with open(path) as f:
+                record = json.load(f)
+            texts.append(record["docstring"])
+            metadatas.append(
+                {
+                    "source": path,
+                    "seq_num": 1,
+                    "function_header": record.get("function_header"),
+                    "description": record.get("description"),
+                    "param_types": record.get("param_types"),
+                    "custom_query": record.get("custom_query"),
+                    "graphname": "all",
+                }
+            )
+        if texts:
+            self.collection().add(texts, self.embedding_service.embed_documents(texts), metadatas)
+        LogWriter.info(f"Local embedding store loaded {len(texts)} initial documents")
+
+    def _prepare(self, embeddings: Iterable[Tuple[str, List[float]]], metadatas: Optional[List[dict]]):
+        embeddings = list(embeddings)
+        metadatas = [dict(m or {}) for m in (metadatas or [{} for _ in embeddings])]
+        # same defaults as the Milvus store's schema
+        for metadata in metadatas:
+            if self.support_ai_instance:
+                metadata.setdefault(self.vertex_field, "")
+            else:
+                metadata.setdefault("seq_num", 1)
+                metadata.setdefault("source", "")
+        texts = [text for text, _ in embeddings]
+        vectors = [vector for _, vector in embeddings]
+        missing = [i for i, vector in enumerate(vectors) if vector is None or len(vector) == 0]
+        return texts, vectors, metadatas, missing
+
+    def add_embeddings(
+        self,
+        embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: List[dict] = None,
+        collection_name: str = None,
+    ):
+        """Add Embeddings.
+        Add embeddings to the Embedding store.
+        Args:
+            embeddings (Iterable[Tuple[str, List[float]]]):
+                Iterable of content and embedding of the document.
+                Documents with an empty embedding are embedded here.
+            metadatas (List[Dict]):
+                List of dictionaries containing the metadata for each document.
+                The embeddings and metadatas list need to have identical indexing.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} Local ENTRY add_embeddings()")
+        texts, vectors, metadatas, missing = self._prepare(embeddings, metadatas)
+        if missing:
+            embedded = self.embedding_service.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        added = self.collection(collection_name).add(texts, vectors, metadatas)
+        LogWriter.info(f"request_id={req_id_cv.get()} Local EXIT add_embeddings()")
+        return f"Document registered with id: {added[0]}" if added else None
+
+    async def aadd_embeddings(
+        self,
+        embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: List[dict] = None,
+        collection_name: str = None,
+    ):
+        """Async Add Embeddings.
+        Same as add_embeddings, embedding the documents without a vector asynchronously.
+        """
+        texts, vectors, metadatas, missing = self._prepare(embeddings, metadatas)
+        if missing:
+            embedded = await self.embedding_service.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        added = self.collection(collection_name).add(texts, vectors, metadatas)
+        return f"Document registered with id: {added[0]}" if added else None
+
+    def upsert_embeddings(
+        self,
+        id: str,
+        embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[dict]] = None,
+    ):
+        """Upsert Embeddings.
+        Replace the document with primary key `id`, or add it if `id` is empty.
+        """
+        texts, vectors, metadatas, missing = self._prepare(embeddings, metadatas)
+        if missing:
+            embedded = self.embedding_service.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        collection = self.collection()
+        with collection.lock:
+            pks = None
+            if id is not None and id.strip():
+                collection.delete([int(id)])
+                pks = [int(id)] + list(range(collection.next_pk, collection.next_pk + len(texts) - 1))
+            upserted = collection.add(texts, vectors, metadatas, pks=pks)
+        return f"Document upserted with id: {upserted[0]}" if upserted else None
+
+    def get_pks(self, expr: str, collection_name: str = None) -> List[int]:
+        collection = self.collection(collection_name)
+        with collection.lock:
+            mask = collection.mask(expr, cache=False)
+            return [collection.pks[r] for r in np.flatnonzero(mask)]
+
+    def has_embeddings(self, ids: List[str], collection_name: str = None):
+        collection = self.collection(collection_name)
+        with collection.lock:
+            return [collection.pks[r] for r in collection.lookup(self.vertex_field, ids)]
+
+    async def aget_embedded_ids(self, ids: List[str], collection_name: str = None) -> set:
+        collection = self.collection(collection_name)
+        with collection.lock:
+            return {
+                collection.metadatas[r][self.vertex_field]
+                for r in collection.lookup(self.vertex_field, ids)
+            }
+
+    def remove_embeddings(
+        self, ids: Optional[List[str]] = None, expr: Optional[str] = None, collection_name: str = None
+    ):
+        """Remove Embeddings.
+        Remove embeddings from the vector store, by primary key or by filter expression.
+        """
+        if ids is None and expr is None:
+            raise ValueError("Either id string or expr string must be provided.")
+        LogWriter.info(f"request_id={req_id_cv.get()} Local ENTRY delete()")
+        if expr:
+            deleted = self.collection(collection_name).delete(self.get_pks(expr, collection_name))
+            message = f"Document(s) deleted by expression: {expr} {deleted}."
+        else:
+            deleted = self.collection(collection_name).delete([int(x) for x in ids])
+            message = f"Document(s) deleted by id(s): {ids} {deleted}."
+        LogWriter.info(f"request_id={req_id_cv.get()} Local EXIT delete()")
+        return message
+
+    def _document(self, collection: _Collection, row: int) -> Document:
+        metadata = dict(collection.metadatas[row])
+        metadata["pk"] = str(collection.pks[row])
+        return Document(page_content=collection.texts[row], metadata=metadata)
+
+    def retrieve_similar(self, query_embedding, top_k=10, filter_expr: str = None):
+        """Retrieve Similar.
+        Retrieve similar embeddings from the vector store given a query embedding.
+        Args:
+            query_embedding (List[float]):
+                The embedding to search with.
+            top_k (int, optional):
+                The number of documents to return. Defaults to 10.
+            filter_expr (str, optional):
+                Filter expression to apply to the query. Defaults to None.
+        """
+        res = self.retrieve_similar_with_score(query_embedding, top_k=top_k, filter_expr=filter_expr)
+        return [doc for doc, _ in res]
+
+    def retrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, collection_name: str = None):
+        """Retrieve Similar With Score.
+        Retrieve similar documents and their cosine similarity, most similar first.
+        Like the Milvus store, at least top_k documents are returned, and up to
+        2 * top_k when more of them are above similarity_threshold.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} Local ENTRY retrieve_similar_with_score()")
+        collection = self.collection(collection_name)
+        with collection.lock:
+            found = collection.search(query_embedding, top_k * 2, filter_expr)
+            scores = np.fromiter((score for _, score in found), dtype=np.float64, count=len(found))
+            similar = [
+                (self._document(collection, found[i][0]), found[i][1])
+                for i in search_results.select(scores, top_k, similarity_threshold)
+            ]
+        LogWriter.info(f"request_id={req_id_cv.get()} Local EXIT retrieve_similar_with_score()")
+        return similar
+
+    async def aretrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, collection_name: str = None):
+        return self.retrieve_similar_with_score(
+            query_embedding,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold,
+            filter_expr=filter_expr,
+            collection_name=collection_name,
+        )
+
+    def query(self, expr: str, output_fields: List[str], limit: int = None, collection_name: str = None):
+        """Get output fields with expression
+
+        Args:
+            expr: Expression - E.g: "graphname == 'all'"
+
+        Returns:
+            List of dicts with the primary key and the requested fields ("*" for all but the vector)
+        """
+        collection = self.collection(collection_name)
+        with collection.lock:
+            rows = np.flatnonzero(collection.mask(expr, cache=False))[:limit]
+            vectors = collection.vectors(rows) if self.vector_field in output_fields else None
+            res = []
+            for i, row in enumerate(rows):
+                fields = {**collection.metadatas[row], self.text_field: collection.texts[row]}
+                if "*" not in output_fields:
+                    fields = {f: fields.get(f) for f in output_fields if f in fields}
+                if vectors is not None:
+                    fields[self.vector_field] = vectors[i].tolist()
+                res.append({"pk": collection.pks[row], **fields})
+            return res
+
+    def list_registered_documents(
+        self,
+        graphname: str = None,
+        only_custom: bool = False,
+        output_fields: List[str] = ["*"],
+    ):
+        if only_custom and graphname:
+            return self.query(
+                "custom_query == true and graphname == " + json.dumps(graphname), output_fields
+            )
+        elif only_custom:
+            return self.query("custom_query == true", output_fields)
+        elif graphname:
+            return self.query("graphname == " + json.dumps(graphname), output_fields)
+        return self.query("", output_fields, limit=5000)
+
+    def edit_dist_check(self, a: str, b: str, edit_dist_threshold: float):
+        a = a.lower()
+        b = b.lower()
+        # if the words are short, they should be the same
+        if len(a) < 5 and len(b) < 5:
+            return a == b
+
+        # edit_dist_threshold (as a percent) of word must match
+        threshold = int(min(len(a), len(b)) * (1 - edit_dist_threshold))
+        return lev.distance(a, b) < threshold
+
+    async def aget_k_closest(
+        self, v_id: str, k=10, threshold_similarity=0.90, edit_dist_threshold_pct=0.75
+    ) -> set:
+        collection = self.collection()
+        result = {v_id}
+        with collection.lock:
+            rows = collection.lookup(self.vertex_field, [v_id])
+            for vector in collection.vectors(rows):
+                for row, score in collection.search(vector, k):
+                    other = collection.metadatas[row].get(self.vertex_field)
+                    # check semantic and name similarity
+                    # (won't merge Apple and Google if they're semantically similar)
+                    if (
+                        score >= threshold_similarity
+                        and other != v_id
+                        and self.edit_dist_check(other, v_id, edit_dist_threshold_pct)
+                    ):
+                        result.add(other)
+        return result
+
+    async def aget_embeddings(self, v_ids: List[str]) -> List[Tuple[str, List[float]]]:
+        """Async Get Embeddings.
+        Fetch the stored vectors of many vertices.
+        Returns:
+            (vertex id, vector) pairs. Vertices without vectors are left out.
+        """
+        if len(v_ids) == 0:
+            return []
+        collection = self.collection()
+        with collection.lock:
+            rows = collection.lookup(self.vertex_field, v_ids)
+            vectors = collection.vectors(rows)
+            return [
+                (collection.metadatas[row][self.vertex_field], vector.tolist())
+                for row, vector in zip(rows, vectors)
+            ]
+
+    def snapshot(self, collection_name: str = None):
+        """Write a new snapshot of the collection, compacting deleted rows away."""
+        self.collection(collection_name).snapshot()
+
+    def add_connection_parameters(self, query_params: dict) -> dict:
+        # the index lives in this process, so there is nothing for GSQL queries to connect to
+        return query_params
@@ -1,10 +1,15 @@
+import asyncio
+import json
 import logging
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from time import sleep, time
 from typing import Iterable, List, Optional, Tuple
 
 import Levenshtein as lev
-from asyncer import asyncify
+import numpy as np
 from langchain_community.vectorstores import Milvus
 from langchain_core.documents.base import Document
 # from langchain_milvus.vectorstores import Milvus
@@ -12,6 +17,7 @@ from langchain_community.vectorstores.milvus import Milvus
 from pymilvus import MilvusException, connections, utility
 from pymilvus.exceptions import MilvusException
 
+from common.embeddings import search_results
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.embedding_services import EmbeddingModel
 from common.logs.log import req_id_cv
@@ -20,6 +26,67 @@ from common.metrics.prometheus_metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# connections are shared by every store in the process, one per alias
+_connected_aliases = set()
+_connect_lock = threading.Lock()
+# pymilvus is synchronous: async calls run on this pool, on the alias's shared connection
+_executor = None
+MILVUS_WORKERS = 16
+
+# index presets, selected with milvus_config["quantization"]. The quantized indexes
+# keep compact codes in memory (1 byte per dimension for int8, m bytes per vector for
+# pq), while the full-precision vectors stay in storage for reranking.
+INDEX_PRESETS = {
+    "none": {"index_type": "HNSW", "params": {"M": 64, "efConstruction": 360}, "search_params": {}},
+    "int8": {"index_type": "IVF_SQ8", "params": {"nlist": 1024}, "search_params": {"nprobe": 32}},
+    "pq": {"index_type": "IVF_PQ", "params": {"nlist": 1024, "m": 16, "nbits": 8}, "search_params": {"nprobe": 32}},
+}
+DEFAULT_RERANK_FACTOR = 4
+
+
+def index_options(milvus_config: dict) -> dict:
+    """
+    MilvusEmbeddingStore index arguments from milvus_config:
+    "quantization" picks a preset ("none", "int8" or "pq"), "index_type", "index_params"
+    and "search_params" override it, and "rerank_factor" sets how many candidates per
+    result are reranked with full-precision vectors (default 4 when quantized, else 1)
+    """
+    quantization = str(milvus_config.get("quantization") or "none").lower()
+    if quantization not in INDEX_PRESETS:
+        raise ValueError(
+            f"Unknown quantization {quantization}, expected one of {list(INDEX_PRESETS)}"
+        )
+    preset = INDEX_PRESETS[quantization]
+    index_type = milvus_config.get("index_type", preset["index_type"])
+    # preset params only apply to the preset's own index type
+    same_type = index_type == preset["index_type"]
+    return {
+        "index_type": index_type,
+        "index_params": {**(preset["params"] if same_type else {}), **milvus_config.get("index_params", {})},
+        "search_params": {**(preset["search_params"] if same_type else {}), **milvus_config.get("search_params", {})},
+        "rerank_factor": int(milvus_config.get(
+            "rerank_factor", 1 if quantization == "none" else DEFAULT_RERANK_FACTOR
+        )),
+    }
+
+
+def _connect(milvus_connection: dict):
+    alias = milvus_connection["alias"]
+    with _connect_lock:
+        if alias not in _connected_aliases:
+            connections.connect(**milvus_connection)
+            _connected_aliases.add(alias)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _connect_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MILVUS_WORKERS, thread_name_prefix="milvus"
+            )
+    return _executor
+
 
 class MilvusEmbeddingStore(EmbeddingStore):
     def __init__(
@@ -39,6 +106,10 @@ class MilvusEmbeddingStore(EmbeddingStore):
         retry_interval: int = 2,
         max_retry_attempts: int = 10,
         drop_old=False,
+        index_type: str = "HNSW",
+        index_params: dict = None,
+        search_params: dict = None,
+        rerank_factor: int = 1,
     ):
         self.embedding_service = embedding_service
         self.vector_field = vector_field
@@ -51,6 +122,20 @@ class MilvusEmbeddingStore(EmbeddingStore):
         self.retry_interval = retry_interval
         self.max_retry_attempts = max_retry_attempts
         self.drop_old = drop_old
+        self.index_type = index_type
+        self.index_params = (
+            index_params if index_params is not None else {"M": 64, "efConstruction": 360}
+        )
+        self.search_params = search_params or {}
+        if rerank_factor > 1 and self.metric_type not in ("COSINE", "IP"):
+            LogWriter.warning(
+                f"Reranking isn't supported with metric {self.metric_type}, disabling it"
+            )
+            rerank_factor = 1
+        self.rerank_factor = max(1, rerank_factor)
+        # (collection name, vector field, text field) -> LangChain Milvus wrapper
+        self._collections = {}
+        self._collections_lock = threading.Lock()
 
         if host.startswith("http"):
             if host.endswith(str(port)):
@@ -91,16 +176,41 @@ class MilvusEmbeddingStore(EmbeddingStore):
         self.connect_to_milvus()
 
     def connect_to_milvus(self):
+        self.milvus = self.collection(self.collection_name)
+
+    def collection(self, collection_name: str) -> Milvus:
+        """Collection.
+        Get the handle of a collection, connecting and building it on first use.
+        Handles are cached per collection, so switching between collections
+        doesn't reconnect or rebuild the LangChain wrapper.
+        Args:
+            collection_name (str):
+                The name of the collection.
+        Returns:
+            The LangChain Milvus wrapper of the collection.
+        """
+        key = (collection_name, self.vector_field, self.text_field)
+        milvus = self._collections.get(key)
+        if milvus is not None:
+            return milvus
+        # one build per collection, concurrent first searches wait for it
+        with self._collections_lock:
+            if key not in self._collections:
+                self._collections[key] = self._connect_collection(collection_name)
+            return self._collections[key]
+
+    def _connect_collection(self, collection_name: str) -> Milvus:
         retry_attempt = 0
         while retry_attempt < self.max_retry_attempts:
             try:
-                connections.connect(**self.milvus_connection)
+                _connect(self.milvus_connection)
                 # metrics.milvus_active_connections.labels(self.collection_name).inc
-                self.milvus = Milvus(
+                milvus = Milvus(
                     embedding_function=self.embedding_service,
-                    collection_name=self.collection_name,
-                    index_params={"metric_type": self.metric_type, "index_type": "HNSW", "params": {"M": 64, "efConstruction": 360}},
-                    search_params={"metric_type": self.metric_type},
+                    collection_name=collection_name,
+                    # only used when the collection is created, existing collections keep their index
+                    index_params={"metric_type": self.metric_type, "index_type": self.index_type, "params": self.index_params},
+                    search_params={"metric_type": self.metric_type, "params": self.search_params},
                     connection_args=self.milvus_connection,
                     auto_id=True,
                     drop_old=self.drop_old,
@@ -109,10 +219,10 @@ class MilvusEmbeddingStore(EmbeddingStore):
                 )
                 LogWriter.info(
                     f"""Initializing Milvus with host={self.milvus_connection.get("host", self.milvus_connection.get("uri", "unknown host"))},
-                    port={self.milvus_connection.get('port', 'unknown')}, username={self.milvus_connection.get('user', 'unknown')}, alias={self.milvus_connection.get('alias', 'unknown')}, collection={self.collection_name}, metric_type={self.metric_type}, vector_field={self.vector_field}, text_field={self.text_field}, vertex_field={self.vertex_field}"""
+                    port={self.milvus_connection.get('port', 'unknown')}, username={self.milvus_connection.get('user', 'unknown')}, alias={self.milvus_connection.get('alias', 'unknown')}, collection={collection_name}, metric_type={self.metric_type}, index_type={self.index_type}, vector_field={self.vector_field}, text_field={self.text_field}, vertex_field={self.vertex_field}"""
                 )
-                LogWriter.info(f"Milvus version {utility.get_server_version()}")
-                return
+                LogWriter.info(f"Milvus version {utility.get_server_version(using=self.milvus_alias)}")
+                return milvus
             except MilvusException as e:
                 retry_attempt += 1
                 if retry_attempt >= self.max_retry_attempts:
@@ -121,10 +231,17 @@ class MilvusEmbeddingStore(EmbeddingStore):
                     LogWriter.info(
                         f"Failed to connect to Milvus. Retrying in {self.retry_interval} seconds."
                     )
+                    with _connect_lock:
+                        _connected_aliases.discard(self.milvus_alias)
                     sleep(self.retry_interval)
 
+    async def _run(self, func, *args, **kwargs):
+        # run a blocking pymilvus call on the shared pool
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
     def check_collection_exists(self):
-        connections.connect(**self.milvus_connection)
+        _connect(self.milvus_connection)
         return utility.has_collection(self.collection_name, using=self.milvus_alias)
 
     def load_documents(self):
@@ -280,7 +397,7 @@ class MilvusEmbeddingStore(EmbeddingStore):
             # ).inc()
             # start_time = time()
 
-            added = await self.milvus.aadd_texts(texts=texts, metadatas=metadatas)
+            added = await self._run(self.milvus.add_texts, texts=texts, metadatas=metadatas)
 
             # duration = time() - start_time
             # metrics.milvus_query_duration_seconds.labels(
@@ -487,11 +604,17 @@ class MilvusEmbeddingStore(EmbeddingStore):
             raise e
 
     def retrieve_similar(self, query_embedding, top_k=10, filter_expr: str = None):
-        res = retrieve_similar_with_score(query_embedding, top_k=top_k, filter_expr=filter_expr)
-        similar = [doc[0] for doc in res]
+        """Retrieve Similar.
+        Retrieve the top_k most similar documents, without a similarity threshold.
+        """
+        similar = self.milvus.similarity_search_by_vector(
+            embedding=query_embedding, k=top_k, expr=filter_expr
+        )
+        for doc in similar:
+            doc.metadata["pk"] = str(doc.metadata["pk"])
         return similar
 
-    def retrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None):
+    def retrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, collection_name: str = None):
         """Retireve Similar.
         Retrieve similar embeddings from the vector store given a query embedding.
         Args:
@@ -499,6 +622,8 @@ class MilvusEmbeddingStore(EmbeddingStore):
                 The embedding to search with.
             top_k (int, optional):
                 The number of documents to return. Defaults to 10.
+            collection_name (str, optional):
+                The collection to search, instead of the current one.
         Returns:
             https://api.python.langchain.com/en/latest/documents/langchain_core.documents.base.Document.html#langchain_core.documents.base.Document
             Document results for search.
@@ -508,44 +633,84 @@ class MilvusEmbeddingStore(EmbeddingStore):
                 f"request_id={req_id_cv.get()} Milvus ENTRY similarity_search_by_vector()"
             )
 
+            if collection_name is None:
+                collection_name = self.collection_name
+                milvus = self.milvus
+            else:
+                milvus = self.collection(collection_name)
+
+            if milvus.col is None:
+                return []
+
             start_time = time()
             metrics.milvus_query_total.labels(
-                self.collection_name, "similarity_search_by_vector"
+                collection_name, "similarity_search_by_vector"
             ).inc()
-            similar = self.milvus.similarity_search_with_score_by_vector(
-                embedding=query_embedding, k=top_k*2, expr=filter_expr
-            )
+            # search the collection directly (as similarity_search_with_score_by_vector does),
+            # so Documents are only built for the results that are returned
+            output_fields = [f for f in milvus.fields if f != milvus._vector_field]
+            rerank = self.rerank_factor > 1
+            hits = milvus.col.search(
+                data=[query_embedding],
+                anns_field=milvus._vector_field,
+                param=milvus.search_params,
+                # with reranking, over-fetch candidates from the (quantized) index
+                limit=top_k * 2 * self.rerank_factor,
+                expr=filter_expr,
+                output_fields=output_fields + [milvus._vector_field] if rerank else output_fields,
+                timeout=milvus.timeout,
+            )[0]
             end_time = time()
             metrics.milvus_query_duration_seconds.labels(
-                self.collection_name, "similarity_search_by_vector"
+                collection_name, "similarity_search_by_vector"
             ).observe(end_time - start_time)
 
-            sim_ids = [doc[0].metadata.get("function_header") for doc in similar]
+            if rerank and len(hits):
+                # rescore the candidates with their full-precision vectors
+                scores = search_results.exact_scores(
+                    query_embedding,
+                    [hit.entity.get(milvus._vector_field) for hit in hits],
+                    self.metric_type,
+                )
+            else:
+                scores = np.fromiter((hit.score for hit in hits), dtype=np.float64, count=len(hits))
+            similar = []
+            for i in search_results.select(scores, top_k, similarity_threshold):
+                doc = milvus._parse_document(
+                    {f: hits[i].entity.get(f) for f in output_fields}
+                )
+                # Convert pk from int to str
+                doc.metadata["pk"] = str(doc.metadata["pk"])
+                similar.append((doc, float(scores[i])))
+
             logger.debug(
-                f"request_id={req_id_cv.get()} Milvus similarity_search_by_vector() retrieved={sim_ids}"
+                f"request_id={req_id_cv.get()} Milvus similarity_search_by_vector() retrieved={[doc.metadata.get('function_header') for doc, _ in similar]}"
             )
-            # Convert pk from int to str for each document
-            for doc in similar:
-                doc[0].metadata["pk"] = str(doc[0].metadata["pk"])
             LogWriter.info(
                 f"request_id={req_id_cv.get()} Milvus EXIT similarity_search_by_vector()"
             )
-
-            similar.sort(key=lambda x: x[1], reverse=True)
-            i = 0
-            for i in range(len(similar)):
-                if similar[i][1] < similarity_threshold:
-                    break
-            if i <= top_k:
-                return similar[:top_k]
-            else:
-                return similar[:i]
+            return similar
 
         except Exception as e:
             error_message = f"An error occurred while retrieving docuements: {str(e)}"
             LogWriter.error(error_message)
             raise e
 
+    async def aretrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, collection_name: str = None):
+        """Async Retrieve Similar.
+        Same as retrieve_similar_with_score, run on the shared Milvus pool so that
+        searches over several collections can run concurrently. A collection seen
+        for the first time is connected there too, off the event loop.
+        """
+        return await self._run(
+            self.retrieve_similar_with_score,
+            query_embedding,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold,
+            filter_expr=filter_expr,
+            collection_name=collection_name,
+        )
+
     def add_connection_parameters(self, query_params: dict) -> dict:
         """Add Connection Parameters.
         Add connection parameters to the query parameters.
@@ -648,9 +813,8 @@ class MilvusEmbeddingStore(EmbeddingStore):
     ) -> list[Document]:
         threshold_dist = 1 - threshold_similarity
 
-        # asyncify necessary funcs
-        query = asyncify(self.milvus.col.query)
-        search = asyncify(self.milvus.similarity_search_with_score_by_vector)
+        query = partial(self._run, self.milvus.col.query)
+        search = partial(self._run, self.milvus.similarity_search_with_score_by_vector)
 
         # Get all vectors with this ID
         verts = await query(
@@ -683,5 +847,40 @@ class MilvusEmbeddingStore(EmbeddingStore):
         result.append(v_id)
         return set(result)
 
+    async def aget_embedded_ids(self, v_ids: List[str], batch_size: int = 5000) -> set[str]:
+        """Async Get Embedded IDs.
+        Find which of many vertices already have embeddings, with one query per `batch_size` ids.
+        Returns:
+            The set of vertex ids that have embeddings.
+        """
+        v_ids = list(v_ids)
+        embedded = set()
+        for i in range(0, len(v_ids), batch_size):
+            verts = await self._run(
+                self.milvus.col.query,
+                f"{self.vertex_field} in {json.dumps(v_ids[i : i + batch_size])}",
+                output_fields=[self.vertex_field],
+            )
+            embedded.update(v[self.vertex_field] for v in verts)
+        return embedded
+
+    async def aget_embeddings(self, v_ids: List[str]) -> List[Tuple[str, List[float]]]:
+        """Async Get Embeddings.
+        Fetch the stored vectors of many vertices with a single query.
+        Args:
+            v_ids (List[str]):
+                The vertex ids to fetch. A vertex can have several vectors.
+        Returns:
+            (vertex id, vector) pairs. Vertices without vectors are left out.
+        """
+        if len(v_ids) == 0:
+            return []
+        verts = await self._run(
+            self.milvus.col.query,
+            f"{self.vertex_field} in {json.dumps(list(v_ids))}",
+            output_fields=[self.vertex_field, self.vector_field],
+        )
+        return [(v[self.vertex_field], v[self.vector_field]) for v in verts]
+
     def __del__(self):
         metrics.milvus_active_connections.labels(self.collection_name).dec
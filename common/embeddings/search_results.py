@@ -0,0 +1,84 @@
+"""Ranking and merging of vector search results.
+
+Scores are kept in NumPy arrays and ranked with argpartition, so callers only
+build result objects (e.g. LangChain Documents) for the entries they return.
+"""
+from typing import Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+
+def top_indices(scores, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, highest first
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    # stable, so equal scores keep the search's order
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def select(scores, top_k: int, similarity_threshold: float) -> np.ndarray:
+    """
+    Indices of the results to return from a search that fetched up to 2 * top_k:
+    the top_k best, extended by any further results scoring at least similarity_threshold,
+    highest first
+    """
+    ranked = top_indices(scores, 2 * top_k)
+    ranked_scores = np.asarray(scores, dtype=np.float64)[ranked]
+    below = np.flatnonzero(ranked_scores < similarity_threshold)
+    n_above = below[0] if len(below) else len(ranked)
+    return ranked[: max(top_k, n_above)]
+
+
+def exact_scores(query, vectors, metric_type: str = "COSINE") -> np.ndarray:
+    """
+    Full-precision similarity of each of the vectors to the query, higher is better,
+    used to rerank the candidates of a search on a quantized index
+    """
+    query = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, len(query))
+    scores = vectors @ query
+    if metric_type.upper() == "COSINE":
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        scores = np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+    elif metric_type.upper() != "IP":
+        raise ValueError(f"Can't rerank with metric {metric_type}, only COSINE and IP")
+    return scores.astype(np.float64)
+
+
+class ResultMerger:
+    """
+    Merges the results of several searches (e.g. one per question and index),
+    keeping the best score of each key, such as (vertex_id, vertex_type)
+    """
+
+    def __init__(self):
+        self._positions = {}
+        self._keys = []
+        self._scores = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, keys: Iterable[Hashable], scores: Iterable[float]):
+        for key, score in zip(keys, scores):
+            pos = self._positions.get(key)
+            if pos is None:
+                self._positions[key] = len(self._keys)
+                self._keys.append(key)
+                self._scores.append(score)
+            elif score > self._scores[pos]:
+                self._scores[pos] = score
+
+    def top(self, k: int) -> List[Tuple[Hashable, float]]:
+        """
+        The k keys with the best scores, highest first
+        """
+        return [(self._keys[i], self._scores[i]) for i in top_indices(self._scores, k)]
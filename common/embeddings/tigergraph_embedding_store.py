@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import threading
 import traceback
 import json
 from time import sleep, time
@@ -6,20 +8,30 @@ from collections import defaultdict
 from typing import Iterable, List, Optional, Tuple
 
 import Levenshtein as lev
+import numpy as np
 from asyncer import asyncify
 from langchain_core.documents.base import Document
 
+from common.embeddings import search_results
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.embedding_services import EmbeddingModel
 from common.logs.log import req_id_cv
 from common.logs.logwriter import LogWriter
 from common.metrics.prometheus_metrics import metrics
 
-from pyTigerGraph import TigerGraphConnection
+from pyTigerGraph import AsyncTigerGraphConnection, TigerGraphConnection
 
 logger = logging.getLogger(__name__)
 
 
+class EmbeddingFailed(Exception):
+    """Raised when some documents could not be embedded; `failed` holds their vertex ids."""
+
+    def __init__(self, message: str, failed: list):
+        super().__init__(message)
+        self.failed = failed
+
+
 class TigerGraphEmbeddingStore(EmbeddingStore):
     def __init__(
         self,
@@ -44,6 +56,12 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
              )
         if conn.apiToken:
             self.conn.getToken()
+        self.aconn = self._make_async_conn()
+        # graph name -> (connection, async connection) for searches on that graph,
+        # and the graphs whose vector queries are known to be installed
+        self._graph_conns = {}
+        self._installed_graphs = set()
+        self._graph_lock = threading.Lock()
 
         tg_version = self.conn.getVer()
         ver = tg_version.split(".")
@@ -59,25 +77,29 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
         else:
             raise Exception(f"Current TigerGraph version {ver} does not support vector feature!")
 
-    def install_vector_queries(self):
-        logger.info(f"Installing vector queries")
+    def install_vector_queries(self, graphname: str = None):
+        """Install the vector queries on graphname (by default the store's graph) if missing."""
+        conn = self.conn if graphname is None else self._graph_conn(graphname)[0]
+        logger.info(f"Installing vector queries on graph {conn.graphname}")
         vector_queries = [
             "vertices_have_embedding",
             "check_embedding_exists",
             "get_vertices_with_vector",
             "get_topk_similar",
             "get_topk_closest",
+            "get_embeddings",
+            "get_embedded_ids",
         ]
 
-        installed_queries = [q.split("/")[-1] for q in self.conn.getEndpoints(dynamic=True) if f"/{self.conn.graphname}/" in q]
+        installed_queries = [q.split("/")[-1] for q in conn.getEndpoints(dynamic=True) if f"/{conn.graphname}/" in q]
         need_install = False
         for q_name in vector_queries:
             if q_name not in installed_queries:
                 with open(f"common/gsql/vector/{q_name}.gsql", "r") as f:
                     q_body = f.read()
-                q_res = self.conn.gsql(
+                q_res = conn.gsql(
                     """USE GRAPH {}\nBEGIN\n{}\nEND\ninstall query {}\n""".format(
-                        self.conn.graphname, q_body, q_name
+                        conn.graphname, q_body, q_name
                     )
                 )
                 need_install = True
@@ -93,9 +115,69 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
             logger.info(f"Done installing supportai query all with status {query_res}")
         else:
             logger.info(f"Query installation is not needed for supportai")
+        self._installed_graphs.add(conn.graphname)
+
+    def _graph_ready(self, graphname: str) -> bool:
+        return graphname in self._installed_graphs and graphname in self._graph_conns
+
+    def ensure_vector_queries(self, graphname: str):
+        """Connect to graphname and install the vector queries on it, once per graph
+        for the life of the store. Call before searching graphname."""
+        if self._graph_ready(graphname):
+            return
+        with self._graph_lock:
+            self._graph_conn(graphname)
+            if graphname not in self._installed_graphs:
+                self.install_vector_queries(graphname)
+
+    async def aensure_vector_queries(self, graphname: str):
+        """Same as ensure_vector_queries. Connecting and installing make blocking
+        requests, so they run off the event loop."""
+        if not self._graph_ready(graphname):
+            await asyncio.to_thread(self.ensure_vector_queries, graphname)
+
+    def _graph_conn(self, graphname: str) -> Tuple[TigerGraphConnection, AsyncTigerGraphConnection]:
+        # a request searches its own graph without switching the store's shared connection
+        conns = self._graph_conns.get(graphname)
+        if conns is None:
+            conn = TigerGraphConnection(
+                host=self.conn.host,
+                username=self.conn.username,
+                password=self.conn.password,
+                graphname=graphname,
+                restppPort=self.conn.restppPort,
+                gsPort=self.conn.gsPort,
+                tgCloud=self.conn.tgCloud,
+                useCert=self.conn.useCert,
+                certPath=self.conn.certPath,
+                sslPort = self.conn.sslPort,
+                apiToken = self.conn.apiToken,
+                jwtToken = self.conn.jwtToken,
+            )
+            conns = self._graph_conns.setdefault(graphname, (conn, self._make_async_conn(conn)))
+        return conns
+
+    def _make_async_conn(self, conn: TigerGraphConnection = None) -> AsyncTigerGraphConnection:
+        # async twin of conn (self.conn by default), used so vector writes don't block the event loop
+        conn = conn or self.conn
+        return AsyncTigerGraphConnection(
+                host=conn.host,
+                username=conn.username,
+                password=conn.password,
+                graphname=conn.graphname,
+                restppPort=conn.restppPort,
+                gsPort=conn.gsPort,
+                tgCloud=conn.tgCloud,
+                useCert=conn.useCert,
+                certPath=conn.certPath,
+                sslPort = conn.sslPort,
+                apiToken = conn.apiToken,
+                jwtToken = conn.jwtToken,
+             )
 
     def set_graphname(self, graphname):
         self.conn.graphname = graphname
+        self.aconn.graphname = graphname
         self.install_vector_queries()
 
     def set_connection(self, conn):
@@ -114,6 +196,10 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
              )
         if conn.apiToken:
             self.conn.getToken()
+        self.aconn = self._make_async_conn()
+        with self._graph_lock:
+            self._graph_conns.clear()
+            self._installed_graphs.clear()
 
         self.install_vector_queries()
 
@@ -145,13 +231,14 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
                 "vertices": defaultdict(dict[str, any]),
             }
 
-            for i, (text, _) in enumerate(embeddings):
+            texts = [text for text, _ in embeddings]
+            try:
+                vectors = self.embedding_service.embed_documents(texts)
+            except Exception as e:
+                LogWriter.error(f"Failed to embed {[m.get('vertex_id') for m in metadatas]}: {e}")
+                return
+            for i, embedding in enumerate(vectors):
                 (v_id, v_type) = metadatas[i].get("vertex_id")
-                try:
-                    embedding = self.embedding_service.embed_query(text)
-                except Exception as e:
-                    LogWriter.error(f"Failed to embed {v_id}: {e}")
-                    return
                 attr = self.map_attrs([("embedding", embedding)])
                 batch["vertices"][v_type][v_id] = attr
             data = json.dumps(batch)
@@ -175,16 +262,53 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
             error_message = f"An error occurred while registering document: {str(e)}"
             LogWriter.error(error_message)
 
+    async def _aembed_texts(
+        self, texts: List[str], v_ids: List[Tuple[str, str]]
+    ) -> Tuple[List[Optional[List[float]]], List[Tuple[str, str]]]:
+        """Embed a batch of texts with a single request.
+        If the batch request fails, fall back to embedding each text on its own
+        so one bad input doesn't sink the rest of the batch.
+        Returns:
+            The embeddings (None where a text failed), the ids that failed and the first error.
+        """
+        try:
+            return await self.embedding_service.aembed_documents(texts), [], None
+        except Exception as e:
+            logger.warning(f"Batch embedding of {len(texts)} texts failed, retrying one by one: {e}")
+
+        results = await asyncio.gather(
+            *[self.embedding_service.aembed_query(text) for text in texts],
+            return_exceptions=True,
+        )
+        vectors, failed, error = [], [], None
+        for v_id, res in zip(v_ids, results):
+            if isinstance(res, Exception):
+                LogWriter.error(f"Failed to embed {v_id}: {res}")
+                failed.append(v_id)
+                vectors.append(None)
+                error = error or res
+            else:
+                vectors.append(res)
+        return vectors, failed, error
+
     async def aadd_embeddings(
         self,
         embeddings: Iterable[Tuple[str, List[float]]],
         metadatas: List[dict] = None,
     ):
         """Add Embeddings.
-        Add embeddings to the Embedding store.
+        Add embeddings to the Embedding store. All texts are embedded with one
+        request and the vertices are upserted in one batch over the async connection.
         Args:
             embeddings (Iterable[Tuple[str, List[float]]]):
                 Iterable of content and embedding of the document.
+            metadatas (List[Dict]):
+                List of dictionaries containing the (vertex_id, vertex_type) of each document
+                under "vertex_id". The embeddings and metadatas list need to have identical indexing.
+        Raises:
+            EmbeddingFailed: if some texts could not be embedded (the rest are still registered);
+                its `failed` attribute lists their vertex ids.
+            Exception: if the vertices could not be registered at all.
         """
         try:
             LogWriter.info(
@@ -196,62 +320,67 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
                 "vertices": defaultdict(dict[str, any]),
             }
 
-            for i, (text, _) in enumerate(embeddings):
-                (v_id, v_type) = metadatas[i].get("vertex_id")
-                try:
-                    embedding = await self.embedding_service.aembed_query(text)
-                except Exception as e:
-                    LogWriter.error(f"Failed to embed {v_id}: {e}")
-                    return
+            texts = [text for text, _ in embeddings]
+            v_ids = [metadata.get("vertex_id") for metadata in metadatas]
+            vectors, failed, error = await self._aembed_texts(texts, v_ids)
+
+            for (v_id, v_type), embedding in zip(v_ids, vectors):
+                if embedding is None:
+                    continue
                 attr = self.map_attrs([("embedding", embedding)])
                 batch["vertices"][v_type][v_id] = attr
+
+            n_verts = sum(len(v) for v in batch["vertices"].values())
+            if n_verts == 0:
+                raise EmbeddingFailed(f"Failed to embed all documents {failed}: {error}", failed) from error
+
             data = json.dumps(batch)
-            added = self.conn.upsertData(data)
+            added = await self.aconn.upsertData(data)
 
             duration = time() - start_time
 
             LogWriter.info(f"request_id={req_id_cv.get()} TigerGraph EXIT aadd_embeddings()")
 
             # Check if registration was successful
-            if added:
-                success_message = f"Document {metadatas} registered with status: {added}"
-                LogWriter.info(success_message)
-                return success_message
-            else:
-                error_message = f"Failed to register document {metadatas} with status {added}"
-                LogWriter.error(error_message)
-                raise Exception(error_message)
+            if not added or added.get("accepted_vertices", 0) < n_verts:
+                raise Exception(f"Failed to register documents {v_ids} with status {added}")
+            success_message = f"Registered {n_verts} documents in {duration:.2f}s with status: {added}"
+            LogWriter.info(success_message)
+            if failed:
+                raise EmbeddingFailed(f"Failed to embed {failed}: {error}", failed) from error
+            return success_message
 
         except Exception as e:
             error_message = f"An error occurred while registering document: {str(e)}"
             LogWriter.error(error_message)
+            raise
 
     def has_embeddings(
         self,
         v_ids: Iterable[Tuple[str, str]]
     ):
-        ret = True
+        """
+        Whether all the (vertex id, vertex type) pairs have embeddings,
+        checked with one query per vertex type
+        """
+        ids_by_type = defaultdict(set)
+        for (v_id, v_type) in v_ids:
+            ids_by_type[v_type].add(v_id)
         try:
-            for (v_id, v_type) in v_ids:
+            for v_type, ids in ids_by_type.items():
                 res = self.conn.runInstalledQuery(
-                    "check_embedding_exists",
-                    params={
-                        "vertex_type": v_type,
-                        "vertex_id": v_id,
-                    }
+                    "get_embedded_ids",
+                    params={"vertex_type": v_type, "vertex_ids": list(ids)},
+                    usePost=True,
                 )
-                logger.info(f"Return result {res} for has_embeddings({v_ids})")
-                found = False
-                if "results" in res[0]:
-                    for v in res[0]["results"]:
-                        if v["v_id"] == v_id:
-                            found = True
-                            break
-                ret = ret and found 
+                logger.info(f"Return result {res} for has_embeddings({v_type}, {len(ids)} ids)")
+                found = {v["v_id"] for r in res for v in r.get("results", [])}
+                if not ids <= found:
+                    return False
         except Exception as e:
-            logger.info(f"Exception {str(e)} when running has_embeddings({v_type}, {v_id}), return False")
-            ret = False
-        return ret
+            logger.info(f"Exception {str(e)} when running has_embeddings({v_ids}), return False")
+            return False
+        return True
 
     def check_embedding_rebuilt(
         self,
@@ -277,11 +406,11 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
         return
 
     def retrieve_similar(self, query_embedding, top_k=10, filter_expr: str = None, vertex_types: List[str] = ["DocumentChunk"]):
-        res = retrieve_similar_with_score(query_embedding, top_k=top_k, filter_expr=filter_expr, vertex_types=vertex_types)
+        res = self.retrieve_similar_with_score(query_embedding, top_k=top_k, filter_expr=filter_expr, vertex_types=vertex_types)
         similar = [x[0] for x in res]
         return similar
 
-    def retrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, vertex_types: List[str] = ["DocumentChunk"]):
+    def retrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, vertex_types: List[str] = ["DocumentChunk"], graphname: str = None):
         """Retireve Similar.
         Retrieve similar embeddings from the vector store given a query embedding.
         Args:
@@ -289,6 +418,8 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
                 The embedding to search with.
             top_k (int, optional):
                 The number of documents to return. Defaults to 10.
+            graphname (str, optional):
+                The graph to search. Defaults to the store's graph.
         Returns:
             https://api.python.langchain.com/en/latest/documents/langchain_core.documents.base.Document.html#langchain_core.documents.base.Document
             Document results for search.
@@ -297,7 +428,8 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
             logger.info(f"Fetch {top_k} similar entries from {vertex_types} with filter {filter_expr}")
 
             start_time = time()
-            verts = self.conn.runInstalledQuery(
+            conn = self.conn if graphname is None else self._graph_conn(graphname)[0]
+            verts = conn.runInstalledQuery(
                 "get_topk_similar",
                 params={
                     "vertex_types": vertex_types,
@@ -308,30 +440,49 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
             )
             end_time = time()
             logger.info(f"Got {top_k} similar entries: {verts}")
-            similar = []
-            for r in verts:
-                if "results" in r:
-                    for v in r["results"]:
-                        document = Document(
-                            page_content="",
-                            metadata={"vertex_id": v["v_id"], "vertex_type": v["v_type"]}
-                        )
-                        similar.append((document, v["score"]))
-
-            similar.sort(key=lambda x: x[1], reverse=True)
-            i = 0
-            for i in range(len(similar)):
-                if similar[i][1] < similarity_threshold:
-                    break
-            if i <= top_k:
-                return similar[:top_k]
-            else:
-                return similar[:i]
+            return self._similar_documents(verts, top_k, similarity_threshold)
+        except Exception as e:
+            error_message = f"An error occurred while retrieving docuements: {str(e)}"
+            LogWriter.error(error_message)
+            raise e
+
+    async def aretrieve_similar_with_score(self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None, vertex_types: List[str] = ["DocumentChunk"], graphname: str = None):
+        """Async Retrieve Similar.
+        Same as retrieve_similar_with_score, on the async connection.
+        """
+        try:
+            logger.info(f"Fetch {top_k} similar entries from {vertex_types} with filter {filter_expr}")
+            aconn = self.aconn if graphname is None else self._graph_conn(graphname)[1]
+            verts = await aconn.runInstalledQuery(
+                "get_topk_similar",
+                params={
+                    "vertex_types": vertex_types,
+                    "query_vector": query_embedding,
+                    "top_k": top_k*2,
+                    "expr": filter_expr,
+                }
+            )
+            logger.info(f"Got {top_k} similar entries: {verts}")
+            return self._similar_documents(verts, top_k, similarity_threshold)
         except Exception as e:
             error_message = f"An error occurred while retrieving docuements: {str(e)}"
             LogWriter.error(error_message)
             raise e
 
+    def _similar_documents(self, verts, top_k, similarity_threshold):
+        results = [v for r in verts for v in r.get("results", [])]
+        scores = np.fromiter((v["score"] for v in results), dtype=np.float64, count=len(results))
+        return [
+            (
+                Document(
+                    page_content="",
+                    metadata={"vertex_id": results[i]["v_id"], "vertex_type": results[i]["v_type"]},
+                ),
+                results[i]["score"],
+            )
+            for i in search_results.select(scores, top_k, similarity_threshold)
+        ]
+
     def add_connection_parameters(self, query_params: dict) -> dict:
         """Add Connection Parameters.
         Add connection parameters to the query parameters.
@@ -350,7 +501,7 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
         logger.info(f"Fetch {k} closest entries for {vertex} with threshold {threshold_similarity}")
         # Get all vectors with this ID
         (v_id, v_type) = vertex
-        verts = self.conn.runInstalledQuery(
+        verts = await self.aconn.runInstalledQuery(
             "get_topk_closest",
             params={
                 "vertex_type": v_type,
@@ -367,6 +518,64 @@ class TigerGraphEmbeddingStore(EmbeddingStore):
         logger.info(f"Returning {result}")
         return set(result)
 
+    async def aget_embedded_ids(
+        self, vertices: Iterable[Tuple[str, str]], batch_size: int = 5000
+    ) -> set[Tuple[str, str]]:
+        """Async Get Embedded IDs.
+        Find which of many vertices already have embeddings,
+        with one query per vertex type and `batch_size` ids.
+        Args:
+            vertices (Iterable[Tuple[str, str]]):
+                The (vertex id, vertex type) pairs to check.
+        Returns:
+            The set of (vertex id, vertex type) pairs that have embeddings.
+        """
+        ids_by_type = defaultdict(list)
+        for (v_id, v_type) in vertices:
+            ids_by_type[v_type].append(v_id)
+
+        embedded = set()
+        for v_type, v_ids in ids_by_type.items():
+            for i in range(0, len(v_ids), batch_size):
+                res = await self.aconn.runInstalledQuery(
+                    "get_embedded_ids",
+                    params={"vertex_type": v_type, "vertex_ids": v_ids[i : i + batch_size]},
+                    usePost=True,
+                )
+                for r in res:
+                    for v in r.get("results", []):
+                        embedded.add((v["v_id"], v_type))
+        return embedded
+
+    async def aget_embeddings(
+        self, vertices: List[Tuple[str, str]]
+    ) -> List[Tuple[str, List[float]]]:
+        """Async Get Embeddings.
+        Fetch the stored vectors of many vertices with a single query.
+        Args:
+            vertices (List[Tuple[str, str]]):
+                The (vertex id, vertex type) pairs to fetch.
+        Returns:
+            (vertex id, vector) pairs. Vertices without vectors are left out.
+        """
+        ids_by_type = defaultdict(list)
+        for (v_id, v_type) in vertices:
+            ids_by_type[v_type].append(v_id)
+
+        result = []
+        for v_type, v_ids in ids_by_type.items():
+            res = await self.aconn.runInstalledQuery(
+                "get_embeddings",
+                params={"vertex_type": v_type, "vertex_ids": v_ids},
+                usePost=True,
+            )
+            for r in res:
+                for v in r.get("results", []):
+                    vector = v.get("attributes", {}).get("embedding")
+                    if vector:
+                        result.append((v["v_id"], vector))
+        return result
+
 
     def query(self, expr: str, output_fields: List[str]):
         """Get output fields with expression
@@ -72,6 +72,16 @@ class PrometheusMetrics(metaclass=SingletonMeta):
                 "Number of LLM responses that yielded an error result",
                 ["llm_model"],
             )
+            self.query_embedding_cache_hits_total = Counter(
+                "query_embedding_cache_hits_total",
+                "Number of query embeddings served from the in-memory cache",
+                ["llm_model"],
+            )
+            self.query_embedding_cache_misses_total = Counter(
+                "query_embedding_cache_misses_total",
+                "Number of query embeddings not found in the in-memory cache",
+                ["llm_model"],
+            )
 
             # collect metrics for Milvus
             self.milvus_active_connections = Gauge(
@@ -102,6 +112,43 @@ class PrometheusMetrics(metaclass=SingletonMeta):
                 ["endpoint"],
             )
 
+            # collect metrics for the eventual consistency service pipelines
+            self.ecc_stage_in_flight = Gauge(
+                "ecc_stage_in_flight",
+                "Number of workers of a pipeline stage currently running",
+                ["stage"],
+            )
+            self.ecc_stage_queue_depth = Gauge(
+                "ecc_stage_queue_depth",
+                "Number of jobs of a pipeline stage waiting to run",
+                ["stage"],
+            )
+            self.ecc_stage_concurrency_limit = Gauge(
+                "ecc_stage_concurrency_limit",
+                "Current concurrency limit of a pipeline stage",
+                ["stage"],
+            )
+            self.ecc_stage_items_total = Counter(
+                "ecc_stage_items_total",
+                "Number of items handled by a pipeline stage",
+                ["stage"],
+            )
+            self.ecc_stage_wait_seconds = Histogram(
+                "ecc_stage_wait_seconds",
+                "Time a pipeline stage spent blocked on its channels (get, put) or its concurrency limit (limiter)",
+                ["stage", "kind"],
+            )
+            self.ecc_stage_call_duration_seconds = Histogram(
+                "ecc_stage_call_duration_seconds",
+                "Duration of the calls made by a pipeline stage's workers",
+                ["stage"],
+            )
+            self.ecc_stage_duration_seconds = Histogram(
+                "ecc_stage_duration_seconds",
+                "Wall time of a pipeline stage within a GraphRAG run",
+                ["stage"],
+            )
+
             self.initialized = True
 
 
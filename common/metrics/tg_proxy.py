@@ -1,6 +1,7 @@
+import asyncio
 import time
 import re
-from pyTigerGraph import TigerGraphConnection
+from pyTigerGraph import AsyncTigerGraphConnection, TigerGraphConnection
 from common.metrics.prometheus_metrics import metrics
 from common.logs.logwriter import LogWriter
 import logging
@@ -118,3 +119,135 @@ class TigerGraphConnectionProxy:
                 resKey=None
             )
         metrics.tg_active_connections.dec()
+
+
+class AsyncTigerGraphConnectionProxy:
+    """Async counterpart of TigerGraphConnectionProxy, wrapping an AsyncTigerGraphConnection.
+    Its methods are coroutines, and runInstalledQuery polls for the result without blocking.
+    """
+
+    def __init__(self, tg_connection: AsyncTigerGraphConnection, auth_mode: str = "pwd"):
+        self.original_req = tg_connection._req
+        tg_connection._req = self._req
+        self._tg_connection = tg_connection
+        self.auth_mode = auth_mode
+        metrics.tg_active_connections.inc()
+
+    @classmethod
+    def from_connection(cls, conn: TigerGraphConnectionProxy) -> "AsyncTigerGraphConnectionProxy":
+        """Async twin of a request's connection, with the same credentials and token."""
+        tg_connection = conn._tg_connection
+        aconn = AsyncTigerGraphConnection(
+            host=tg_connection.host,
+            username=tg_connection.username,
+            password=tg_connection.password,
+            graphname=tg_connection.graphname,
+            restppPort=tg_connection.restppPort,
+            gsPort=tg_connection.gsPort,
+            tgCloud=tg_connection.tgCloud,
+            useCert=tg_connection.useCert,
+            certPath=tg_connection.certPath,
+            sslPort=tg_connection.sslPort,
+            apiToken=tg_connection.apiToken,
+            jwtToken=tg_connection.jwtToken,
+        )
+        # temp fix for path, as in get_db_connection_pwd
+        if aconn.restppPort == aconn.gsPort and "/restpp" not in aconn.restppUrl:
+            aconn.restppUrl = aconn.restppUrl + "/restpp"
+        if getattr(tg_connection, "responseConfigHeader", None):
+            aconn.responseConfigHeader = dict(tg_connection.responseConfigHeader)
+        return cls(aconn, auth_mode=conn.auth_mode)
+
+    def __getattr__(self, name):
+        original_attr = getattr(self._tg_connection, name)
+
+        if callable(original_attr):
+
+            def hooked(*args, **kwargs):
+                if name == "runInstalledQuery":
+                    return self._runInstalledQuery(*args, **kwargs)
+                else:
+                    return original_attr(*args, **kwargs)
+
+            return hooked
+        else:
+            return original_attr
+
+    async def _req(self, method: str, url: str, authMode: str = "token", *args, **kwargs):
+        # same routing as TigerGraphConnectionProxy._req
+        if self.auth_mode == "pwd":
+            return await self.original_req(method, url, authMode, *args, **kwargs)
+        else:
+            url = re.sub(r"/gsqlserver/", "/api/gsql-server/", url)
+            url = re.sub(r"/restpp/", "/api/restpp/", url)
+            return await self.original_req(method, url, "token", *args, **kwargs)
+
+    async def _runInstalledQuery(self, query_name, params, usePost=False):
+        start_time = time.time()
+        metrics.tg_inprogress_requests.labels(query_name=query_name).inc()
+        try:
+            restppid = await self._tg_connection.runInstalledQuery(
+                query_name, params, runAsync=True, usePost=usePost
+            )
+            LogWriter.info(
+                f"request_id={req_id_cv.get()} query {query_name} started with RESTPP ID {restppid}"
+            )
+            result = None
+            while not result:
+                ret = await self._tg_connection.checkQueryStatus(restppid)
+                if not ret:
+                    await asyncio.sleep(0.1)
+                    continue
+                if ret[0]["status"].lower() == "success":
+                    LogWriter.info(
+                        f"request_id={req_id_cv.get()} query {query_name} completed successfully with RESTPP ID {restppid}"
+                    )
+                    result = None
+                    for i in range(10):
+                        try:
+                            result = await self._tg_connection.getQueryResult(restppid)
+                            break
+                        except Exception as e:
+                            result = None
+                            if i >= 9:
+                                raise e
+                            await asyncio.sleep(0.1)
+                elif ret[0]["status"].lower() == "aborted":
+                    LogWriter.error(
+                        f"request_id={req_id_cv.get()} query {query_name} with RESTPP ID {restppid} aborted"
+                    )
+                    raise Exception(
+                        f"Query {query_name} with restppid {restppid} aborted"
+                    )
+                elif ret[0]["status"].lower() == "timeout":
+                    LogWriter.error(
+                        f"request_id={req_id_cv.get()} query {query_name} with restppid {restppid} timed out"
+                    )
+                    raise Exception(
+                        f"Query {query_name} with restppid {restppid} timed out"
+                    )
+                else:
+                    await asyncio.sleep(0.1)
+            success = True
+        except Exception as e:
+            LogWriter.error(f"Error running query {query_name}: {str(e)}")
+            success = False
+            raise e
+        finally:
+            metrics.tg_inprogress_requests.labels(query_name=query_name).dec()
+            duration = time.time() - start_time
+            metrics.tg_query_duration_seconds.labels(query_name=query_name).observe(
+                duration
+            )
+            metrics.tg_query_count.labels(query_name=query_name).inc()
+            if not success:
+                metrics.tg_query_error_total.labels(
+                    query_name=query_name, error_type="error"
+                ).inc()
+            else:
+                metrics.tg_query_success_total.labels(query_name=query_name).inc()
+        return result
+
+    def __del__(self):
+        # the token belongs to the connection this was made from, which deletes it
+        metrics.tg_active_connections.dec()
@@ -176,6 +176,7 @@ class Message(BaseModel):
 class ResponseType(enum.StrEnum):
     PROGRESS = enum.auto()
     MESSAGE = enum.auto()
+    CHUNK = enum.auto()
 
 
 class AgentProgess(BaseModel):
@@ -1,4 +1,4 @@
-import React, {useState, useCallback, useEffect, useContext} from 'react';
+import React, {useState, useCallback, useContext} from 'react';
 import {createClientMessage} from 'react-chatbot-kit';
 import useWebSocket, {ReadyState} from 'react-use-websocket';
 import Loader from '../components/Loader';
@@ -39,12 +39,27 @@ const ActionProvider: React.FC<ActionProviderProps> = ({
   const [messageHistory, setMessageHistory] = useState<MessageEvent<Message>[]>(
     [],
   );
-  const { sendMessage, lastMessage, readyState } = useWebSocket(WS_URL, {
+  const { sendMessage, readyState } = useWebSocket(WS_URL, {
     onOpen: () => {
       queryCopilotWs2(localStorage.getItem("creds")!);
       console.log("WebSocket connection established to " + WS_URL);
       sendMessage(localStorage.getItem("ragPattern") || "hnsw_overlap");
     },
+    // handled per message: lastMessage only keeps the latest of the answer chunks received between renders
+    onMessage: (event: MessageEvent) => {
+      setMessageHistory((prev) => prev.concat(event));
+      const data = JSON.parse(event.data);
+      setState((prev: any) => {
+        // answer chunks add up to the answer so far, until the final message replaces it
+        const prevMsg = prev.messages[prev.messages.length - 1]?.message;
+        if (data.response_type === "chunk" && prevMsg?.response_type === "chunk") {
+          data.content = prevMsg.content + data.content;
+        }
+        const botMessage = createChatBotMessage(data);
+        const newPrevMsg = prev.messages.slice(0, -1);
+        return {...prev, messages: [...newPrevMsg, botMessage]};  
+      });
+    },
   });
 
   // eslint-disable-next-line
@@ -115,17 +130,6 @@ const ActionProvider: React.FC<ActionProviderProps> = ({
   //   }, 2000);
   // };
 
-  useEffect(() => {
-    if (lastMessage !== null) {
-      setMessageHistory((prev) => prev.concat(lastMessage));
-      const botMessage = createChatBotMessage(JSON.parse(lastMessage.data));
-      console.log(botMessage.message);
-      setState((prev) => {
-        const newPrevMsg = prev.messages.slice(0, -1);
-        return {...prev, messages: [...newPrevMsg, botMessage]};  
-      });
-    }
-  }, [lastMessage]);
 
   // FOR REFERENCE
   // const queryCopilot = async (usrMsg: string) => {
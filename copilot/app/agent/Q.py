@@ -1,25 +1,53 @@
-from threading import Lock
+import asyncio
 
 
 DONE = "DONE"
 
 
+class Chunk(str):
+    """A piece of the answer being generated, as opposed to a progress message."""
+
+
 class Q:
-    def __init__(self):
-        self.q = []
-        self.l = Lock()
+    """Progress messages from an agent to its websocket.
+    put may be called from any thread (the sync agent graph runs in a worker thread);
+    the messages are handed to the event loop with call_soon_threadsafe, and get waits
+    for the next one without polling.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # bound to the loop of the first get()
+                loop = None
+        self.loop = loop
+        self.q = asyncio.Queue()
+
+    def _on_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
 
     def put(self, item):
-        with self.l:
-            self.q.append(item)
+        if self.loop is None or self._on_loop():
+            self.q.put_nowait(item)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.q.put_nowait, item)
 
-    def pop(self):
-        if len(self.q) > 0:
-            with self.l:
-                item = self.q[0]
-                self.q = self.q[1:]
-                return item
+    async def get(self):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        return await self.q.get()
 
+    def pop(self):
+        try:
+            return self.q.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
 
     def clear(self):
-        self.q.clear()
+        while not self.q.empty():
+            self.q.get_nowait()
@@ -1,14 +1,16 @@
 import logging
 import json
+import threading
 import time
+from collections import OrderedDict
 from typing import Dict, List
 
-from agent.agent_graph import TigerGraphAgentGraph
+from agent.agent_graph import TigerGraphAgentGraph, supportai_installed
 from agent.Q import Q
 from fastapi import WebSocket
-from tools import GenerateCypher, GenerateFunction, MapQuestionToSchema
 
 from common.config import embedding_service, embedding_store, llm_config
+from common.db.schema_cache import schema_cache
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.embedding_services import EmbeddingModel
 from common.llm_services import (
@@ -26,7 +28,7 @@ from common.llm_services.base_llm import LLM_Model
 from common.logs.log import req_id_cv
 from common.logs.logwriter import LogWriter
 from common.metrics.prometheus_metrics import metrics
-from common.metrics.tg_proxy import TigerGraphConnectionProxy
+from common.metrics.tg_proxy import AsyncTigerGraphConnectionProxy, TigerGraphConnectionProxy
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +47,10 @@ class TigerGraphAgent:
             a EmbeddingModel class that connects to an external embedding API service.
         embedding_store (EmbeddingStore):
             a EmbeddingStore class that connects to an embedding store to retrieve pyTigerGraph and custom query documentation from.
+        agent_graph (CompiledGraph, optional):
+            a compiled TigerGraphAgentGraph to reuse, e.g. from the AgentPool. Built for db_connection's graph if not given.
+        use_async (bool, optional):
+            build the graph with async nodes, to be run with aquestion_for_agent.
     """
 
     def __init__(
@@ -55,47 +61,34 @@ class TigerGraphAgent:
         embedding_store: EmbeddingStore,
         use_cypher: bool = False,
         ws=None,
-        supportai_retriever="hnsw_overlap"
+        supportai_retriever="hnsw_overlap",
+        agent_graph=None,
+        use_async: bool = False,
     ):
         self.conn = db_connection
+        self.use_async = use_async
 
         self.llm = llm_provider
         self.model_name = embedding_model.model_name
         self.embedding_model = embedding_model
         self.embedding_store = embedding_store
 
-        self.mq2s = MapQuestionToSchema(
-            self.conn, self.llm.model, self.llm.map_question_schema_prompt
-        )
-        self.gen_func = GenerateFunction(
-            self.conn,
-            self.llm.model,
-            self.llm.generate_function_prompt,
-            embedding_model,
-            embedding_store,
-        )
-
-        self.cypher_tool = None
-        if use_cypher:
-            self.cypher_tool = GenerateCypher(self.conn, self.llm)
-
         self.q = None
         if ws is not None:
             self.q = Q()
         else:
             self.q = None
 
-        self.agent = TigerGraphAgentGraph(
-            self.llm,
-            self.conn,
-            self.embedding_model,
-            self.embedding_store,
-            self.mq2s,
-            self.gen_func,
-            cypher_gen_tool=self.cypher_tool,
-            q=self.q,
-            supportai_retriever=supportai_retriever
-        ).create_graph()
+        if agent_graph is None:
+            agent_graph = TigerGraphAgentGraph(
+                self.llm,
+                self.conn,
+                self.embedding_model,
+                self.embedding_store,
+                use_cypher=use_cypher,
+                supportai_retriever=supportai_retriever
+            ).create_graph(use_async=use_async)
+        self.agent = agent_graph
 
         logger.debug(f"request_id={req_id_cv.get()} agent initialized")
 
@@ -119,27 +112,11 @@ class TigerGraphAgent:
                 f"request_id={req_id_cv.get()} question_for_agent question={question}"
             )
 
-            input_data = {}
-            input_data["input"] = question
-
-            if conversation is not None:
-                input_data["conversation"] = [
-                    {"query": chat["query"], "response": chat["response"]}
-                    for chat in conversation
-                ]
-
-            else:
-                # Handle the case where conversation is None or empty
-                input_data["conversation"] = []
-
-            # Validate and convert input_data to JSON string
-            try:
-                input_data_str = json.dumps(input_data)
-            except (TypeError, ValueError) as e:
-                logger.error(f"Failed to serialize input_data to JSON: {e}")
-                raise ValueError("Invalid input data format. Unable to convert to JSON.")
+            input_data = self._input_data(question, conversation)
 
-            for output in self.agent.stream({"question": input_data["input"], "conversation": input_data["conversation"]}):
+            # the graph may be shared, so this request's connection and progress queue go in the config
+            config = {"configurable": {"conn": self.conn, "q": self.q}}
+            for output in self.agent.stream({"question": input_data["input"], "conversation": input_data["conversation"]}, config=config):
 
                 for key, value in output.items():
                     # logger.info(f"testing steps {key}: {value}")
@@ -162,8 +139,79 @@ class TigerGraphAgent:
                 duration
             )
 
+    async def aquestion_for_agent(
+        self, question: str, conversation: List[Dict[str, str]] = None
+    ):
+        """Question for Agent, async.
+
+        Same as question_for_agent, for an agent built with use_async. The graph's LLM,
+        embedding, vector store and database calls are awaited on the running event loop,
+        through an async twin of the agent's connection.
 
-def make_agent(graphname, conn, use_cypher, ws: WebSocket = None, supportai_retriever="hnsw_overlap") -> TigerGraphAgent:
+        Args:
+            question (str):
+                The question to ask the agent
+        """
+        start_time = time.time()
+        metrics.llm_inprogress_requests.labels(self.model_name).inc()
+
+        try:
+            LogWriter.info(f"request_id={req_id_cv.get()} ENTRY aquestion_for_agent")
+            logger.debug_pii(
+                f"request_id={req_id_cv.get()} aquestion_for_agent question={question}"
+            )
+
+            input_data = self._input_data(question, conversation)
+
+            aconn = AsyncTigerGraphConnectionProxy.from_connection(self.conn)
+            config = {"configurable": {"conn": aconn, "q": self.q}}
+            async for output in self.agent.astream({"question": input_data["input"], "conversation": input_data["conversation"]}, config=config):
+
+                for key, value in output.items():
+                    LogWriter.info(f"request_id={req_id_cv.get()} executed node {key}")
+
+            LogWriter.info(f"request_id={req_id_cv.get()} EXIT aquestion_for_agent")
+            return value["answer"]
+        except Exception as e:
+            metrics.llm_query_error_total.labels(self.model_name).inc()
+            LogWriter.error(f"request_id={req_id_cv.get()} FAILURE aquestion_for_agent")
+            import traceback
+
+            traceback.print_exc()
+            raise e
+        finally:
+            metrics.llm_request_total.labels(self.model_name).inc()
+            metrics.llm_inprogress_requests.labels(self.model_name).dec()
+            duration = time.time() - start_time
+            metrics.llm_request_duration_seconds.labels(self.model_name).observe(
+                duration
+            )
+
+    @staticmethod
+    def _input_data(question: str, conversation: List[Dict[str, str]] = None) -> dict:
+        input_data = {}
+        input_data["input"] = question
+
+        if conversation is not None:
+            input_data["conversation"] = [
+                {"query": chat["query"], "response": chat["response"]}
+                for chat in conversation
+            ]
+
+        else:
+            # Handle the case where conversation is None or empty
+            input_data["conversation"] = []
+
+        # Validate and convert input_data to JSON string
+        try:
+            json.dumps(input_data)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to serialize input_data to JSON: {e}")
+            raise ValueError("Invalid input data format. Unable to convert to JSON.")
+        return input_data
+
+
+def make_llm_provider(graphname) -> LLM_Model:
     if llm_config["completion_service"]["llm_service"].lower() == "openai":
         llm_service_name = "openai"
         llm_provider = OpenAI(llm_config["completion_service"])
@@ -198,16 +246,107 @@ def make_agent(graphname, conn, use_cypher, ws: WebSocket = None, supportai_retr
         raise Exception("LLM Completion Service Not Supported")
 
     logger.debug(
-        f"/{graphname}/query_with_history request_id={req_id_cv.get()} llm_service={llm_service_name} agent created"
+        f"/{graphname}/query_with_history request_id={req_id_cv.get()} llm_service={llm_service_name} llm provider created"
     )
+    return llm_provider
+
+
+class AgentPool:
+    """AgentPool.
+    Compiled agent graphs per (graph, SupportAI retriever, use_cypher, use_async, SupportAI enabled),
+    and the LLM provider they share, so requests don't rebuild them. A graph is rebuilt after
+    schema_cache.ttl_seconds.
+    Whether SupportAI is enabled is checked with the requester's connection. Only a successful check
+    is kept (for schema_cache.ttl_seconds): a failed one may just mean that user can't see the queries.
+    """
+
+    def __init__(self, max_size: int = 64):
+        """Initialize an AgentPool.
+
+        Args:
+            max_size (int):
+                Number of compiled graphs to keep before dropping the least recently used ones.
+        """
+        self.max_size = max_size
+        self.llm_provider = None
+        self._graphs = OrderedDict()
+        # graph -> when its SupportAI queries should be checked again
+        self._supportai = {}
+        self._lock = threading.Lock()
+
+    def get_llm_provider(self, graphname) -> LLM_Model:
+        with self._lock:
+            if self.llm_provider is None:
+                self.llm_provider = make_llm_provider(graphname)
+            return self.llm_provider
+
+    def supportai_enabled(self, graphname, conn) -> bool:
+        with self._lock:
+            expiry = self._supportai.get(graphname)
+        if expiry is not None and expiry > time.monotonic():
+            return True
+        enabled = supportai_installed(conn)
+        with self._lock:
+            if enabled:
+                self._supportai[graphname] = time.monotonic() + schema_cache.ttl_seconds
+            else:
+                self._supportai.pop(graphname, None)
+        return enabled
+
+    def get(self, graphname, conn, use_cypher, supportai_retriever="hnsw_overlap", use_async=False):
+        supportai_enabled = self.supportai_enabled(graphname, conn)
+        key = (graphname, supportai_retriever.lower(), bool(use_cypher), bool(use_async), supportai_enabled)
+        with self._lock:
+            entry = self._graphs.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._graphs.move_to_end(key)
+                return entry[0]
+
+        # built outside the lock, a concurrent request may build the same graph once more
+        agent_graph = TigerGraphAgentGraph(
+            self.get_llm_provider(graphname),
+            conn,
+            embedding_service,
+            embedding_store,
+            use_cypher=use_cypher,
+            supportai_retriever=supportai_retriever,
+            supportai_enabled=supportai_enabled,
+        ).create_graph(use_async=use_async)
+        LogWriter.info(
+            f"request_id={req_id_cv.get()} agent graph built for graph={graphname} retriever={supportai_retriever} use_cypher={use_cypher} use_async={use_async} supportai={supportai_enabled}"
+        )
+        with self._lock:
+            self._graphs[key] = (agent_graph, time.monotonic() + schema_cache.ttl_seconds)
+            self._graphs.move_to_end(key)
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+        return agent_graph
+
+    def invalidate(self, graphname=None):
+        """Drop the graphs built for graphname, or all of them if graphname is None."""
+        with self._lock:
+            for key in list(self._graphs):
+                if graphname is None or key[0] == graphname:
+                    del self._graphs[key]
+            if graphname is None:
+                self._supportai.clear()
+            else:
+                self._supportai.pop(graphname, None)
+
+
+agent_pool = AgentPool()
+
 
+def make_agent(graphname, conn, use_cypher, ws: WebSocket = None, supportai_retriever="hnsw_overlap", use_async=False) -> TigerGraphAgent:
     agent = TigerGraphAgent(
-        llm_provider,
+        agent_pool.get_llm_provider(graphname),
         conn,
         embedding_service,
         embedding_store,
         use_cypher=use_cypher,
         ws=ws,
-        supportai_retriever=supportai_retriever
+        supportai_retriever=supportai_retriever,
+        agent_graph=agent_pool.get(graphname, conn, use_cypher, supportai_retriever, use_async),
+        use_async=use_async,
     )
     return agent
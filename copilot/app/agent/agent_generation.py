@@ -1,9 +1,11 @@
 import logging
+from typing import Callable
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
 from common.logs.logwriter import LogWriter
 from common.logs.log import req_id_cv
-from langchain.pydantic_v1 import BaseModel, Field
+from langchain.pydantic_v1 import BaseModel, Field, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +26,45 @@ class TigerGraphAgentGenerator:
             str: The answer to the question.
         """
         LogWriter.info(f"request_id={req_id_cv.get()} ENTRY generate_answer")
+        generation = self._chain().invoke({"question": question, "context": context})
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT generate_answer")
+
+        return generation
+
+    async def agenerate_answer(self, question: str, context: str, on_token: Callable[[str], None] = None) -> str:
+        """Same as generate_answer, without blocking the event loop.
+        Args:
+            on_token: Callable[[str], None]: If given, the answer is streamed and on_token
+                is called with each new piece of generated_answer as the LLM produces it.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY agenerate_answer")
+        if on_token is None:
+            generation = await self._chain().ainvoke({"question": question, "context": context})
+        else:
+            generation = await self._astream_answer(question, context, on_token)
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT agenerate_answer")
+
+        return generation
 
+    async def _astream_answer(self, question: str, context: str, on_token: Callable[[str], None]) -> CoPilotAnswerOutput:
+        # the answer is a JSON object, parsed as it streams in; generated_answer comes first
+        chain = self._prompt() | self.llm.model | JsonOutputParser()
+        sent = ""
+        partial = None
+        async for partial in chain.astream({"question": question, "context": context}):
+            answer = partial.get("generated_answer") if isinstance(partial, dict) else None
+            if isinstance(answer, str) and len(answer) > len(sent) and answer.startswith(sent):
+                on_token(answer[len(sent):])
+                sent = answer
+        try:
+            return CoPilotAnswerOutput.parse_obj(partial)
+        except ValidationError as e:
+            raise OutputParserException(f"Failed to parse CoPilotAnswerOutput from completion {partial}. Got: {e}")
+
+    def _prompt(self):
         answer_parser = PydanticOutputParser(pydantic_object=CoPilotAnswerOutput)
 
-        prompt = PromptTemplate(
+        return PromptTemplate(
             template=self.llm.chatbot_response_prompt,
             input_variables=["question", "context"],
             partial_variables={
@@ -35,16 +72,8 @@ class TigerGraphAgentGenerator:
             }
         )
 
-        full_prompt = prompt.format(
-            question=question,
-            context=context,
-            format_instructions=answer_parser.get_format_instructions()
-        )
+    def _chain(self):
+        answer_parser = PydanticOutputParser(pydantic_object=CoPilotAnswerOutput)
 
         # Chain
-        rag_chain = prompt | self.llm.model | answer_parser
-        generation = rag_chain.invoke({"question": question, "context": context})
-
-        LogWriter.info(f"request_id={req_id_cv.get()} EXIT generate_answer")
-
-        return generation
+        return self._prompt() | self.llm.model | answer_parser
@@ -7,12 +7,14 @@ from agent.agent_hallucination_check import TigerGraphAgentHallucinationCheck
 from agent.agent_rewrite import TigerGraphAgentRewriter
 from agent.agent_router import TigerGraphAgentRouter
 from agent.agent_usefulness_check import TigerGraphAgentUsefulnessCheck
-from agent.Q import DONE, Q
+from agent.Q import DONE, Chunk, Q
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 from pyTigerGraph.common.exception import TigerGraphException
 from supportai.retrievers import (HNSWOverlapRetriever, HNSWRetriever,
                                   HNSWSiblingRetriever, GraphRAGRetriever)
-from tools import MapQuestionToSchemaException
+from tools import (GenerateCypher, GenerateFunction, MapQuestionToSchema,
+                   MapQuestionToSchemaException)
 from typing_extensions import TypedDict
 
 from common.logs.log import req_id_cv
@@ -22,6 +24,16 @@ from common.config import embedding_store_type
 logger = logging.getLogger(__name__)
 
 
+def supportai_installed(db_connection) -> bool:
+    """Whether the SupportAI queries are installed on the connection's graph, as far as its user can see."""
+    try:
+        db_connection.getQueryMetadata("HNSW_Overlap_Display")
+        return True
+    except TigerGraphException as e:
+        logger.info(f"HNSW_Overlap_Display not found in the graph {db_connection.graphname}. Disabling supportai.")
+        return False
+
+
 class GraphState(TypedDict):
     """
     Represents the state of the agent graph.
@@ -40,41 +52,43 @@ class GraphState(TypedDict):
 
 
 class TigerGraphAgentGraph:
+    """
+    The agent's workflow for one graph. The compiled graph is shared between requests:
+    each invocation passes its own database connection and progress queue in
+    config["configurable"] (keys "conn" and "q"), and the tools are bound to that connection.
+    """
+
     def __init__(
         self,
         llm_provider,
         db_connection,
         embedding_model,
         embedding_store,
-        mq2s_tool,
-        gen_func_tool,
-        cypher_gen_tool=None,
+        use_cypher=False,
         enable_human_in_loop=False,
-        q: Q = None,
         supportai_retriever="hnsw_overlap",
+        supportai_enabled=None,
     ):
         self.workflow = StateGraph(GraphState)
         self.llm_provider = llm_provider
-        self.db_connection = db_connection
         self.embedding_model = embedding_model
         self.embedding_store = embedding_store
-        self.mq2s = mq2s_tool
-        self.gen_func = gen_func_tool
-        self.cypher_gen = cypher_gen_tool
+        self.use_cypher = use_cypher
         self.enable_human_in_loop = enable_human_in_loop
-        self.q = q
 
-        self.supportai_enabled = True
         self.supportai_retriever = supportai_retriever.lower()
-        try:
-            self.db_connection.getQueryMetadata("HNSW_Overlap_Display")
-        except TigerGraphException as e:
-            logger.info(f"HNSW_Overlap_Display not found in the graph {self.db_connection.graphname}. Disabling supportai.")
-            self.supportai_enabled = False
+        if supportai_enabled is None:
+            supportai_enabled = supportai_installed(db_connection)
+        self.supportai_enabled = supportai_enabled
+
+    @staticmethod
+    def _conn(config: RunnableConfig):
+        return config["configurable"]["conn"]
 
-    def emit_progress(self, msg):
-        if self.q is not None:
-            self.q.put(msg)
+    def emit_progress(self, config: RunnableConfig, msg):
+        q: Q = config["configurable"].get("q")
+        if q is not None:
+            q.put(msg)
 
     def entry(self, state):
         if state.get("question_retry_count") is None:
@@ -83,34 +97,53 @@ class TigerGraphAgentGraph:
             state["question_retry_count"] += 1
         return state
 
-    def route_question(self, state):
+    def route_question(self, state, config: RunnableConfig):
         """
         Run the agent router.
         """
         if state["question_retry_count"] > 2:
             return "apologize"
-        self.emit_progress("Thinking")
-        step = TigerGraphAgentRouter(self.llm_provider, self.db_connection)
+        self.emit_progress(config, "Thinking")
+        step = TigerGraphAgentRouter(self.llm_provider, self._conn(config))
         logger.debug_pii(
             f"request_id={req_id_cv.get()} Routing question: {state['question']}"
         )
         if self.supportai_enabled:
-            source = step.route_question(state["question"])
-            logger.debug_pii(
-                f"request_id={req_id_cv.get()} Routing question to: {source}"
-            )
-            if source.datasource == "vectorstore":
-                return "supportai_lookup"
-            elif source.datasource == "functions":
-                return "inquiryai_lookup"
+            return self._lookup(step.route_question(state["question"]))
+        else:
+            return "inquiryai_lookup"
+
+    async def aroute_question(self, state, config: RunnableConfig):
+        """
+        Run the agent router, with an async connection.
+        """
+        if state["question_retry_count"] > 2:
+            return "apologize"
+        self.emit_progress(config, "Thinking")
+        step = TigerGraphAgentRouter(self.llm_provider, self._conn(config))
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} Routing question: {state['question']}"
+        )
+        if self.supportai_enabled:
+            return self._lookup(await step.aroute_question(state["question"]))
         else:
             return "inquiryai_lookup"
 
-    def apologize(self, state):
+    @staticmethod
+    def _lookup(source):
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} Routing question to: {source}"
+        )
+        if source.datasource == "vectorstore":
+            return "supportai_lookup"
+        elif source.datasource == "functions":
+            return "inquiryai_lookup"
+
+    def apologize(self, state, config: RunnableConfig):
         """
         Apologize for not being able to answer the question.
         """
-        self.emit_progress(DONE)
+        self.emit_progress(config, DONE)
         state["answer"] = CoPilotResponse(
             natural_language_response="I'm sorry, I don't know the answer to that question. Please try rephrasing your question.",
             answered_question=False,
@@ -119,13 +152,35 @@ class TigerGraphAgentGraph:
         )
         return state
 
-    def map_question_to_schema(self, state):
+    def map_question_to_schema(self, state, config: RunnableConfig):
         """
         Run the agent schema mapping.
         """
-        self.emit_progress("Mapping your question to the graph's schema")
+        self.emit_progress(config, "Mapping your question to the graph's schema")
+        try:
+            mq2s = MapQuestionToSchema(
+                self._conn(config), self.llm_provider.model, self.llm_provider.map_question_schema_prompt
+            )
+            step = mq2s._run(state["question"], state["conversation"])
+            logger.info(f"schema_mapping: {step}")
+            state["schema_mapping"] = step
+            return state
+        except MapQuestionToSchemaException as e:
+            state["context"] = {"error": True}
+            if state["error_history"] is None:
+                state["error_history"] = []
+            state["error_history"].append({"error_message": str(e), "error_step": "generate_function"})
+
+    async def amap_question_to_schema(self, state, config: RunnableConfig):
+        """
+        Run the agent schema mapping, with an async connection.
+        """
+        self.emit_progress(config, "Mapping your question to the graph's schema")
         try:
-            step = self.mq2s._run(state["question"], state["conversation"])
+            mq2s = MapQuestionToSchema(
+                self._conn(config), self.llm_provider.model, self.llm_provider.map_question_schema_prompt
+            )
+            step = await mq2s._arun(state["question"], state["conversation"])
             logger.info(f"schema_mapping: {step}")
             state["schema_mapping"] = step
             return state
@@ -135,13 +190,51 @@ class TigerGraphAgentGraph:
                 state["error_history"] = []
             state["error_history"].append({"error_message": str(e), "error_step": "generate_function"})
 
-    def generate_function(self, state):
+    def generate_function(self, state, config: RunnableConfig):
         """
         Run the agent function generator.
         """
-        self.emit_progress("Generating the code to answer your question")
+        self.emit_progress(config, "Generating the code to answer your question")
+        try:
+            gen_func = GenerateFunction(
+                self._conn(config),
+                self.llm_provider.model,
+                self.llm_provider.generate_function_prompt,
+                self.embedding_model,
+                self.embedding_store,
+            )
+            step = gen_func._run(
+                state["question"],
+                state["schema_mapping"].target_vertex_types,
+                state["schema_mapping"].target_vertex_attributes,
+                state["schema_mapping"].target_vertex_ids,
+                state["schema_mapping"].target_edge_types,
+                state["schema_mapping"].target_edge_attributes,
+            )
+            logger.info(f"generate_function: {step}")
+            state["context"] = step
+        except Exception as e:
+            state["context"] = {"error": True}
+            if state["error_history"] is None:
+                state["error_history"] = []
+            state["error_history"].append({"error_message": str(e), "error_step": "generate_function"})
+        state["lookup_source"] = "inquiryai"
+        return state
+
+    async def agenerate_function(self, state, config: RunnableConfig):
+        """
+        Run the agent function generator, with an async connection.
+        """
+        self.emit_progress(config, "Generating the code to answer your question")
         try:
-            step = self.gen_func._run(
+            gen_func = GenerateFunction(
+                self._conn(config),
+                self.llm_provider.model,
+                self.llm_provider.generate_function_prompt,
+                self.embedding_model,
+                self.embedding_store,
+            )
+            step = await gen_func._arun(
                 state["question"],
                 state["schema_mapping"].target_vertex_types,
                 state["schema_mapping"].target_vertex_attributes,
@@ -159,15 +252,29 @@ class TigerGraphAgentGraph:
         state["lookup_source"] = "inquiryai"
         return state
 
-    def generate_cypher(self, state):
+    def generate_cypher(self, state, config: RunnableConfig):
         """
         Run the agent cypher generator.
         """
-        self.emit_progress("Generating the Cypher to answer your question")
-        cypher = self.cypher_gen._run(state["question"])
+        self.emit_progress(config, "Generating the Cypher to answer your question")
+        conn = self._conn(config)
+        cypher = GenerateCypher(conn, self.llm_provider)._run(state["question"])
+        logger.info(f"cypher: {cypher}")
+
+        return self._cypher_context(state, cypher, conn.gsql(cypher))
+
+    async def agenerate_cypher(self, state, config: RunnableConfig):
+        """
+        Run the agent cypher generator, with an async connection.
+        """
+        self.emit_progress(config, "Generating the Cypher to answer your question")
+        conn = self._conn(config)
+        cypher = await GenerateCypher(conn, self.llm_provider)._arun(state["question"])
         logger.info(f"cypher: {cypher}")
 
-        response = self.db_connection.gsql(cypher)
+        return self._cypher_context(state, cypher, await conn.gsql(cypher))
+
+    def _cypher_context(self, state, cypher, response):
         response_lines = response.split("\n")
         try:
             json_str = "\n".join(response_lines[1:])
@@ -192,16 +299,16 @@ class TigerGraphAgentGraph:
         state["lookup_source"] = "cypher"
         return state
 
-    def hnsw_overlap_search(self, state):
+    def hnsw_overlap_search(self, state, config: RunnableConfig):
         """
         Run the agent overlap search.
         """
-        self.emit_progress("Searching the knowledge graph")
+        self.emit_progress(config, "Searching the knowledge graph")
         retriever = HNSWOverlapRetriever(
             self.embedding_model,
             self.embedding_store,
             self.llm_provider.model,
-            self.db_connection,
+            self._conn(config),
         )
         step = retriever.search(
             state["question"],
@@ -215,23 +322,23 @@ class TigerGraphAgentGraph:
         state["context"] = {
             "function_call": query_name,
             "result": step[0],
-            "query_output_format": self.db_connection.getQueryMetadata(
+            "query_output_format": self._conn(config).getQueryMetadata(
                 query_name
             )["output"],
         }
         state["lookup_source"] = "supportai"
         return state
     
-    def hnsw_search(self, state):
+    def hnsw_search(self, state, config: RunnableConfig):
         """
         Run the agent vector search.
         """
-        self.emit_progress("Searching the vector store")
+        self.emit_progress(config, "Searching the vector store")
         retriever = HNSWRetriever(
             self.embedding_model,
             self.embedding_store,
             self.llm_provider,
-            self.db_connection
+            self._conn(config)
         )
 
         step = retriever.search(
@@ -244,23 +351,23 @@ class TigerGraphAgentGraph:
         state["context"] = {
             "function_call": query_name,
             "result": step[0],
-            "query_output_format": self.db_connection.getQueryMetadata(
+            "query_output_format": self._conn(config).getQueryMetadata(
                 query_name
             )["output"],
         }
         state["lookup_source"] = "supportai"
         return state
     
-    def sibling_search(self, state):
+    def sibling_search(self, state, config: RunnableConfig):
         """
         Run the agent sibling search.
         """
-        self.emit_progress("Searching the knowledge graph")
+        self.emit_progress(config, "Searching the knowledge graph")
         retriever = HNSWSiblingRetriever(
             self.embedding_model,
             self.embedding_store,
             self.llm_provider.model,
-            self.db_connection,
+            self._conn(config),
         )
         step = retriever.search(
             state["question"],
@@ -272,23 +379,23 @@ class TigerGraphAgentGraph:
         state["context"] = {
             "function_call": query_name,
             "result": step[0],
-            "query_output_format": self.db_connection.getQueryMetadata(
+            "query_output_format": self._conn(config).getQueryMetadata(
                 query_name
             )["output"],
         }
         state["lookup_source"] = "supportai"
         return state
     
-    def graphrag_search(self, state):
+    def graphrag_search(self, state, config: RunnableConfig):
         """
         Run the agent graphrag search.
         """
-        self.emit_progress("Searching the knowledge graph")
+        self.emit_progress(config, "Searching the knowledge graph")
         retriever = GraphRAGRetriever(
             self.embedding_model,
             self.embedding_store,
             self.llm_provider.model,
-            self.db_connection,
+            self._conn(config),
         )
         step = retriever.search(
             state["question"],
@@ -301,54 +408,128 @@ class TigerGraphAgentGraph:
         state["context"] = {
             "function_call": query_name,
             "result": step[0],
-            "query_output_format": self.db_connection.getQueryMetadata(
+            "query_output_format": self._conn(config).getQueryMetadata(
                 query_name
             )["output"],
         }
         state["lookup_source"] = "supportai"
         return state
     
-    def supportai_search(self, state):
+    def supportai_search(self, state, config: RunnableConfig):
         """
         Run the agent supportai search.
         """
 
         if self.supportai_retriever == "hnsw_overlap":
-            return self.hnsw_overlap_search(state)
+            return self.hnsw_overlap_search(state, config)
+        elif self.supportai_retriever == "hnsw":
+            return self.hnsw_search(state, config)
+        elif self.supportai_retriever == "sibling":
+            return self.sibling_search(state, config)
+        elif self.supportai_retriever == "graphrag":
+            return self.graphrag_search(state, config)
+        else:
+            raise ValueError(f"Invalid supportai retriever: {self.supportai_retriever}")
+
+    async def asupportai_search(self, state, config: RunnableConfig):
+        """
+        Run the agent supportai search, with an async connection.
+        Same retrievers and parameters as the sync searches above.
+        """
+        conn = self._conn(config)
+        if self.supportai_retriever == "hnsw_overlap":
+            self.emit_progress(config, "Searching the knowledge graph")
+            retriever = HNSWOverlapRetriever(
+                self.embedding_model, self.embedding_store, self.llm_provider.model, conn
+            )
+            step = await retriever.asearch(
+                state["question"],
+                indices=["Document", "DocumentChunk", "Entity", "Relationship"],
+                top_k=5,
+                num_seen_min=2,
+                num_hops=2,
+            )
+            query_name = "HNSW_Overlap_Search"
         elif self.supportai_retriever == "hnsw":
-            return self.hnsw_search(state)
+            self.emit_progress(config, "Searching the vector store")
+            retriever = HNSWRetriever(
+                self.embedding_model, self.embedding_store, self.llm_provider, conn
+            )
+            step = await retriever.asearch(state["question"], index="DocumentChunk", top_k=5)
+            query_name = "HNSW_Content_Search"
         elif self.supportai_retriever == "sibling":
-            return self.sibling_search(state)
+            self.emit_progress(config, "Searching the knowledge graph")
+            retriever = HNSWSiblingRetriever(
+                self.embedding_model, self.embedding_store, self.llm_provider.model, conn
+            )
+            step = await retriever.asearch(state["question"], index="DocumentChunk", top_k=3)
+            query_name = "HNSW_Chunk_Sibling_Search"
         elif self.supportai_retriever == "graphrag":
-            return self.graphrag_search(state)
+            self.emit_progress(config, "Searching the knowledge graph")
+            retriever = GraphRAGRetriever(
+                self.embedding_model, self.embedding_store, self.llm_provider.model, conn
+            )
+            step = await retriever.asearch(
+                state["question"], community_level=2, top_k=5, with_chunk=True
+            )
+            query_name = "GraphRAG_Community_Search"
         else:
             raise ValueError(f"Invalid supportai retriever: {self.supportai_retriever}")
+
+        state["context"] = {
+            "function_call": query_name,
+            "result": step[0],
+            "query_output_format": (await conn.getQueryMetadata(query_name))["output"],
+        }
+        state["lookup_source"] = "supportai"
+        return state
     
-    def generate_answer(self, state):
+    def generate_answer(self, state, config: RunnableConfig):
         """
         Run the agent generator.
         """
-        self.emit_progress("Connecting the pieces")
+        self.emit_progress(config, "Connecting the pieces")
+        step = TigerGraphAgentGenerator(self.llm_provider)
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} Generating answer for question: {state['question']}"
+        )
+
+        answer = step.generate_answer(state["question"], self._answer_context(state))
+        return self._set_answer(state, answer)
+
+    async def agenerate_answer(self, state, config: RunnableConfig):
+        """
+        Run the agent generator without blocking the event loop.
+        """
+        self.emit_progress(config, "Connecting the pieces")
         step = TigerGraphAgentGenerator(self.llm_provider)
         logger.debug_pii(
             f"request_id={req_id_cv.get()} Generating answer for question: {state['question']}"
         )
 
+        on_token = None
+        if config["configurable"].get("q") is not None:
+            # stream the answer to the websocket as it's generated
+            on_token = lambda token: self.emit_progress(config, Chunk(token))
+        answer = await step.agenerate_answer(
+            state["question"], self._answer_context(state), on_token=on_token
+        )
+        return self._set_answer(state, answer)
+
+    @staticmethod
+    def _answer_context(state):
         if state["lookup_source"] == "supportai":
-            answer = step.generate_answer(
-                state["question"], state["context"]["result"]
-            )
+            return state["context"]["result"]
         elif state["lookup_source"] == "inquiryai":
             try:
-                context_data_str = json.dumps(state["context"]["result"])
+                return json.dumps(state["context"]["result"])
             except (TypeError, ValueError) as e:
                 logger.error(f"Failed to serialize context to JSON: {e}")
                 raise ValueError("Invalid context data format. Unable to convert to JSON.")
-
-            answer = step.generate_answer(state["question"], context_data_str)
-
         elif state["lookup_source"] == "cypher":
-            answer = step.generate_answer(state["question"], state["context"]["answer"])
+            return state["context"]["answer"]
+
+    def _set_answer(self, state, answer):
         logger.debug_pii(
             f"request_id={req_id_cv.get()} Generated answer: {answer.generated_answer}"
         )
@@ -377,16 +558,25 @@ class TigerGraphAgentGraph:
 
         return state
 
-    def rewrite_question(self, state):
+    def rewrite_question(self, state, config: RunnableConfig):
         """
         Run the agent question rewriter.
         """
-        self.emit_progress("Rephrasing the question")
+        self.emit_progress(config, "Rephrasing the question")
         step = TigerGraphAgentRewriter(self.llm_provider)
         question_str = state["question"]
         state["question"] = step.rewrite_question(question_str)
         return state
 
+    async def arewrite_question(self, state, config: RunnableConfig):
+        """
+        Run the agent question rewriter without blocking the event loop.
+        """
+        self.emit_progress(config, "Rephrasing the question")
+        step = TigerGraphAgentRewriter(self.llm_provider)
+        state["question"] = await step.arewrite_question(state["question"])
+        return state
+
     # remove halucinaton check, always return grounded
     def check_answer_for_hallucinations(self, state):
         """
@@ -435,7 +625,7 @@ class TigerGraphAgentGraph:
         #     return "not_useful"
         return "useful"
 
-    def check_answer_for_usefulness_and_hallucinations(self, state):
+    def check_answer_for_usefulness_and_hallucinations(self, state, config: RunnableConfig):
         """
         Run the agent usefulness and hallucination check.
         """
@@ -445,7 +635,7 @@ class TigerGraphAgentGraph:
         else:
             useful = self.check_answer_for_usefulness(state)
             if useful == "useful":
-                self.emit_progress(DONE)
+                self.emit_progress(config, DONE)
                 return "grounded"
             else:
                 if state["lookup_source"] == "supportai":
@@ -470,22 +660,46 @@ class TigerGraphAgentGraph:
         else:
             return "success"
 
-    def create_graph(self):
+    def create_graph(self, use_async=False):
         """
         Create a graph of the agent.
-        """
+        With use_async, the graph's nodes are coroutines that expect an
+        AsyncTigerGraphConnectionProxy as config["configurable"]["conn"],
+        and the graph must be run with ainvoke/astream.
+        """
+        if use_async:
+            nodes = {
+                "generate_answer": self.agenerate_answer,
+                "map_question_to_schema": self.amap_question_to_schema,
+                "generate_function": self.agenerate_function,
+                "supportai": self.asupportai_search,
+                "rewrite_question": self.arewrite_question,
+                "generate_cypher": self.agenerate_cypher,
+            }
+            route_question = self.aroute_question
+        else:
+            nodes = {
+                "generate_answer": self.generate_answer,
+                "map_question_to_schema": self.map_question_to_schema,
+                "generate_function": self.generate_function,
+                "supportai": self.supportai_search,
+                "rewrite_question": self.rewrite_question,
+                "generate_cypher": self.generate_cypher,
+            }
+            route_question = self.route_question
+
         self.workflow.set_entry_point("entry")
         self.workflow.add_node("entry", self.entry)
-        self.workflow.add_node("generate_answer", self.generate_answer)
-        self.workflow.add_node("map_question_to_schema", self.map_question_to_schema)
-        self.workflow.add_node("generate_function", self.generate_function)
+        self.workflow.add_node("generate_answer", nodes["generate_answer"])
+        self.workflow.add_node("map_question_to_schema", nodes["map_question_to_schema"])
+        self.workflow.add_node("generate_function", nodes["generate_function"])
         if self.supportai_enabled:
-            self.workflow.add_node("supportai", self.supportai_search)
-        self.workflow.add_node("rewrite_question", self.rewrite_question)
+            self.workflow.add_node("supportai", nodes["supportai"])
+        self.workflow.add_node("rewrite_question", nodes["rewrite_question"])
         self.workflow.add_node("apologize", self.apologize)
 
-        if self.cypher_gen:
-            self.workflow.add_node("generate_cypher", self.generate_cypher)
+        if self.use_cypher:
+            self.workflow.add_node("generate_cypher", nodes["generate_cypher"])
             self.workflow.add_conditional_edges(
                 "generate_function",
                 self.check_state_for_generation_error,
@@ -557,7 +771,7 @@ class TigerGraphAgentGraph:
         if self.supportai_enabled:
             self.workflow.add_conditional_edges(
                 "entry",
-                self.route_question,
+                route_question,
                 {
                     "supportai_lookup": "supportai",
                     "inquiryai_lookup": "map_question_to_schema",
@@ -567,7 +781,7 @@ class TigerGraphAgentGraph:
         else:
             self.workflow.add_conditional_edges(
                 "entry",
-                self.route_question,
+                route_question,
                 {
                     "inquiryai_lookup": "map_question_to_schema",
                     "apologize": "apologize",
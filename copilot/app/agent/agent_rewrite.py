@@ -24,7 +24,18 @@ class TigerGraphAgentRewriter:
             str: The rewritten question.
         """
         LogWriter.info(f"request_id={req_id_cv.get()} ENTRY rewrite_question")
+        generation = self._chain().invoke({"question": question})
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT rewrite_question")
+        return generation.rewritten_question
+
+    async def arewrite_question(self, question: str) -> str:
+        """Same as rewrite_question, without blocking the event loop."""
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY arewrite_question")
+        generation = await self._chain().ainvoke({"question": question})
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT arewrite_question")
+        return generation.rewritten_question
 
+    def _chain(self):
         rewrite_parser = PydanticOutputParser(pydantic_object=QuestionRewriteResponse)
 
         re_write_prompt = PromptTemplate(
@@ -41,8 +52,4 @@ Format your response in the following manner {format_instructions}""",
 
 
         # Chain
-        question_rewriter = re_write_prompt | self.llm.model | rewrite_parser
-
-        generation = question_rewriter.invoke({"question": question})
-        LogWriter.info(f"request_id={req_id_cv.get()} EXIT rewrite_question")
-        return generation.rewritten_question
+        return re_write_prompt | self.llm.model | rewrite_parser
@@ -1,5 +1,6 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
+from common.db.schema_cache import aget_schema, get_schema
 from common.logs.logwriter import LogWriter
 from pyTigerGraph.pyTigerGraph import TigerGraphConnection
 import logging
@@ -27,9 +28,29 @@ class TigerGraphAgentRouter:
             str: The datasource to use for the question.
         """
         LogWriter.info(f"request_id={req_id_cv.get()} ENTRY route_question with {question}")
-        v_types = self.db_conn.getVertexTypes()
-        e_types = self.db_conn.getEdgeTypes()
+        schema = get_schema(self.db_conn)
+        res = self._router().invoke(
+            {"question": question, "v_types": schema.vertex_types, "e_types": schema.edge_types}
+        )
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT route_question with {res}")
+        return res
+
+    async def aroute_question(self, question: str, db_conn=None) -> str:
+        """Same as route_question, reading the schema with an async connection.
+
+        Args:
+            question (str): The question to route.
+            db_conn (AsyncTigerGraphConnectionProxy): Connection to read the schema with.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY aroute_question with {question}")
+        schema = await aget_schema(db_conn or self.db_conn)
+        res = await self._router().ainvoke(
+            {"question": question, "v_types": schema.vertex_types, "e_types": schema.edge_types}
+        )
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT aroute_question with {res}")
+        return res
 
+    def _router(self):
         router_parser = PydanticOutputParser(pydantic_object=RouterResponse)
 
         prompt = PromptTemplate(
@@ -50,7 +71,4 @@ Format: {format_instructions}\
             }
         )
 
-        question_router = prompt | self.llm.model | router_parser
-        res = question_router.invoke({"question": question, "v_types": v_types, "e_types": e_types})
-        LogWriter.info(f"request_id={req_id_cv.get()} EXIT route_question with {res}")
-        return res
+        return prompt | self.llm.model | router_parser
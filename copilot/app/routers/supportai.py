@@ -3,6 +3,7 @@ import logging
 from typing import Annotated
 
 from fastapi import APIRouter, BackgroundTasks, Depends, Request, Response, status
+from agent.agent import agent_pool
 from fastapi.security.http import HTTPBase
 from supportai import supportai
 from supportai.concept_management.create_concepts import (
@@ -58,6 +59,8 @@ def initialize(
     conn = conn.state.conn
 
     resp = supportai.init_supportai(conn, graphname)
+    # rebuild the agent with SupportAI enabled on its next question
+    agent_pool.invalidate(graphname)
     schema_res, index_res, query_res = resp[0], resp[1], resp[2]
     return {
         "host_name": conn._tg_connection.host,  # include host_name for debugging from client. Their pyTG conn might not have the same host as what's configured in copilot
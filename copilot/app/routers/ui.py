@@ -12,7 +12,7 @@ import asyncer
 import httpx
 import requests
 from agent.agent import TigerGraphAgent, make_agent
-from agent.Q import DONE
+from agent.Q import DONE, Chunk
 from fastapi import (
     APIRouter,
     Depends,
@@ -195,16 +195,20 @@ async def get_conversation_feedback(
 
 
 async def emit_progress(agent: TigerGraphAgent, ws: WebSocket):
-    # loop on q until done token emit events through ws
-    msg = None
-    pop = asyncer.asyncify(agent.q.pop)
-
-    while msg != DONE:
-        msg = await pop()
-        if msg is not None and msg != DONE:
+    # wait on q until done token, emit events through ws
+    while True:
+        msg = await agent.q.get()
+        # checked first, an answer chunk may well read "DONE"
+        if isinstance(msg, Chunk):
+            response_type = ResponseType.CHUNK
+        elif msg == DONE:
+            break
+        else:
+            response_type = ResponseType.PROGRESS
+        if msg is not None:
             message = AgentProgess(
                 content=msg,
-                response_type=ResponseType.PROGRESS,
+                response_type=response_type,
             )
             if ws:
                 await ws.send_text(message.model_dump_json())
@@ -222,25 +226,33 @@ async def run_agent(
     resp = CoPilotResponse(
         natural_language_response="", answered_question=False, response_type="inquiryai"
     )
-    a_question_for_agent = asyncer.asyncify(agent.question_for_agent)
+    if agent.use_async:
+        a_question_for_agent = agent.aquestion_for_agent
+    else:
+        a_question_for_agent = asyncer.asyncify(agent.question_for_agent)
+
+    async def answer():
+        try:
+            # TODO: make num mesages in history configureable
+            return await a_question_for_agent(data, conversation_history[-4:])
+        finally:
+            # the graph doesn't emit DONE on every path, stop emit_progress anyway
+            if ws:
+                agent.q.put(DONE)
+
     try:
-        # start agent and sample from Q to emit progress
+        # start agent and wait on Q to emit progress
 
         async with asyncio.TaskGroup() as tg:
             # run agent
-            a_resp = tg.create_task(
-                # TODO: make num mesages in history configureable
-                a_question_for_agent(data, conversation_history[-4:])
-            )
-            # sample Q and emit events
+            a_resp = tg.create_task(answer())
+            # wait on Q and emit events
             if ws:
                 tg.create_task(emit_progress(agent, ws))
             else:
                 emit_progress(agent, ws)
         pmetrics.llm_success_response_total.labels(embedding_service.model_name).inc()
         resp = a_resp.result()
-        if ws:
-            agent.q.clear()
 
     except MapQuestionToSchemaException:
         resp.natural_language_response = (
@@ -269,6 +281,11 @@ async def run_agent(
             f"/{graphname}/ui/chat request_id={req_id_cv.get()} Exception Trace:\n{exc}"
         )
         pmetrics.llm_query_error_total.labels(embedding_service.model_name).inc()
+    finally:
+        if ws:
+            # when the turn failed, emit_progress was cancelled before reading the DONE
+            # put by answer(): drop it so it doesn't end the next turn's stream
+            agent.q.clear()
 
     return resp
 
@@ -391,7 +408,7 @@ async def chat(
     # create agent
     # get retrieval pattern to use
     rag_pattern = await websocket.receive_text()
-    agent = make_agent(graphname, conn, use_cypher, ws=websocket, supportai_retriever=rag_pattern)
+    agent = make_agent(graphname, conn, use_cypher, ws=websocket, supportai_retriever=rag_pattern, use_async=True)
 
     prev_id = None
     try:
@@ -1,5 +1,6 @@
 from common.embeddings.embedding_services import EmbeddingModel
 from common.embeddings.base_embedding_store import EmbeddingStore
+from common.embeddings.search_results import ResultMerger
 from common.metrics.tg_proxy import TigerGraphConnectionProxy
 from common.llm_services.base_llm import LLM_Model
 from common.py_schemas import CandidateScore, CandidateGenerator
@@ -10,8 +11,26 @@ from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field, validator
 from langchain.output_parsers import OutputFixingParser
 
+import asyncio
+import contextvars
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+# shared by all retrievers, for the LLM and vector store calls they fan out
+_retrieval_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieval")
+
+
+def _in_context(func):
+    # run func in a copy of the caller's context (request id, ...) on the pool
+    ctx = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(func, *args, **kwargs)
+
+    return wrapper
 
 class BaseRetriever:
     def __init__(
@@ -25,14 +44,12 @@ class BaseRetriever:
         self.llm_service = llm_service
         self.conn = connection
         self.embedding_store = embedding_store
-        if embedding_store_type == "tigergraph":
-            self.embedding_store.set_graphname(connection.graphname)
         self.logger = logging.getLogger(__name__)
 
-    def _install_query(self, query_name):
+    def _install_gsql(self, query_name):
         with open(f"common/gsql/supportai/retrievers/{query_name}.gsql", "r") as f:
             query = f.read()
-        res = self.conn.gsql(
+        return (
             "USE GRAPH "
             + self.conn.graphname
             + "\n"
@@ -40,20 +57,44 @@ class BaseRetriever:
             + "\n INSTALL QUERY "
             + query_name
         )
-        return res
+
+    def _install_query(self, query_name):
+        return self.conn.gsql(self._install_gsql(query_name))
+
+    def _is_installed(self, endpoints, query_name):
+        installed_queries = [q.split("/")[-1] for q in endpoints if f"/{self.conn.graphname}/" in q]
+        return query_name in installed_queries
 
     def _check_query_install(self, query_name):
         endpoints = self.conn.getEndpoints(
             dynamic=True
         )  # installed queries in database
-        installed_queries = [q.split("/")[-1] for q in endpoints if f"/{self.conn.graphname}/" in q]
 
-        if query_name not in installed_queries:
+        if not self._is_installed(endpoints, query_name):
             return self._install_query(query_name)
         else:
             return True
 
+    async def _acheck_query_install(self, query_name):
+        # same as _check_query_install, with an AsyncTigerGraphConnectionProxy
+        endpoints = await self.conn.getEndpoints(dynamic=True)
+
+        if not self._is_installed(endpoints, query_name):
+            return await self.conn.gsql(self._install_gsql(query_name))
+        else:
+            return True
+
     def _question_to_keywords(self, question, top_k, verbose):
+        chain = self._keyword_chain(question, verbose)
+        answer = chain.invoke({"question": question})
+        return self._top_keywords(question, answer, top_k, verbose)
+
+    async def _aquestion_to_keywords(self, question, top_k, verbose):
+        chain = self._keyword_chain(question, verbose)
+        answer = await chain.ainvoke({"question": question})
+        return self._top_keywords(question, answer, top_k, verbose)
+
+    def _keyword_chain(self, question, verbose):
         keyword_parser = PydanticOutputParser(pydantic_object=CandidateGenerator)
 
         keyword_prompt = PromptTemplate(
@@ -67,10 +108,9 @@ class BaseRetriever:
 
         model = self.llm_service.model
 
-        chain = keyword_prompt | model | keyword_parser
-
-        answer = chain.invoke({"question": question})
+        return keyword_prompt | model | keyword_parser
 
+    def _top_keywords(self, question, answer, top_k, verbose):
         if verbose:
             self.logger.info(f"Extracted keywords \"{answer}\" from question \"{question}\" by LLM")
 
@@ -83,6 +123,14 @@ class BaseRetriever:
         return keywords
 
     def _expand_question(self, question, top_k, verbose):
+        answer = self._expansion_chain().invoke({"question": question})
+        return self._top_questions(question, answer, top_k, verbose)
+
+    async def _aexpand_question(self, question, top_k, verbose):
+        answer = await self._expansion_chain().ainvoke({"question": question})
+        return self._top_questions(question, answer, top_k, verbose)
+
+    def _expansion_chain(self):
         question_parser = PydanticOutputParser(pydantic_object=CandidateGenerator)
 
         QUESTION_PROMPT = PromptTemplate(
@@ -93,11 +141,10 @@ class BaseRetriever:
 
         model = self.llm_service.model
 
-        chain = QUESTION_PROMPT | model | question_parser
         #chain = QUESTION_PROMPT | model
+        return QUESTION_PROMPT | model | question_parser
 
-        answer = chain.invoke({"question": question})
-
+    def _top_questions(self, question, answer, top_k, verbose):
         if verbose:
             self.logger.info(f"Expanded question \"{question}\" from LLM: {answer}")
 
@@ -137,18 +184,24 @@ class BaseRetriever:
         else:
             return embedding
 
-    def _hyde_embedding(self, text, str_mode: bool = False) -> str:
+    def _hyde_text(self, text) -> str:
+        # hypothetical document answering the question
+        return self._hyde_chain().invoke({"question": text})
+
+    async def _ahyde_text(self, text) -> str:
+        return await self._hyde_chain().ainvoke({"question": text})
+
+    def _hyde_chain(self):
         model = self.llm_service.llm
         prompt = self.llm_service.hyde_prompt
 
         prompt = ChatPromptTemplate.from_template(prompt)
         output_parser = StrOutputParser()
 
-        chain = prompt | model | output_parser
-
-        generated = chain.invoke({"question": text})
+        return prompt | model | output_parser
 
-        return self._generate_embedding(generated, str_mode)
+    def _hyde_embedding(self, text, str_mode: bool = False) -> str:
+        return self._generate_embedding(self._hyde_text(text), str_mode)
 
     """    
     def _get_entities_relationships(self, text: str, extractor: BaseExtractor):
@@ -156,52 +209,117 @@ class BaseRetriever:
     """
 
     def _generate_start_set(self, questions, indices, top_k, similarity_threshold: float = 0.90, filter_expr: str = None, withHyDE: bool = False, verbose: bool = False):
+        """
+        Find the top_k vertices most similar to any of the questions, across the indices.
+        The questions are embedded concurrently, and the searches, one per (question, index)
+        for Milvus or one per question for TigerGraph, run concurrently.
+        """
         if not isinstance(questions, list):
             questions = [questions]
 
-        candidate_set = []
-        for question in questions:
-            if withHyDE:
-                query_embedding = self._hyde_embedding(question)
-            else:
-                query_embedding = self._generate_embedding(question)
-            if embedding_store_type == "tigergraph":
-                if filter_expr and "\"%" in filter_expr:
-                    filter_expr = re.findall(r'"(%[^"]*)"', filter_expr)[0]
-                res = self.embedding_store.retrieve_similar_with_score(
-                    query_embedding=query_embedding,
-                    top_k=top_k,
-                    similarity_threshold=similarity_threshold,
-                    vertex_types=indices,
-                    filter_expr=filter_expr,
-                )
-                verbose and self.logger.info(f"Retrived topk similar for query \"{question}\": {res}")
-                candidate_set += res
-            else:
-                #old_collection_name = self.embedding_store.collection_name
-                for v_type in indices:
-                    self.embedding_store.set_collection_name(self.conn.graphname+"_"+v_type)
-                    res = self.embedding_store.retrieve_similar_with_score(
+        if withHyDE:
+            texts = list(_retrieval_pool.map(_in_context(self._hyde_text), questions))
+        else:
+            texts = questions
+        query_embeddings = self.emb_service.embed_queries(texts)
+        if embedding_store_type == "tigergraph":
+            self.embedding_store.ensure_vector_queries(self.conn.graphname)
+
+        searches = {
+            key: _retrieval_pool.submit(
+                _in_context(self.embedding_store.retrieve_similar_with_score), **kwargs
+            )
+            for key, kwargs in self._similarity_searches(
+                questions, query_embeddings, indices, top_k, similarity_threshold, filter_expr
+            )
+        }
+        return self._merge_start_set(
+            ((key, search.result()) for key, search in searches.items()), top_k, verbose
+        )
+
+    async def _agenerate_start_set(self, questions, indices, top_k, similarity_threshold: float = 0.90, filter_expr: str = None, withHyDE: bool = False, verbose: bool = False):
+        """
+        Same as _generate_start_set, with the LLM, embedding and vector store calls
+        awaited concurrently instead of run on the retrieval pool.
+        """
+        if not isinstance(questions, list):
+            questions = [questions]
+
+        if withHyDE:
+            texts = await asyncio.gather(*(self._ahyde_text(q) for q in questions))
+        else:
+            texts = questions
+        query_embeddings = await self.emb_service.aembed_queries(texts)
+        if embedding_store_type == "tigergraph":
+            await self.embedding_store.aensure_vector_queries(self.conn.graphname)
+
+        searches = self._similarity_searches(
+            questions, query_embeddings, indices, top_k, similarity_threshold, filter_expr
+        )
+        results = await asyncio.gather(
+            *(self.embedding_store.aretrieve_similar_with_score(**kwargs) for _, kwargs in searches)
+        )
+        return self._merge_start_set(
+            zip((key for key, _ in searches), results), top_k, verbose
+        )
+
+    def _similarity_searches(self, questions, query_embeddings, indices, top_k, similarity_threshold, filter_expr):
+        # (question, index) and the arguments of each similarity search of a start set
+        if embedding_store_type == "tigergraph":
+            if filter_expr and "\"%" in filter_expr:
+                filter_expr = re.findall(r'"(%[^"]*)"', filter_expr)[0]
+            return [
+                (
+                    (question, None),
+                    dict(
                         query_embedding=query_embedding,
                         top_k=top_k,
                         similarity_threshold=similarity_threshold,
+                        vertex_types=indices,
                         filter_expr=filter_expr,
-                    )
-                    for doc in res:
-                        doc[0].metadata["vertex_type"] = v_type
-                    verbose and self.logger.info(f"Retrived topk similar for query \"{question}\": {res}")
-                    candidate_set += res
-                #self.embedding_store.set_collection_name(old_collection_name)
-        candidate_set.sort(key=lambda x: x[1], reverse=True)
-        start_set = []
-        for document, _ in candidate_set:
-            start_set.append({"v": document.metadata["vertex_id"], "t": document.metadata["vertex_type"]})
-        start_set = [dict(d) for d in {tuple(vt.items()) for vt in start_set}][:top_k]
+                        # the store is shared between graphs, each search names its own
+                        graphname=self.conn.graphname,
+                    ),
+                )
+                for question, query_embedding in zip(questions, query_embeddings)
+            ]
+        return [
+            (
+                (question, v_type),
+                dict(
+                    query_embedding=query_embedding,
+                    top_k=top_k,
+                    similarity_threshold=similarity_threshold,
+                    filter_expr=filter_expr,
+                    collection_name=self.conn.graphname+"_"+v_type,
+                ),
+            )
+            for question, query_embedding in zip(questions, query_embeddings)
+            for v_type in indices
+        ]
+
+    def _merge_start_set(self, results, top_k, verbose):
+        # best score of each vertex over all the searches
+        merged = ResultMerger()
+        for (question, v_type), res in results:
+            verbose and self.logger.info(f"Retrived topk similar for query \"{question}\": {res}")
+            merged.add(
+                (
+                    (document.metadata["vertex_id"], v_type or document.metadata["vertex_type"])
+                    for document, _ in res
+                ),
+                (score for _, score in res),
+            )
+
+        start_set = [{"v": v_id, "t": v_type} for (v_id, v_type), _ in merged.top(top_k)]
         verbose and self.logger.info(f"Returning start_set: {str(start_set)}")
         return start_set
 
     def search(self, question):
         pass
 
+    async def asearch(self, question):
+        pass
+
     def retrieve_answer(self, question):
         pass
@@ -66,6 +66,36 @@ class GraphRAGRetriever(BaseRetriever):
             res[1]["verbose"]["expanded_questions"] = questions
         return res
     
+    async def asearch(self, question, community_level: int, top_k: int = 5, similarity_threshold = 0.90, expand: bool = False, with_chunk: bool = True, with_doc: bool = False, verbose: bool = False):
+        # same as search, with an AsyncTigerGraphConnectionProxy
+        if expand:
+            questions = await self._aexpand_question(question, top_k, verbose=verbose)
+        else:
+            questions = [question]
+        filter_expr = f"vertex_id like \"%"
+        for i in range(1, community_level+1):
+            filter_expr += f"_{i}"
+        filter_expr += "\""  
+        start_set = await self._agenerate_start_set(questions, ["Community"], top_k, similarity_threshold, filter_expr=filter_expr, verbose=verbose)
+
+        await self._acheck_query_install("GraphRAG_Community_Search")
+        res = await self.conn.runInstalledQuery(
+            "GraphRAG_Community_Search",
+            params = {
+                "json_list_vts": str(start_set),
+                "community_level": community_level,
+                "with_chunk": with_chunk,
+                "with_doc": with_doc,
+                "verbose": verbose,
+            },
+            usePost=True
+        )
+        if len(res) > 1 and "verbose" in res[1]:
+            verbose_info = json.dumps(res[1]['verbose'])
+            self.logger.info(f"Retrived GraphRAG query verbose info: {verbose_info}")
+            res[1]["verbose"]["expanded_questions"] = questions
+        return res
+    
     async def _generate_candidate(self, question, context):
         answer_parser = PydanticOutputParser(pydantic_object=CommunityAnswer)
 
@@ -88,13 +118,12 @@ class GraphRAGRetriever(BaseRetriever):
 
         return answer
     
-    def gather_candidates(self, question, context):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def agather_candidates(self, question, context):
         tasks = [self._generate_candidate(question, c) for c in context]
-        res = loop.run_until_complete(asyncio.gather(*tasks))
-        loop.close()
-        return res
+        return await asyncio.gather(*tasks)
+
+    def gather_candidates(self, question, context):
+        return asyncio.run(self.agather_candidates(question, context))
     
     def retrieve_answer(self,
                         question: str,
@@ -68,6 +68,62 @@ class HNSWOverlapRetriever(BaseRetriever):
             res[1]["verbose"]["expanded_questions"] = questions
         return res
 
+    async def asearch(self, question, indices, top_k=1, similarity_threshold=0.90, num_hops=2, num_seen_min=1, expand = False, method = "similarity", chunk_only=False, doc_only=False, verbose=False):
+        # same as search, with an AsyncTigerGraphConnectionProxy
+        if expand:
+            questions = await self._aexpand_question(question, top_k, verbose)
+        else:
+            questions = [question]
+        verbose and self.logger.info(f"Questions to use: {questions}")
+
+        method = method.lower()
+        if method == "keywords" or method == "both" or method == "all":
+            keywords = await self._aquestion_to_keywords(questions, top_k, verbose)
+            verbose and self.logger.info(f"Searching with keywords: {keywords}")
+
+            await self._acheck_query_install("Keyword_Search")
+            res = await self.conn.runInstalledQuery(
+                "Keyword_Search",
+                params = {
+                    "keywords": keywords,
+                    "mode": "Any",
+                    "top_k": top_k,
+                    "doc_only": doc_only,
+                    "verbose": verbose,
+                },
+                usePost=True
+            )            
+            start_set = []
+            if len(res) > 1 and "selected_set" in res[1]:
+                if len(res[1]["selected_set"]) > 0:
+                    start_set += res[1]["selected_set"]
+            self.logger.info(f"Got start_set from keywords {keywords}: {str(start_set)}")
+            if not method == "keywords":
+                start_set += await self._agenerate_start_set(questions, indices, top_k, similarity_threshold, verbose=verbose)
+        else:
+            start_set = await self._agenerate_start_set(questions, indices, top_k, similarity_threshold, verbose=verbose)
+
+        verbose and self.logger.info(f"Searching with start_set: {str(start_set)}")
+
+        await self._acheck_query_install("HNSW_Overlap_Search")
+        res = await self.conn.runInstalledQuery(
+            "HNSW_Overlap_Search",
+            params = {
+                "json_list_vts": str(start_set),
+                "num_hops": num_hops,
+                "num_seen_min": num_seen_min,
+                "chunk_only": chunk_only,
+                "doc_only": doc_only,
+                "verbose": verbose,
+            },
+            usePost=True
+        )            
+        if len(res) > 1 and "verbose" in res[1]:
+            verbose_info = json.dumps(res[1]['verbose'])
+            self.logger.info(f"Retrived HNSWOverlap query verbose info: {verbose_info}")
+            res[1]["verbose"]["expanded_questions"] = questions
+        return res
+
     def retrieve_answer(self, question, index, top_k=1, similarity_threshold=0.90, num_hops=2, num_seen_min=1, expand: bool = False, method: str = "similarity", chunk_only: bool = False, doc_only: bool = False, combine: bool = False, verbose: bool = False):
         retrieved = self.search(question, index, top_k, similarity_threshold, num_hops, num_seen_min, expand, method, chunk_only, doc_only, verbose)
 
@@ -37,6 +37,30 @@ class HNSWRetriever(BaseRetriever):
             res[1]["verbose"]["expanded_questions"] = questions
         return res
 
+    async def asearch(self, question, index, top_k=1, withHyDE=False, expand=False, verbose=False):
+        # same as search, with an AsyncTigerGraphConnectionProxy
+        if expand:
+            questions = await self._aexpand_question(question, top_k, verbose)
+        else:
+            questions = [question]
+        start_set = await self._agenerate_start_set(questions, [index], top_k, withHyDE=withHyDE, verbose=verbose)
+
+        await self._acheck_query_install("HNSW_Content_Search")
+        res = await self.conn.runInstalledQuery(
+            "HNSW_Content_Search",
+            params = {
+                "json_list_vts": str(start_set),
+                "v_type": index,
+                "verbose": verbose,
+            },
+            usePost=True
+        )
+        if len(res) > 1 and "verbose" in res[1]:
+            verbose_info = json.dumps(res[1]['verbose'])
+            self.logger.info(f"Retrived HNSW query verbose info: {verbose_info}")
+            res[1]["verbose"]["expanded_questions"] = questions
+        return res
+
     def retrieve_answer(self, question, index, top_k=1, withHyDE=False, expand=False, combine=False, verbose=False):
         retrieved = self.search(question, index, top_k, withHyDE, expand, verbose)
         context = [retrieved[0]["final_retrieval"][x] for x in retrieved[0]["final_retrieval"]]
@@ -39,6 +39,32 @@ class HNSWSiblingRetriever(BaseRetriever):
             res[1]["verbose"]["expanded_questions"] = questions
         return res
 
+    async def asearch(self, question, index, top_k=1, lookback=3, lookahead=3, expand=False, withHyDE=False, verbose=False):
+        # same as search, with an AsyncTigerGraphConnectionProxy
+        if expand:
+            questions = await self._aexpand_question(question, top_k, verbose)
+        else:
+            questions = [question]
+        start_set = await self._agenerate_start_set(questions, [index], top_k, withHyDE=withHyDE, verbose=verbose)
+
+        await self._acheck_query_install("HNSW_Chunk_Sibling_Search")
+        res = await self.conn.runInstalledQuery(
+            "HNSW_Chunk_Sibling_Search",
+            params = {
+                "json_list_vts": str(start_set),
+                "v_type": index,
+                "lookback": lookback,
+                "lookahead": lookahead,
+                "verbose": verbose,
+            },
+            usePost=True
+        )
+        if len(res) > 1 and "verbose" in res[1]:
+            verbose_info = json.dumps(res[1]['verbose'])
+            self.logger.info(f"Retrived HNSWChunkSibling query verbose info: {verbose_info}")
+            res[1]["verbose"]["expanded_questions"] = questions
+        return res
+
     def retrieve_answer(
         self, question, index, top_k=1, lookback=3, lookahead=3, withHyDE=False, expand=False, combine=False, verbose=False
     ):
@@ -5,6 +5,7 @@ import logging
 
 from pyTigerGraph import TigerGraphConnection
 from common.config import embedding_store_type
+from common.db.schema_cache import schema_cache
 
 from common.py_schemas.schemas import (
     # CoPilotResponse,
@@ -70,6 +71,9 @@ def init_supportai(conn: TigerGraphConnection, graphname: str) -> tuple[dict, di
             )
         )
 
+    # the agent tools see the new vertex types on their next question
+    schema_cache.invalidate(conn)
+
     supportai_queries = [
         "common/gsql/supportai/Scan_For_Updates.gsql",
         "common/gsql/supportai/Update_Vertices_Processing_Status.gsql",
@@ -2,4 +2,4 @@ from .generate_function import GenerateFunction
 from .map_question_to_schema import MapQuestionToSchema
 from .generate_cypher import GenerateCypher
 from .validation_utils import MapQuestionToSchemaException, InvalidFunctionCallException
-from .validation_utils import validate_schema, validate_function_call
+from .validation_utils import validate_schema, validate_function_call, avalidate_schema, avalidate_function_call
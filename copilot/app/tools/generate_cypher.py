@@ -3,6 +3,7 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import PromptTemplate
 from langchain.tools import BaseTool
 from langchain.llms.base import LLM
+from common.db.schema_cache import aget_schema, get_schema
 from common.metrics.tg_proxy import TigerGraphConnectionProxy
 
 logger = logging.getLogger(__name__)
@@ -32,55 +33,11 @@ class GenerateCypher(BaseTool):
         self.llm = llm
 
     def _generate_schema_rep(self):
-        verts = self.conn.getVertexTypes()
-        edges = self.conn.getEdgeTypes()
-        vertex_schema = []
-        for vert in verts:
-            primary_id = self.conn.getVertexType(vert)["PrimaryId"]["AttributeName"]
-            attributes = "\n\t\t".join([attr["AttributeName"] + " of type " + attr["AttributeType"]["Name"] 
-                                        for attr in self.conn.getVertexType(vert)["Attributes"]])
-            if attributes == "":
-                attributes = "No attributes"
-            vertex_schema.append(f"{vert}\n\tPrimary Id Attribute: {primary_id}\n\tAttributes: \n\t\t{attributes}")
+        return get_schema(self.conn).schema_rep
 
-        edge_schema = []
-        for edge in edges:
-            from_vertex = self.conn.getEdgeType(edge)["FromVertexTypeName"]
-            to_vertex = self.conn.getEdgeType(edge)["ToVertexTypeName"]
-            direction = "Directed" if self.conn.getEdgeType(edge)["IsDirected"] else "Undirected"
-            #reverse_edge = conn.getEdgeType(edge)["Config"].get("REVERSE_EDGE")
-            attributes = "\n\t\t".join([attr["AttributeName"] + " of type " + attr["AttributeType"]["Name"] 
-                                        for attr in self.conn.getEdgeType(edge)["Attributes"]])
-            if attributes == "":
-                attributes = "No attributes"
-            if from_vertex == "*" or to_vertex == "*":
-                edge_pairs = self.conn.getEdgeType(edge)["EdgePairs"]
-                for an_edge in edge_pairs:
-                    edge_info = f"""From Vertex: {an_edge["From"]}\n\tTo Vertex: {an_edge["To"]}"""
-                    edge_schema.append(f"""{edge}\n\t{edge_info}\n\tEdge direction: {direction}\n\tAttributes: \n\t\t{attributes}""")
-            else:
-                edge_info = f"""From Vertex: {from_vertex}\n\tTo Vertex: {to_vertex}"""
-                edge_schema.append(f"""{edge}\n\t{edge_info}\n\tEdge direction: {direction}\n\tAttributes: \n\t\t{attributes}""")
-
-        schema_rep = f"""The schema of the graph is as follows:
-Vertex Types:
-{chr(10).join(vertex_schema)}
-
-Edge Types:
-{chr(10).join(edge_schema)}
-"""
-        return schema_rep
-        
-    def generate_cypher(self, question: str) -> str:
-        """Generate Cypher query for the question.
-        Args:
-            question (str):
-                question to generate the Cypher query for.
-        Returns:
-            str:
-                Cypher query for the question.
-        """
-        PROMPT = PromptTemplate(
+    @staticmethod
+    def _prompt() -> PromptTemplate:
+        return PromptTemplate(
             template="""You're an expert in OpenCypher programming. Given the following schema: {schema}, what is the OpenCypher query that retrieves the {question} 
                         Only include attributes that are found in the schema. Never include any attributes that are not found in the schema.
                         Use attributes instead of primary id if attribute name is closer to the keyword type in the question.
@@ -108,15 +65,36 @@ Edge Types:
             ]
         )
 
+    def _wrap_query(self, out: str) -> str:
+        out = out.strip("```cypher").strip("```")
+        query_header = "USE GRAPH " + self.conn.graphname + " "+ "\n" + "INTERPRET OPENCYPHER QUERY () {" + "\n"
+        query_footer = "\n}"
+        return query_header + out + query_footer
+
+    def generate_cypher(self, question: str) -> str:
+        """Generate Cypher query for the question.
+        Args:
+            question (str):
+                question to generate the Cypher query for.
+        Returns:
+            str:
+                Cypher query for the question.
+        """
+        PROMPT = self._prompt()
         schema = self._generate_schema_rep()
     
         logger.info("Prompt to LLM:\n" + PROMPT.invoke({"question": question, "schema": schema}).to_string())
 
         chain = PROMPT | self.llm.model | StrOutputParser()
-        out = chain.invoke({"question": question, "schema": schema}).strip("```cypher").strip("```")
-        query_header = "USE GRAPH " + self.conn.graphname + " "+ "\n" + "INTERPRET OPENCYPHER QUERY () {" + "\n"
-        query_footer = "\n}"
-        return query_header + out + query_footer
+        return self._wrap_query(chain.invoke({"question": question, "schema": schema}))
+
+    async def agenerate_cypher(self, question: str) -> str:
+        """Same as generate_cypher, with an AsyncTigerGraphConnectionProxy."""
+        PROMPT = self._prompt()
+        schema = (await aget_schema(self.conn)).schema_rep
+
+        chain = PROMPT | self.llm.model | StrOutputParser()
+        return self._wrap_query(await chain.ainvoke({"question": question, "schema": schema}))
     
     def _run(self, question: str):
         """Run the GenerateCypher tool.
@@ -129,5 +107,5 @@ Edge Types:
         """
         return self.generate_cypher(question)
     
-    def _arun(self, question: str):
-        raise NotImplementedError("Asynchronous execution is not supported for this tool.")
+    async def _arun(self, question: str):
+        return await self.agenerate_cypher(question)
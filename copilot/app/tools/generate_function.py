@@ -1,3 +1,5 @@
+import asyncio
+import inspect
 import json
 import logging
 from typing import Dict, List, Optional, Type, Union
@@ -21,6 +23,8 @@ from .validation_utils import (
     InvalidFunctionCallException,
     MapQuestionToSchemaException,
     NoDocumentsFoundException,
+    avalidate_function_call,
+    avalidate_schema,
     validate_function_call,
     validate_schema,
 )
@@ -110,48 +114,18 @@ class GenerateFunction(BaseTool):
             )
             return e
 
-        lookup_question = question + " "
-        if target_vertex_types != []:
-            lookup_question += "using vertices: " + str(target_vertex_types) + " "
-        if target_edge_types != []:
-            lookup_question += "using edges: " + str(target_edge_types)
-
-        logger.debug_pii(
-            f"request_id={req_id_cv.get()} retrieving documents for question={lookup_question}"
-        )
-        func_parser = PydanticOutputParser(pydantic_object=GenerateFunctionResponse)
-
-        PROMPT = PromptTemplate(
-            template=self.prompt,
-            input_variables=[
-                "question",
-                "vertex_types",
-                "edge_types",
-                "vertex_attributes",
-                "vertex_ids",
-                "edge_attributes",
-                "doc1",
-                "doc2",
-                "doc3",
-                "doc4",
-                "doc5",
-                "doc6",
-                "doc7",
-                "doc8",
-            ],
-            partial_variables={
-                "format_instructions": func_parser.get_format_instructions()
-            },
-        )
+        lookup_question = self._lookup_question(question, target_vertex_types, target_edge_types)
+        func_parser, PROMPT = self._prompt()
 
+        lookup_embedding = self.embedding_model.embed_query(lookup_question)
         pytg_docs = self.embedding_store.retrieve_similar(
-            self.embedding_model.embed_query(lookup_question),
+            lookup_embedding,
             top_k=5,
             filter_expr="graphname == 'all'",
         )
 
         custom_docs = self.embedding_store.retrieve_similar(
-            self.embedding_model.embed_query(lookup_question),
+            lookup_embedding,
             top_k=3,
             filter_expr="graphname == '{}'".format(self.conn.graphname),
         )
@@ -166,30 +140,15 @@ class GenerateFunction(BaseTool):
             )
         ]
 
-        if len(docs) == 0:
-            LogWriter.warning(f"request_id={req_id_cv.get()} WARN no documents found")
-            raise NoDocumentsFoundException
-
-        inputs = [
-            {
-                "question": question,
-                "vertex_types": target_vertex_types,
-                "edge_types": target_edge_types,
-                "vertex_attributes": target_vertex_attributes,
-                "vertex_ids": target_vertex_ids,
-                "edge_attributes": target_edge_attributes,
-                "doc1": docs[0].page_content,
-                "doc2": docs[1].page_content if len(docs) > 1 else "",
-                "doc3": docs[2].page_content if len(docs) > 2 else "",
-                "doc4": docs[3].page_content if len(docs) > 3 else "",
-                "doc5": docs[4].page_content if len(docs) > 4 else "",
-                "doc6": docs[5].page_content if len(docs) > 5 else "",
-                "doc7": docs[6].page_content if len(docs) > 6 else "",
-                "doc8": docs[7].page_content if len(docs) > 7 else "",
-            }
-        ]
-
-        logger.debug(f"request_id={req_id_cv.get()} retrieved documents={docs}")
+        inputs = self._inputs(
+            docs,
+            question,
+            target_vertex_types,
+            target_vertex_attributes,
+            target_vertex_ids,
+            target_edge_types,
+            target_edge_attributes,
+        )
 
         chain = LLMChain(llm=self.llm, prompt=PROMPT)
         generated = chain.apply(inputs)[0]["text"]
@@ -232,9 +191,189 @@ class GenerateFunction(BaseTool):
                 "The function {} did not execute correctly with error: {}".format(parsed_func, e)
             )
 
-    async def _arun(self) -> str:
-        """Use the tool asynchronously."""
-        raise NotImplementedError("custom_search does not support async")
+    async def _arun(
+        self,
+        question: str,
+        target_vertex_types: List[str] = [],
+        target_vertex_attributes: Dict[str, List[str]] = {},
+        target_vertex_ids: Dict[str, List[str]] = {},
+        target_edge_types: List[str] = [],
+        target_edge_attributes: Dict[str, List[str]] = {},
+    ) -> str:
+        """Run the tool asynchronously, with an AsyncTigerGraphConnectionProxy.
+        Takes the same arguments as _run.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY GenerateFunction._arun()")
+
+        if target_vertex_types == [] and target_edge_types == []:
+            return {
+                "error": "No vertex or edge types recognized. MapQuestionToSchema and then try again."
+            }
+
+        try:
+            await avalidate_schema(
+                self.conn,
+                target_vertex_types,
+                target_edge_types,
+                target_vertex_attributes,
+                target_edge_attributes,
+            )
+        except MapQuestionToSchemaException as e:
+            LogWriter.warning(
+                f"request_id={req_id_cv.get()} WARN input schema not valid"
+            )
+            return e
+
+        lookup_question = self._lookup_question(question, target_vertex_types, target_edge_types)
+        func_parser, PROMPT = self._prompt()
+
+        lookup_embedding = await self.embedding_model.aembed_query(lookup_question)
+        pytg_docs, custom_docs, registered = await asyncio.gather(
+            self.embedding_store.aretrieve_similar(
+                lookup_embedding,
+                top_k=5,
+                filter_expr="graphname == 'all'",
+            ),
+            self.embedding_store.aretrieve_similar(
+                lookup_embedding,
+                top_k=3,
+                filter_expr="graphname == '{}'".format(self.conn.graphname),
+            ),
+            asyncio.to_thread(
+                self.embedding_store.list_registered_documents,
+                output_fields=["function_header"],
+            ),
+        )
+        # Prioritize pyTigerGraph docs over custom docs
+        docs = pytg_docs + custom_docs
+        valid_function_calls = [x["function_header"] for x in registered]
+
+        inputs = self._inputs(
+            docs,
+            question,
+            target_vertex_types,
+            target_vertex_attributes,
+            target_vertex_ids,
+            target_edge_types,
+            target_edge_attributes,
+        )
+
+        chain = LLMChain(llm=self.llm, prompt=PROMPT)
+        generated = (await chain.aapply(inputs))[0]["text"]
+        generated = func_parser.invoke(generated)
+        try:
+            parsed_func = await avalidate_function_call(
+                self.conn, generated.connection_func_call, valid_function_calls
+            )
+        except InvalidFunctionCallException as e:
+            LogWriter.warning(
+                f"request_id={req_id_cv.get()} EXIT GenerateFunction._arun() with exception={e}"
+            )
+            return e
+
+        try:
+            loc = {}
+            exec("res = conn." + parsed_func, {"conn": self.conn}, loc)
+            res = loc["res"]
+            # the async connection's methods return coroutines
+            if inspect.isawaitable(res):
+                res = await res
+            LogWriter.info(f"request_id={req_id_cv.get()} EXIT GenerateFunction._arun()")
+            if "runInstalledQuery" in parsed_func:
+                query_name = parsed_func.split("(")[1].split(",")[0].strip("'")
+                return {
+                    "function_call": parsed_func,
+                    "result": json.dumps(res),
+                    "reasoning": generated.func_call_reasoning,
+                    "query_output_format": (await self.conn.getQueryMetadata(query_name))["output"]
+                }
+            else:
+                return {
+                    "function_call": parsed_func,
+                    "result": json.dumps(res),
+                    "reasoning": generated.func_call_reasoning,
+                }
+        except Exception as e:
+            LogWriter.warning(
+                f"request_id={req_id_cv.get()} EXIT GenerateFunction._arun() with exception={e}"
+            )
+            raise ToolException(
+                "The function {} did not execute correctly with error: {}".format(parsed_func, e)
+            )
+
+    @staticmethod
+    def _lookup_question(question, target_vertex_types, target_edge_types) -> str:
+        lookup_question = question + " "
+        if target_vertex_types != []:
+            lookup_question += "using vertices: " + str(target_vertex_types) + " "
+        if target_edge_types != []:
+            lookup_question += "using edges: " + str(target_edge_types)
+
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} retrieving documents for question={lookup_question}"
+        )
+        return lookup_question
+
+    def _prompt(self):
+        func_parser = PydanticOutputParser(pydantic_object=GenerateFunctionResponse)
+
+        PROMPT = PromptTemplate(
+            template=self.prompt,
+            input_variables=[
+                "question",
+                "vertex_types",
+                "edge_types",
+                "vertex_attributes",
+                "vertex_ids",
+                "edge_attributes",
+                "doc1",
+                "doc2",
+                "doc3",
+                "doc4",
+                "doc5",
+                "doc6",
+                "doc7",
+                "doc8",
+            ],
+            partial_variables={
+                "format_instructions": func_parser.get_format_instructions()
+            },
+        )
+        return func_parser, PROMPT
+
+    @staticmethod
+    def _inputs(
+        docs,
+        question,
+        target_vertex_types,
+        target_vertex_attributes,
+        target_vertex_ids,
+        target_edge_types,
+        target_edge_attributes,
+    ) -> List[dict]:
+        if len(docs) == 0:
+            LogWriter.warning(f"request_id={req_id_cv.get()} WARN no documents found")
+            raise NoDocumentsFoundException
+
+        logger.debug(f"request_id={req_id_cv.get()} retrieved documents={docs}")
+        return [
+            {
+                "question": question,
+                "vertex_types": target_vertex_types,
+                "edge_types": target_edge_types,
+                "vertex_attributes": target_vertex_attributes,
+                "vertex_ids": target_vertex_ids,
+                "edge_attributes": target_edge_attributes,
+                "doc1": docs[0].page_content,
+                "doc2": docs[1].page_content if len(docs) > 1 else "",
+                "doc3": docs[2].page_content if len(docs) > 2 else "",
+                "doc4": docs[3].page_content if len(docs) > 3 else "",
+                "doc5": docs[4].page_content if len(docs) > 4 else "",
+                "doc6": docs[5].page_content if len(docs) > 5 else "",
+                "doc7": docs[6].page_content if len(docs) > 6 else "",
+                "doc8": docs[7].page_content if len(docs) > 7 else "",
+            }
+        ]
 
     # def _handle_error(error:Union[ToolException, MapQuestionToSchemaException]) -> str:
     #    return  "The following errors occurred during tool execution:" + error.args[0]+ "Please make sure the question is mapped to the schema correctly"
@@ -5,10 +5,12 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from langchain.pydantic_v1 import BaseModel, Field, validator
+from common.db.schema_cache import aget_schema, get_schema
 from common.metrics.tg_proxy import TigerGraphConnectionProxy
 from common.py_schemas import MapQuestionToSchemaResponse, MapAttributeToAttributeResponse
 from typing import List, Dict
-from .validation_utils import validate_schema, MapQuestionToSchemaException
+from .validation_utils import avalidate_schema, validate_schema, MapQuestionToSchemaException
+import asyncio
 import re
 import logging
 from common.logs.log import req_id_cv
@@ -45,13 +47,7 @@ class MapQuestionToSchema(BaseTool):
         self.llm = llm
         self.prompt = prompt
 
-    def _run(self, query: str, conversation: List[Dict[str, str]]) -> str:
-        """Run the tool.
-        Args:
-            query (str):
-                The user's question.
-        """
-        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY MapQuestionToSchema._run()")
+    def _restate_chain(self):
         parser = PydanticOutputParser(pydantic_object=MapQuestionToSchemaResponse)
 
         RESTATE_QUESTION_PROMPT = PromptTemplate(
@@ -67,47 +63,9 @@ class MapQuestionToSchema(BaseTool):
             partial_variables={"format_instructions": parser.get_format_instructions()},
         )
 
-        restate_chain = LLMChain(llm=self.llm, prompt=RESTATE_QUESTION_PROMPT)
-
-        vertices = self.conn.getVertexTypes()
-        edges = self.conn.getEdgeTypes()
-
-        vertices_info = []
-        for vertex in vertices:
-            vertex_attrs = self.conn.getVertexAttrs(vertex)
-            attributes = [attr[0] for attr in vertex_attrs]
-            vertex_info = {"vertex": vertex, "attributes": attributes}
-            vertices_info.append(vertex_info)
-
-        edges_info = []
-        for edge in edges:
-            source_vertex = self.conn.getEdgeSourceVertexType(edge)
-            target_vertex = self.conn.getEdgeTargetVertexType(edge)
-            edge_info = {"edge": edge, "source": source_vertex, "target": target_vertex}
-            edges_info.append(edge_info)
-
-        restate_q = restate_chain.apply(
-            [
-                {
-                    "vertices": vertices,
-                    "verticesAttrs": vertices_info,
-                    "edges": edges,
-                    "edgesInfo": edges_info,
-                    "question": query,
-                    "conversation": conversation
-                }
-            ]
-        )[0]["text"]
-
-        logger.debug(f"request_id={req_id_cv.get()} MapQuestionToSchema applied")
-        # logger.info(f"restate_q: {restate_q}")
-
-        parsed_q = parser.invoke(restate_q)
-
-        logger.debug_pii(
-            f"request_id={req_id_cv.get()} MapQuestionToSchema parsed for question={query} into normalized_form={parsed_q}"
-        )
+        return parser, LLMChain(llm=self.llm, prompt=RESTATE_QUESTION_PROMPT)
 
+    def _attr_map_chain(self):
         attr_prompt = """For the following source attributes: {parsed_attrs}, map them to the corresponding output attribute in this list: {real_attrs}.
                          Format the response way explained below:
                         {format_instructions}"""
@@ -124,13 +82,52 @@ class MapQuestionToSchema(BaseTool):
             },
         )
 
-        attr_map_chain = LLMChain(llm=self.llm, prompt=ATTR_MAP_PROMPT)
+        return attr_parser, LLMChain(llm=self.llm, prompt=ATTR_MAP_PROMPT)
+
+    @staticmethod
+    def _restate_inputs(schema, query, conversation):
+        return [
+            {
+                "vertices": schema.vertex_types,
+                "verticesAttrs": schema.vertices_info,
+                "edges": schema.edge_types,
+                "edgesInfo": schema.edges_info,
+                "question": query,
+                "conversation": conversation
+            }
+        ]
+
+    def _run(self, query: str, conversation: List[Dict[str, str]]) -> str:
+        """Run the tool.
+        Args:
+            query (str):
+                The user's question.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY MapQuestionToSchema._run()")
+        parser, restate_chain = self._restate_chain()
+
+        schema = get_schema(self.conn)
+
+        restate_q = restate_chain.apply(
+            self._restate_inputs(schema, query, conversation)
+        )[0]["text"]
+
+        logger.debug(f"request_id={req_id_cv.get()} MapQuestionToSchema applied")
+        # logger.info(f"restate_q: {restate_q}")
+
+        parsed_q = parser.invoke(restate_q)
+
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} MapQuestionToSchema parsed for question={query} into normalized_form={parsed_q}"
+        )
+
+        attr_parser, attr_map_chain = self._attr_map_chain()
         for vertex in parsed_q.target_vertex_attributes.keys():
             map_attr = attr_map_chain.apply(
                 [
                     {
                         "parsed_attrs": parsed_q.target_vertex_attributes[vertex],
-                        "real_attrs": [attr[0] for attr in self.conn.getVertexAttrs(vertex)],
+                        "real_attrs": schema.vertex_attrs(vertex),
                     }
                 ]
             )[0]["text"]
@@ -146,7 +143,7 @@ class MapQuestionToSchema(BaseTool):
                 [
                     {
                         "parsed_attrs": parsed_q.target_edge_attributes[edge],
-                        "real_attrs": self.conn.getEdgeAttrs(edge),
+                        "real_attrs": schema.edge_attrs(edge),
                     }
                 ]
             )[0]["text"]
@@ -174,9 +171,70 @@ class MapQuestionToSchema(BaseTool):
         # logger.info(f"parsed_q: {parsed_q}")
         return parsed_q
 
-    async def _arun(self) -> str:
-        """Use the tool asynchronously."""
-        raise NotImplementedError("custom_search does not support async")
+    async def _arun(self, query: str, conversation: List[Dict[str, str]]) -> str:
+        """Run the tool asynchronously, with an AsyncTigerGraphConnectionProxy.
+        The attributes of the target vertex and edge types are mapped concurrently.
+        Args:
+            query (str):
+                The user's question.
+        """
+        LogWriter.info(f"request_id={req_id_cv.get()} ENTRY MapQuestionToSchema._arun()")
+        parser, restate_chain = self._restate_chain()
+
+        schema = await aget_schema(self.conn)
+
+        restate_q = (
+            await restate_chain.aapply(self._restate_inputs(schema, query, conversation))
+        )[0]["text"]
+        parsed_q = parser.invoke(restate_q)
+
+        logger.debug_pii(
+            f"request_id={req_id_cv.get()} MapQuestionToSchema parsed for question={query} into normalized_form={parsed_q}"
+        )
+
+        attr_parser, attr_map_chain = self._attr_map_chain()
+        vertices = list(parsed_q.target_vertex_attributes.keys())
+        edges = list(parsed_q.target_edge_attributes.keys())
+        inputs = [
+            {
+                "parsed_attrs": parsed_q.target_vertex_attributes[vertex],
+                "real_attrs": schema.vertex_attrs(vertex),
+            }
+            for vertex in vertices
+        ] + [
+            {
+                "parsed_attrs": parsed_q.target_edge_attributes[edge],
+                "real_attrs": schema.edge_attrs(edge),
+            }
+            for edge in edges
+        ]
+        mapped = await asyncio.gather(*[attr_map_chain.aapply([i]) for i in inputs])
+        parsed_maps = [attr_parser.invoke(m[0]["text"]).attr_map for m in mapped]
+
+        for vertex, parsed_map in zip(vertices, parsed_maps):
+            parsed_q.target_vertex_attributes[vertex] = [
+                parsed_map.get(x) for x in list(parsed_q.target_vertex_attributes[vertex])
+            ]
+        for edge, parsed_map in zip(edges, parsed_maps[len(vertices):]):
+            parsed_q.target_edge_attributes[edge] = [
+                parsed_map[x] for x in list(parsed_q.target_edge_attributes[edge])
+            ]
+
+        try:
+            await avalidate_schema(
+                self.conn,
+                parsed_q.target_vertex_types,
+                parsed_q.target_edge_types,
+                parsed_q.target_vertex_attributes,
+                parsed_q.target_edge_attributes,
+            )
+        except MapQuestionToSchemaException as e:
+            LogWriter.warning(
+                f"request_id={req_id_cv.get()} WARN MapQuestionToSchema to validate schema"
+            )
+            raise e
+        LogWriter.info(f"request_id={req_id_cv.get()} EXIT MapQuestionToSchema._arun()")
+        return parsed_q
 
     # def _handle_error(self, error:MapQuestionToSchemaException) -> str:
     #    return  "The following errors occurred during tool execution:" + error.args[0]+ "Please make sure to map the question to the schema"
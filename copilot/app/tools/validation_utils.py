@@ -5,6 +5,7 @@ Used to verify that the tools correctly mapped questions to valid schema element
 """
 
 import logging
+from common.db.schema_cache import aget_schema, get_schema
 from common.logs.log import req_id_cv
 from common.logs.logwriter import LogWriter
 
@@ -24,15 +25,23 @@ class InvalidFunctionCallException(Exception):
 
 
 def validate_schema(conn, v_types, e_types, v_attrs, e_attrs):
+    return _validate_schema(get_schema(conn), v_types, e_types, v_attrs, e_attrs)
+
+
+async def avalidate_schema(conn, v_types, e_types, v_attrs, e_attrs):
+    return _validate_schema(await aget_schema(conn), v_types, e_types, v_attrs, e_attrs)
+
+
+def _validate_schema(schema, v_types, e_types, v_attrs, e_attrs):
     LogWriter.info(f"request_id={req_id_cv.get()} ENTRY validate_schema()")
-    vertices = conn.getVertexTypes()
-    edges = conn.getEdgeTypes()
+    vertices = schema.vertex_types
+    edges = schema.edge_types
     for v in v_types:
         logger.debug(
             f"request_id={req_id_cv.get()} validate_schema() validating vertex_type={v}"
         )
         if v in vertices:
-            attrs = [x["AttributeName"] for x in conn.getVertexType(v)["Attributes"]]
+            attrs = schema.vertex_attrs(v)
             for attr in v_attrs.get(v, []):
                 if attr not in attrs and attr != "":
                     if attr is None:
@@ -52,7 +61,7 @@ def validate_schema(conn, v_types, e_types, v_attrs, e_attrs):
             f"request_id={req_id_cv.get()} validate_schema() validating edge_type={e}"
         )
         if e in edges:
-            attrs = [x["AttributeName"] for x in conn.getEdgeType(e)["Attributes"]]
+            attrs = schema.edge_attrs(e)
             for attr in e_attrs.get(e, []):
                 if attr not in attrs and attr != "":
                     if attr is None:
@@ -71,13 +80,23 @@ def validate_schema(conn, v_types, e_types, v_attrs, e_attrs):
 
 
 def validate_function_call(conn, generated_call: str, valid_functions: list) -> str:
+    endpoints = conn.getEndpoints(dynamic=True)  # installed queries in database
+    installed_queries = [q.split("/")[-1] for q in endpoints if f"/{conn.graphname}/" in q]
+    return _validate_function_call(installed_queries, generated_call, valid_functions)
+
+
+async def avalidate_function_call(conn, generated_call: str, valid_functions: list) -> str:
+    endpoints = await conn.getEndpoints(dynamic=True)  # installed queries in database
+    installed_queries = [q.split("/")[-1] for q in endpoints if f"/{conn.graphname}/" in q]
+    return _validate_function_call(installed_queries, generated_call, valid_functions)
+
+
+def _validate_function_call(installed_queries: list, generated_call: str, valid_functions: list) -> str:
     # handle installed queries
     LogWriter.info(f"request_id={req_id_cv.get()} ENTRY validate_function_call()")
     generated_call = generated_call.strip().strip("\n").strip("\t")
     # LogWriter.info(f"generated_call: {generated_call}")
     # LogWriter.info(f"valid_headers: {valid_headers}")
-    endpoints = conn.getEndpoints(dynamic=True)  # installed queries in database
-    installed_queries = [q.split("/")[-1] for q in endpoints if f"/{conn.graphname}/" in q]
 
     if "runInstalledQuery(" == generated_call[:18]:
         LogWriter.info(f"request_id={req_id_cv.get()} validate_function_call() validating custom query")
@@ -107,8 +126,8 @@ def validate_function_call(conn, generated_call: str, valid_functions: list) ->
                 + " is not an acceptable function. Please select from the retrieved functions."
             )
     elif "conn." == generated_call[:5]:
-        return validate_function_call(
-            conn, generated_call.strip("conn."), valid_functions
+        return _validate_function_call(
+            installed_queries, generated_call.strip("conn."), valid_functions
         )
     elif "gds.featurizer().runAlgorithm" == generated_call[:29]:
         LogWriter.info(f"request_id={req_id_cv.get()} validate_function_call() validating featurizer")
@@ -0,0 +1,304 @@
+"""Embedding store benchmark.
+
+Measures throughput (ops/sec) and p50/p99 latency of add_embeddings,
+retrieve_similar_with_score, has_embeddings and aget_k_closest on synthetic
+corpora, using FakeEmbeddingModel so no embedding service is needed.
+
+Run from copilot/tests:
+
+    python -m benchmarks.embedding_store --sizes 10000 100000 1000000
+    python -m benchmarks.embedding_store --store milvus --milvus-host localhost
+    python -m benchmarks.embedding_store --json results.json
+    python -m benchmarks.embedding_store --baseline results.json --tolerance 1.25
+
+With --baseline, the run exits non-zero if any operation's p50 latency grew
+past `tolerance` times the baseline's, so it can gate a build.
+
+The memory and local stores are added the precomputed corpus vectors. The Milvus and
+TigerGraph stores embed the corpus texts through FakeEmbeddingModel themselves,
+and TigerGraph needs a graph whose `--tg-vertex-type` has an `embedding` attribute.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np
+
+from benchmarks.fakes import FakeEmbeddingModel, InMemoryEmbeddingStore
+
+
+@dataclass
+class Corpus:
+    ids: List[str]
+    texts: List[str]
+    vectors: np.ndarray
+
+
+def make_corpus(n: int, dim: int, n_topics: int = None, noise: float = 0.1, seed: int = 0) -> Corpus:
+    """
+    n vectors clustered around n_topics directions (default n / 10),
+    so searches find near neighbours like they would on real entities
+    """
+    rng = np.random.default_rng(seed)
+    n_topics = n_topics or max(n // 10, 1)
+    centers = rng.standard_normal((n_topics, dim), dtype=np.float32)
+    topics = rng.integers(0, n_topics, n)
+    vectors = centers[topics] + noise * rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return Corpus(
+        ids=[f"v{i}" for i in range(n)],
+        texts=[f"topic{t}|doc{i}" for i, t in enumerate(topics)],
+        vectors=vectors,
+    )
+
+
+class MemoryAdapter:
+    name = "memory"
+
+    def __init__(self, args, n: int):
+        self.store = InMemoryEmbeddingStore(FakeEmbeddingModel(args.dim), capacity=n)
+
+    def add(self, corpus: Corpus, rows: slice):
+        self.store.add_embeddings(
+            list(zip(corpus.texts[rows], corpus.vectors[rows].tolist())),
+            [{"vertex_id": v_id} for v_id in corpus.ids[rows]],
+        )
+
+    def search(self, vector: List[float], k: int):
+        return self.store.retrieve_similar_with_score(vector, top_k=k)
+
+    def has(self, ids: List[str]):
+        return self.store.has_embeddings(ids)
+
+    async def k_closest(self, v_id: str, k: int):
+        return await self.store.aget_k_closest(v_id, k=k)
+
+    def close(self):
+        pass
+
+
+class LocalAdapter(MemoryAdapter):
+    name = "local"
+
+    def __init__(self, args, n: int):
+        from common.embeddings.local_embedding_store import LocalEmbeddingStore
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = LocalEmbeddingStore(
+            FakeEmbeddingModel(args.dim),
+            path=self.tmp.name,
+            support_ai_instance=True,
+            collection_name="benchmark",
+            snapshot_every=max(n, 1000),
+        )
+
+    def close(self):
+        self.store.collection().close()
+        self.tmp.cleanup()
+
+
+class MilvusAdapter(MemoryAdapter):
+    name = "milvus"
+
+    def __init__(self, args, n: int):
+        from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+
+        self.store = MilvusEmbeddingStore(
+            FakeEmbeddingModel(args.dim),
+            host=args.milvus_host,
+            port=args.milvus_port,
+            support_ai_instance=True,
+            collection_name=f"copilot_benchmark_{n}",
+            vector_field="document_vector",
+            text_field="document_content",
+            vertex_field="vertex_id",
+            username=args.milvus_user,
+            password=args.milvus_password,
+            drop_old=True,
+        )
+
+    def add(self, corpus: Corpus, rows: slice):
+        # the store embeds the texts itself
+        self.store.add_embeddings(
+            [(text, []) for text in corpus.texts[rows]],
+            [{"vertex_id": v_id} for v_id in corpus.ids[rows]],
+        )
+
+    def close(self):
+        self.store.milvus.col.drop()
+
+
+class TigerGraphAdapter(MemoryAdapter):
+    name = "tigergraph"
+
+    def __init__(self, args, n: int):
+        from pyTigerGraph import TigerGraphConnection
+
+        from common.embeddings.tigergraph_embedding_store import TigerGraphEmbeddingStore
+
+        conn = TigerGraphConnection(
+            host=args.tg_host,
+            username=args.tg_user,
+            password=args.tg_password,
+            graphname=args.tg_graph,
+        )
+        self.v_type = args.tg_vertex_type
+        self.store = TigerGraphEmbeddingStore(conn, FakeEmbeddingModel(args.dim))
+
+    def add(self, corpus: Corpus, rows: slice):
+        self.store.add_embeddings(
+            [(text, []) for text in corpus.texts[rows]],
+            [{"vertex_id": (v_id, self.v_type)} for v_id in corpus.ids[rows]],
+        )
+
+    def search(self, vector: List[float], k: int):
+        return self.store.retrieve_similar_with_score(
+            vector, top_k=k, vertex_types=[self.v_type]
+        )
+
+    def has(self, ids: List[str]):
+        return self.store.has_embeddings([(v_id, self.v_type) for v_id in ids])
+
+    async def k_closest(self, v_id: str, k: int):
+        return await self.store.aget_k_closest((v_id, self.v_type), k=k)
+
+
+ADAPTERS = {a.name: a for a in (MemoryAdapter, LocalAdapter, MilvusAdapter, TigerGraphAdapter)}
+
+
+def summarize(latencies: List[float], items_per_op: int = 1) -> dict:
+    lat = np.asarray(latencies)
+    total = lat.sum()
+    return {
+        "ops": len(lat),
+        "ops_per_sec": len(lat) / total if total > 0 else float("inf"),
+        "items_per_sec": len(lat) * items_per_op / total if total > 0 else float("inf"),
+        "p50_ms": float(np.percentile(lat, 50) * 1000),
+        "p99_ms": float(np.percentile(lat, 99) * 1000),
+    }
+
+
+def timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+async def atimed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+def run(args, n: int) -> dict:
+    corpus = make_corpus(n, args.dim, seed=args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    adapter = ADAPTERS[args.store](args, n)
+    results = {}
+    try:
+        batch = args.batch_size
+        results["add_embeddings"] = summarize(
+            [timed(adapter.add, corpus, slice(i, i + batch)) for i in range(0, n, batch)],
+            batch,
+        )
+
+        # queries: perturbed corpus vectors, so there are true neighbours to find
+        picks = rng.integers(0, n, args.queries)
+        queries = corpus.vectors[picks] + 0.05 * rng.standard_normal(
+            (args.queries, args.dim), dtype=np.float32
+        )
+        results["retrieve_similar_with_score"] = summarize(
+            [timed(adapter.search, q.tolist(), args.top_k) for q in queries]
+        )
+
+        id_batches = [
+            [corpus.ids[i] for i in rng.integers(0, n, args.has_batch_size)]
+            for _ in range(args.queries)
+        ]
+        results["has_embeddings"] = summarize(
+            [timed(adapter.has, ids) for ids in id_batches], args.has_batch_size
+        )
+
+        async def k_closest():
+            return [
+                await atimed(adapter.k_closest(corpus.ids[i], args.top_k)) for i in picks
+            ]
+
+        results["aget_k_closest"] = summarize(asyncio.run(k_closest()))
+    finally:
+        adapter.close()
+    return results
+
+
+def report(all_results: dict):
+    print(f"{'size':>9}  {'operation':<28} {'ops/s':>10} {'items/s':>11} {'p50 ms':>9} {'p99 ms':>9}")
+    for n, results in all_results.items():
+        for op, r in results.items():
+            print(
+                f"{n:>9}  {op:<28} {r['ops_per_sec']:>10.1f} {r['items_per_sec']:>11.1f} "
+                f"{r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f}"
+            )
+
+
+def regressions(all_results: dict, baseline: dict, tolerance: float) -> List[str]:
+    found = []
+    for n, results in all_results.items():
+        for op, r in results.items():
+            base = baseline.get(str(n), {}).get(op)
+            if base is not None and r["p50_ms"] > base["p50_ms"] * tolerance:
+                found.append(
+                    f"{op} at {n} vectors: p50 {r['p50_ms']:.3f}ms vs baseline {base['p50_ms']:.3f}ms"
+                )
+    return found
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CoPilot embedding stores")
+    parser.add_argument("--store", choices=sorted(ADAPTERS), default="memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=1000, help="vectors per add_embeddings call")
+    parser.add_argument("--queries", type=int, default=200, help="calls of each read operation")
+    parser.add_argument("--has-batch-size", type=int, default=100, help="ids per has_embeddings call")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--milvus-host", default="localhost")
+    parser.add_argument("--milvus-port", default="19530")
+    parser.add_argument("--milvus-user", default="")
+    parser.add_argument("--milvus-password", default="")
+    parser.add_argument("--tg-host", default="http://localhost")
+    parser.add_argument("--tg-user", default="tigergraph")
+    parser.add_argument("--tg-password", default="tigergraph")
+    parser.add_argument("--tg-graph", default="CoPilotBenchmark")
+    parser.add_argument("--tg-vertex-type", default="Entity")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    all_results = {n: run(args, n) for n in args.sizes}
+    report(all_results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({str(n): r for n, r in all_results.items()}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(all_results, json.load(f), args.tolerance)
+        for r in found:
+            print(f"REGRESSION: {r}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import hashlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents.base import Document
+
+from common.embeddings import search_results
+from common.embeddings.base_embedding_store import EmbeddingStore
+from common.embeddings.embedding_services import EmbeddingModel
+
+
+def _seeded(text: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+
+
+class FakeEmbeddings:
+    """Deterministic stand-in for a LangChain embeddings client.
+    Every text maps to a fixed unit vector seeded by its sha256, so runs are reproducible
+    and no embedding service is needed.
+    Texts of the form "<topic>|<rest>" land close to their topic's direction
+    (`noise` sets how close), which gives searches realistic near neighbours.
+    """
+
+    def __init__(self, dim: int = 128, noise: float = 0.1):
+        self.dim = dim
+        self.noise = noise
+
+    def embed_query(self, text: str) -> List[float]:
+        topic, sep, _ = text.partition("|")
+        if sep:
+            v = _seeded(topic, self.dim) + self.noise * _seeded(text, self.dim)
+        else:
+            v = _seeded(text, self.dim)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+class FakeEmbeddingModel(EmbeddingModel):
+    """EmbeddingModel backed by FakeEmbeddings"""
+
+    def __init__(self, dim: int = 128, noise: float = 0.1):
+        super().__init__({"authentication_configuration": {}}, model_name=f"fake-{dim}")
+        self.embeddings = FakeEmbeddings(dim, noise)
+
+
+class InMemoryEmbeddingStore(EmbeddingStore):
+    """InMemoryEmbeddingStore.
+    Exact (brute-force cosine) in-process vector store with the Milvus store's interface,
+    so benchmarks and tests can run without a vector database.
+    Not meant for production use.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingModel,
+        vertex_field: str = "vertex_id",
+        capacity: int = 1024,
+    ):
+        self.embedding_service = embedding_service
+        self.vertex_field = vertex_field
+        self._vectors = None
+        self._texts = []
+        self._metadatas = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._by_id = {}
+        self._size = 0
+        self._capacity = capacity
+
+    def __len__(self):
+        return int(self._alive[: self._size].sum())
+
+    def _grow(self, dim: int, n: int):
+        if self._vectors is None:
+            self._vectors = np.zeros((max(self._capacity, n), dim), dtype=np.float32)
+            self._alive = np.zeros(len(self._vectors), dtype=bool)
+        elif self._size + n > len(self._vectors):
+            capacity = max(len(self._vectors) * 2, self._size + n)
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            vectors[: self._size] = self._vectors[: self._size]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[: self._size] = self._alive[: self._size]
+            self._vectors, self._alive = vectors, alive
+
+    def add_embeddings(
+        self,
+        embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: List[dict] = None,
+    ):
+        embeddings = list(embeddings)
+        if metadatas is None:
+            metadatas = [{} for _ in embeddings]
+        texts = [text for text, _ in embeddings]
+        # like the Milvus store, texts without a vector are embedded here
+        missing = [i for i, (_, vector) in enumerate(embeddings) if not len(vector)]
+        vectors = [vector for _, vector in embeddings]
+        if missing:
+            for i, v in zip(
+                missing, self.embedding_service.embed_documents([texts[i] for i in missing])
+            ):
+                vectors[i] = v
+        if not vectors:
+            return []
+
+        mat = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self._grow(mat.shape[1], len(mat))
+        start = self._size
+        self._vectors[start : start + len(mat)] = mat / norms
+        self._alive[start : start + len(mat)] = True
+        self._texts.extend(texts)
+        for i, m in enumerate(metadatas, start):
+            self._metadatas.append(dict(m))
+            self._by_id.setdefault(m.get(self.vertex_field), []).append(i)
+        self._size += len(mat)
+        return list(range(start, self._size))
+
+    async def aadd_embeddings(
+        self,
+        embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: List[dict] = None,
+    ):
+        return self.add_embeddings(embeddings, metadatas)
+
+    def _rows(self, v_ids: Iterable[str]) -> List[int]:
+        return [i for v_id in v_ids for i in self._by_id.get(v_id, [])]
+
+    def has_embeddings(self, ids: List[str]) -> List[int]:
+        return self._rows(ids)
+
+    async def aget_embedded_ids(self, ids: List[str]) -> set:
+        return {self._metadatas[i][self.vertex_field] for i in self._rows(ids)}
+
+    def remove_embeddings(self, ids: Optional[List[str]] = None, expr: str = None):
+        rows = self._rows(ids or [])
+        self._alive[rows] = False
+        for v_id in ids or []:
+            self._by_id.pop(v_id, None)
+        return len(rows)
+
+    def _search(self, query_embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        if self._size == 0:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1
+        sims = self._vectors[: self._size] @ q
+        sims[~self._alive[: self._size]] = -np.inf
+        k = min(k, self._size)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(i), float(sims[i])) for i in top if np.isfinite(sims[i])]
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self._texts[i], metadata={"pk": str(i), **self._metadatas[i]})
+
+    def retrieve_similar(self, query_embedding, top_k=10, filter_expr: str = None):
+        return [doc for doc, _ in self.retrieve_similar_with_score(query_embedding, top_k)]
+
+    def retrieve_similar_with_score(
+        self, query_embedding, top_k=10, similarity_threshold=0.90, filter_expr: str = None
+    ):
+        hits = self._search(query_embedding, top_k * 2)
+        # same selection as the Milvus and TigerGraph stores
+        keep = search_results.select([s for _, s in hits], top_k, similarity_threshold)
+        return [(self._document(hits[j][0]), hits[j][1]) for j in keep]
+
+    async def aget_k_closest(
+        self, v_id: str, k=10, threshold_similarity=0.90, edit_dist_threshold_pct=0.75
+    ) -> set:
+        result = {v_id}
+        for row in self._rows([v_id]):
+            for i, sim in self._search(self._vectors[row], k):
+                if sim >= threshold_similarity:
+                    result.add(self._metadatas[i].get(self.vertex_field))
+        return result
+
+    async def aget_embeddings(self, v_ids: List[str]) -> List[Tuple[str, List[float]]]:
+        return [
+            (self._metadatas[i][self.vertex_field], self._vectors[i].tolist())
+            for i in self._rows(v_ids)
+        ]
+
+    def add_connection_parameters(self, query_params: dict) -> dict:
+        return query_params
@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from agent import agent
+from agent.agent import AgentPool
+
+
+class FakeAgentGraph:
+    built = []
+
+    def __init__(self, llm_provider, conn, embedding_service, embedding_store, use_cypher=False, supportai_retriever="hnsw_overlap", supportai_enabled=None):
+        self.conn = conn
+        self.use_cypher = use_cypher
+        self.supportai_retriever = supportai_retriever
+        self.supportai_enabled = supportai_enabled
+
+    def create_graph(self, use_async=False):
+        graph = MagicMock(supportai_enabled=self.supportai_enabled)
+        FakeAgentGraph.built.append((self.conn.graphname, self.supportai_retriever, self.use_cypher, use_async))
+        return graph
+
+
+def fake_conn(graphname, sees_supportai=True):
+    conn = MagicMock()
+    conn.graphname = graphname
+    conn.sees_supportai = sees_supportai
+    return conn
+
+
+class TestAgentPool(unittest.TestCase):
+    def setUp(self):
+        FakeAgentGraph.built = []
+        for p in [
+            patch.object(agent, "TigerGraphAgentGraph", FakeAgentGraph),
+            patch.object(agent, "make_llm_provider", MagicMock()),
+            patch.object(agent, "supportai_installed", MagicMock(side_effect=lambda conn: conn.sees_supportai)),
+            patch.object(agent.schema_cache, "ttl_seconds", 300),
+        ]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def get(self, pool, graphname, use_cypher=False, retriever="hnsw_overlap", use_async=False, sees_supportai=True):
+        return pool.get(graphname, fake_conn(graphname, sees_supportai), use_cypher, retriever, use_async)
+
+    def test_reuses_graph(self):
+        pool = AgentPool()
+        first = self.get(pool, "Social")
+        self.assertIs(self.get(pool, "Social"), first)
+        self.assertEqual(len(FakeAgentGraph.built), 1)
+
+    def test_keys(self):
+        pool = AgentPool()
+        graphs = [
+            self.get(pool, "Social"),
+            self.get(pool, "Social", use_cypher=True),
+            self.get(pool, "Social", use_async=True),
+            self.get(pool, "Social", retriever="HNSW"),
+            self.get(pool, "Finance"),
+        ]
+        self.assertEqual(len({id(g) for g in graphs}), 5)
+        self.assertIs(self.get(pool, "Social", use_cypher=True), graphs[1])
+        self.assertIs(self.get(pool, "Social", use_async=True), graphs[2])
+        # the retriever name is case insensitive
+        self.assertIs(self.get(pool, "Social", retriever="hnsw"), graphs[3])
+        self.assertEqual(len(FakeAgentGraph.built), 5)
+
+    def test_lru_eviction(self):
+        pool = AgentPool(max_size=2)
+        a = self.get(pool, "A")
+        self.get(pool, "B")
+        # A was used last, so B is dropped for C
+        self.assertIs(self.get(pool, "A"), a)
+        self.get(pool, "C")
+        self.assertEqual(len(pool._graphs), 2)
+        self.assertIs(self.get(pool, "A"), a)
+        self.get(pool, "B")
+        self.assertEqual([b[0] for b in FakeAgentGraph.built], ["A", "B", "C", "B"])
+
+    def test_rebuilt_after_ttl(self):
+        pool = AgentPool()
+        with patch.object(agent.schema_cache, "ttl_seconds", 0):
+            first = self.get(pool, "Social")
+        self.assertIsNot(self.get(pool, "Social"), first)
+        self.assertEqual(len(FakeAgentGraph.built), 2)
+
+    def test_invalidate(self):
+        pool = AgentPool()
+        social = self.get(pool, "Social")
+        social_cypher = self.get(pool, "Social", use_cypher=True)
+        finance = self.get(pool, "Finance")
+
+        pool.invalidate("Social")
+        self.assertIs(self.get(pool, "Finance"), finance)
+        self.assertIsNot(self.get(pool, "Social"), social)
+        self.assertIsNot(self.get(pool, "Social", use_cypher=True), social_cypher)
+
+        pool.invalidate()
+        self.assertIsNot(self.get(pool, "Finance"), finance)
+
+    def test_supportai_check(self):
+        pool = AgentPool()
+        # a user who can't see the SupportAI queries gets a graph without SupportAI...
+        self.assertFalse(self.get(pool, "Social", sees_supportai=False).supportai_enabled)
+        # ...that isn't served to the next user
+        enabled = self.get(pool, "Social")
+        self.assertTrue(enabled.supportai_enabled)
+        # once seen, SupportAI stays enabled on the graph until the TTL
+        self.assertIs(self.get(pool, "Social", sees_supportai=False), enabled)
+        self.assertEqual(agent.supportai_installed.call_count, 2)
+
+        pool.invalidate("Social")
+        self.assertFalse(self.get(pool, "Social", sees_supportai=False).supportai_enabled)
+
+    def test_shares_llm_provider(self):
+        pool = AgentPool()
+        self.assertIs(pool.get_llm_provider("A"), pool.get_llm_provider("B"))
+        agent.make_llm_provider.assert_called_once_with("A")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+import unittest
+
+from agent.Q import DONE, Chunk, Q
+from routers.ui import emit_progress, run_agent
+
+from common.py_schemas.schemas import CoPilotResponse
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        # yields like a real send, so a failing turn can cancel emit_progress mid-stream
+        await asyncio.sleep(0)
+        self.sent.append(json.loads(text))
+
+
+class FakeAgent:
+    def __init__(self, q):
+        self.q = q
+
+
+class FakeChatAgent(FakeAgent):
+    use_async = True
+
+    async def aquestion_for_agent(self, question, conversation):
+        self.q.put(f"Answering {question}")
+        if question == "fail":
+            raise Exception("LLM unavailable")
+        self.q.put(Chunk(question))
+        # let emit_progress send what was put before DONE
+        await asyncio.sleep(0.01)
+        return CoPilotResponse(
+            natural_language_response=question, answered_question=True, response_type="inquiryai"
+        )
+
+
+class TestQ(unittest.IsolatedAsyncioTestCase):
+    async def test_put_from_thread_wakes_get(self):
+        q = Q()
+        getter = asyncio.create_task(q.get())
+        await asyncio.sleep(0)
+        self.assertFalse(getter.done())
+
+        t = threading.Thread(target=q.put, args=("Mapping question to schema",))
+        t.start()
+        t.join()
+        self.assertEqual(await asyncio.wait_for(getter, timeout=1), "Mapping question to schema")
+
+    async def test_order_across_threads(self):
+        q = Q()
+        q.put("first")
+        t = threading.Thread(target=lambda: [q.put(m) for m in ("second", "third")])
+        t.start()
+        t.join()
+        self.assertEqual([await q.get() for _ in range(3)], ["first", "second", "third"])
+
+    async def test_bound_on_first_get(self):
+        # created outside the loop, like an agent built in a worker thread
+        q = await asyncio.to_thread(Q)
+        self.assertIsNone(q.loop)
+        getter = asyncio.create_task(q.get())
+        await asyncio.sleep(0)
+        self.assertIs(q.loop, asyncio.get_running_loop())
+        await asyncio.to_thread(q.put, "msg")
+        self.assertEqual(await asyncio.wait_for(getter, timeout=1), "msg")
+
+    async def test_pop_and_clear(self):
+        q = Q()
+        self.assertIsNone(q.pop())
+        q.put("a")
+        q.put("b")
+        self.assertEqual(q.pop(), "a")
+        q.clear()
+        self.assertIsNone(q.pop())
+
+
+class TestEmitProgress(unittest.IsolatedAsyncioTestCase):
+    async def test_chunk_reading_done_is_sent(self):
+        q = Q()
+        ws = FakeWebSocket()
+        for msg in ["Generating answer", Chunk("DONE"), Chunk(" and more"), DONE, "after done"]:
+            q.put(msg)
+
+        await asyncio.wait_for(emit_progress(FakeAgent(q), ws), timeout=1)
+        self.assertEqual(
+            [(m["content"], m["response_type"]) for m in ws.sent],
+            [("Generating answer", "progress"), ("DONE", "chunk"), (" and more", "chunk")],
+        )
+        self.assertEqual(q.pop(), "after done")
+
+    async def test_done_from_thread(self):
+        q = Q()
+        ws = FakeWebSocket()
+        task = asyncio.create_task(emit_progress(FakeAgent(q), ws))
+        await asyncio.to_thread(lambda: [q.put("progress"), q.put(DONE)])
+        await asyncio.wait_for(task, timeout=1)
+        self.assertEqual([m["content"] for m in ws.sent], ["progress"])
+
+
+class TestRunAgent(unittest.IsolatedAsyncioTestCase):
+    async def test_turn_after_failed_turn(self):
+        agent = FakeChatAgent(Q())
+        ws = FakeWebSocket()
+
+        resp = await asyncio.wait_for(run_agent(agent, "fail", [], "Social", ws), timeout=1)
+        self.assertFalse(resp.answered_question)
+
+        ws.sent.clear()
+        resp = await asyncio.wait_for(run_agent(agent, "hello", [], "Social", ws), timeout=1)
+        self.assertEqual(resp.natural_language_response, "hello")
+        # the failed turn's DONE didn't end this turn's stream
+        self.assertEqual(
+            [(m["content"], m["response_type"]) for m in ws.sent],
+            [("Answering hello", "progress"), ("hello", "chunk")],
+        )
+        self.assertIsNone(agent.q.pop())
+
+
+if __name__ == "__main__":
+    unittest.main()
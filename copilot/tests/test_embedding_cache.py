@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from common.embeddings.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from common.embeddings.embedding_services import EmbeddingModel
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 0.5]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+class CountingModel(EmbeddingModel):
+    def __init__(self):
+        super().__init__({"authentication_configuration": {}}, model_name="counting")
+        self.embeddings = CountingEmbeddings()
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_and_get(self):
+        cache = EmbeddingCache(self.path)
+        cache.put("m", "hello", [0.25, 1.5])
+        self.assertEqual(cache.get("m", "hello"), [0.25, 1.5])
+        self.assertIsNone(cache.get("m", "missing"))
+        cache.close()
+
+    def test_keyed_by_model(self):
+        cache = EmbeddingCache(self.path)
+        cache.put("a", "hello", [1.0])
+        self.assertIsNone(cache.get("b", "hello"))
+        cache.close()
+
+    def test_persists_across_instances(self):
+        cache = EmbeddingCache(self.path)
+        cache.put_many("m", ["x", "y"], [[1.0], [2.0]])
+        cache.close()
+        cache = EmbeddingCache(self.path)
+        self.assertEqual(cache.get_many("m", ["x", "y", "z"]), {"x": [1.0], "y": [2.0]})
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(self.path, max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertEqual(cache.get("m", "a"), [1.0])
+        cache.close()
+
+    def test_model_embeds_only_missing_texts(self):
+        model = CountingModel()
+        model.set_cache(EmbeddingCache(self.path))
+        first = model.embed_documents(["ab", "abc", "ab"])
+        second = model.embed_documents(["abc", "abcd"])
+        self.assertEqual(first, [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]])
+        self.assertEqual(second, [[3.0, 0.5], [4.0, 0.5]])
+        self.assertEqual(model.embeddings.calls, [["ab", "abc"], ["abcd"]])
+
+        # queries are cached apart from documents
+        self.assertEqual(model.embed_query("abcd"), [4.0, 0.5])
+        self.assertEqual(asyncio.run(model.aembed_query("abcd")), [4.0, 0.5])
+        self.assertEqual(model.embeddings.calls, [["ab", "abc"], ["abcd"], ["abcd"]])
+
+
+class AsymmetricEmbeddings(CountingEmbeddings):
+    # like providers that embed queries and documents with different task types
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), -1.0]
+
+
+class TestQueryAndDocumentKinds(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_queries_embedded_as_queries(self):
+        model = CountingModel()
+        model.embeddings = AsymmetricEmbeddings()
+        model.set_cache(EmbeddingCache(self.path))
+        model.set_query_cache(QueryEmbeddingCache())
+        self.assertEqual(model.embed_documents(["ab"]), [[2.0, 0.5]])
+        self.assertEqual(model.embed_queries(["ab", "abc", "ab"]), [[2.0, -1.0], [3.0, -1.0], [2.0, -1.0]])
+        self.assertEqual(asyncio.run(model.aembed_queries(["abcd", "ab"])), [[4.0, -1.0], [2.0, -1.0]])
+        self.assertEqual(model.embed_query("abc"), [3.0, -1.0])
+        # and neither kind is served the other's cached vector
+        self.assertEqual(model.embed_documents(["abc", "ab"]), [[3.0, 0.5], [2.0, 0.5]])
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def test_normalizes_whitespace(self):
+        cache = QueryEmbeddingCache()
+        cache.put("m", "  what is  a graph?\n", [1.0])
+        self.assertEqual(cache.get("m", "what is a graph?"), [1.0])
+        self.assertIsNone(cache.get("other", "what is a graph?"))
+
+    def test_expires(self):
+        cache = QueryEmbeddingCache(ttl_seconds=0.05)
+        cache.put("m", "q", [1.0])
+        self.assertEqual(cache.get("m", "q"), [1.0])
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("m", "q"))
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertEqual(cache.get("m", "a"), [1.0])
+
+    def test_model_serves_repeated_queries(self):
+        model = CountingModel()
+        model.set_query_cache(QueryEmbeddingCache())
+        self.assertEqual(model.embed_query("abc"), [3.0, 0.5])
+        self.assertEqual(model.embed_query("abc "), [3.0, 0.5])
+        self.assertEqual(asyncio.run(model.aembed_query("abc")), [3.0, 0.5])
+        self.assertEqual(model.embed_queries(["abc", "ab", "ab"]), [[3.0, 0.5], [2.0, 0.5], [2.0, 0.5]])
+        self.assertEqual(model.embeddings.calls, [["abc"], ["ab"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
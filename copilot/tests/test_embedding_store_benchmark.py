@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import embedding_store
+from benchmarks.fakes import FakeEmbeddingModel, InMemoryEmbeddingStore
+
+
+class TestFakeEmbeddings(unittest.TestCase):
+    def test_deterministic(self):
+        a = FakeEmbeddingModel(dim=16)
+        b = FakeEmbeddingModel(dim=16)
+        self.assertEqual(a.embed_query("topic1|x"), b.embed_query("topic1|x"))
+        self.assertEqual(len(a.embed_query("topic1|x")), 16)
+
+    def test_same_topic_is_closer(self):
+        model = FakeEmbeddingModel(dim=64)
+        store = InMemoryEmbeddingStore(model)
+        store.add_embeddings(
+            [("topic1|a", []), ("topic2|b", [])],
+            [{"vertex_id": "a"}, {"vertex_id": "b"}],
+        )
+        docs = store.retrieve_similar(model.embed_query("topic1|query"), top_k=1)
+        self.assertEqual(docs[0].metadata["vertex_id"], "a")
+
+
+class TestInMemoryEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryEmbeddingStore(FakeEmbeddingModel(dim=32), capacity=2)
+        self.store.add_embeddings(
+            [(f"topic{i % 3}|doc{i}", []) for i in range(10)],
+            [{"vertex_id": f"v{i}"} for i in range(10)],
+        )
+
+    def test_has_and_remove(self):
+        self.assertEqual(len(self.store), 10)
+        self.assertEqual(len(self.store.has_embeddings(["v1", "v2", "missing"])), 2)
+        self.store.remove_embeddings(["v1"])
+        self.assertFalse(self.store.has_embeddings(["v1"]))
+        self.assertEqual(len(self.store), 9)
+
+    def test_k_closest(self):
+        closest = asyncio.run(self.store.aget_k_closest("v0", k=3))
+        # like the real stores, the entity itself is part of the result
+        self.assertIn("v0", closest)
+        self.assertLessEqual(len(closest), 4)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.json")
+            argv = ["--sizes", "200", "--dim", "16", "--batch-size", "50",
+                    "--queries", "5", "--json", path]
+            self.assertEqual(embedding_store.main(argv), 0)
+            with open(path) as f:
+                results = json.load(f)
+            self.assertEqual(
+                set(results["200"]),
+                {"add_embeddings", "retrieve_similar_with_score",
+                 "has_embeddings", "aget_k_closest"},
+            )
+
+    def test_regressions(self):
+        current = {200: {"has_embeddings": {"p50_ms": 1.3}, "aget_k_closest": {"p50_ms": 1.1}}}
+        baseline = {"200": {"has_embeddings": {"p50_ms": 1.0}, "aget_k_closest": {"p50_ms": 1.0}}}
+        found = embedding_store.regressions(current, baseline, 1.25)
+        self.assertEqual(len(found), 1)
+        self.assertIn("has_embeddings", found[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from common.embeddings import local_embedding_store
+from common.embeddings.filter_expr import FilterExprError, compile_expr
+from common.embeddings.local_embedding_store import LocalEmbeddingStore
+
+
+class UnitEmbeddings:
+    """Embeds "<axis>|<text>" as the unit vector along <axis>."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        vector = [0.0] * 4
+        vector[int(text.split("|")[0])] = 1.0
+        return vector
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+class TestFilterExpr(unittest.TestCase):
+    record = {"graphname": "Demo", "custom_query": True, "vertex_id": "c_1", "pk": 5}
+
+    def test_expressions(self):
+        cases = {
+            "graphname == 'Demo'": True,
+            "custom_query == true and graphname == 'all'": False,
+            "graphname == 'all' or pk >= 5": True,
+            'vertex_id in ["a", "c_1"]': True,
+            "vertex_id not in ['c_1']": False,
+            'vertex_id like "%_1"': True,
+            "not (pk > 3)": False,
+            "missing == 1": False,
+            "": True,
+        }
+        for expr, expected in cases.items():
+            self.assertEqual(compile_expr(expr)(self.record), expected, expr)
+
+    def test_invalid(self):
+        for expr in ["graphname ==", "graphname = 'x'", "(pk == 1"]:
+            with self.assertRaises(FilterExprError):
+                compile_expr(expr)
+
+
+class TestLocalEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        local_embedding_store._collections.clear()
+        self.store = self._open()
+
+    def tearDown(self):
+        self._close()
+        self.tmp.cleanup()
+
+    def _close(self):
+        for collection in local_embedding_store._collections.values():
+            collection.close()
+        local_embedding_store._collections.clear()
+
+    def _open(self, snapshot_every=1000):
+        return LocalEmbeddingStore(
+            UnitEmbeddings(),
+            path=self.tmp.name,
+            support_ai_instance=True,
+            collection_name="docs",
+            snapshot_every=snapshot_every,
+        )
+
+    def _add(self, store, rows):
+        store.add_embeddings(
+            [(f"{axis}|{v_id}", []) for v_id, axis, _ in rows],
+            [{"vertex_id": v_id, "graphname": graph} for v_id, _, graph in rows],
+        )
+
+    def test_retrieve_with_filter(self):
+        self._add(self.store, [("a", 0, "G1"), ("b", 0, "G2"), ("c", 1, "G1")])
+        res = self.store.retrieve_similar_with_score([1, 0, 0, 0], top_k=1)
+        self.assertIn(res[0][0].metadata["vertex_id"], ["a", "b"])
+        self.assertAlmostEqual(res[0][1], 1.0, places=5)
+
+        docs = self.store.retrieve_similar([1, 0, 0, 0], top_k=3, filter_expr="graphname == 'G2'")
+        self.assertEqual([d.metadata["vertex_id"] for d in docs], ["b"])
+
+    def test_delete_and_upsert(self):
+        self._add(self.store, [("a", 0, "G"), ("b", 1, "G")])
+        self.assertEqual(len(self.store.has_embeddings(["a", "b", "x"])), 2)
+        self.assertEqual(asyncio.run(self.store.aget_embedded_ids(["a", "b", "x"])), {"a", "b"})
+        self.store.remove_embeddings(expr="vertex_id == 'a'")
+        self.assertEqual(self.store.has_embeddings(["a"]), [])
+        self.assertEqual(len(self.store.retrieve_similar([1, 0, 0, 0], top_k=5)), 1)
+
+        pk = self.store.get_pks("vertex_id == 'b'")[0]
+        self.store.upsert_embeddings(str(pk), [("2|b2", [])], [{"vertex_id": "b"}])
+        self.assertEqual(self.store.query("vertex_id == 'b'", ["text"]), [{"pk": pk, "text": "2|b2"}])
+
+    def test_persists_across_restarts(self):
+        store = self._open(snapshot_every=3)
+        # the add triggers a snapshot, the delete is only in the log
+        self._add(store, [("a", 0, "G"), ("b", 1, "G"), ("c", 2, "G"), ("d", 3, "G")])
+        store.remove_embeddings(expr="vertex_id == 'b'")
+        files = os.listdir(os.path.join(self.tmp.name, "docs"))
+        self.assertIn("CURRENT", files)
+
+        # as if the process restarted
+        self._close()
+        self.store = self._open()
+        self.assertEqual(len(self.store.collection()), 3)
+        self.assertEqual(self.store.has_embeddings(["b"]), [])
+        self.assertEqual(
+            self.store.retrieve_similar([0, 0, 0, 1], top_k=1)[0].metadata["vertex_id"], "d"
+        )
+
+    def test_torn_log_entry_is_ignored(self):
+        self._add(self.store, [("a", 0, "G")])
+        self.store.collection()._log.write('{"op": "add", "rows": [[')
+        self.store.collection()._log.flush()
+
+        # as if the process restarted
+        self._close()
+        self.store = self._open()
+        self.assertEqual(len(self.store.collection()), 1)
+        # the torn entry was cut off, so later entries are readable
+        self._add(self.store, [("b", 1, "G")])
+        self._close()
+        self.store = self._open()
+        self.assertEqual(len(self.store.collection()), 2)
+
+    def test_k_closest_and_embeddings(self):
+        self._add(self.store, [("apple inc", 0, "G"), ("apple_inc", 0, "G"), ("google", 0, "G")])
+        closest = asyncio.run(self.store.aget_k_closest("apple inc"))
+        self.assertEqual(closest, {"apple inc", "apple_inc"})
+        self.assertEqual(
+            asyncio.run(self.store.aget_embeddings(["google"])), [("google", [1.0, 0.0, 0.0, 0.0])]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,7 @@ import os
 import unittest
 from unittest.mock import patch, MagicMock
 
-from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore, index_options
 from langchain_core.documents import Document
 
 class TestMilvusEmbeddingStore(unittest.TestCase):
@@ -62,6 +62,48 @@ class TestMilvusEmbeddingStore(unittest.TestCase):
         self.assertEqual(result[0].page_content, "What is the meaning of life?")
         self.assertEqual(result[0].metadata["vertex_id"], "123")
 
+    @patch("common.embeddings.milvus_embedding_store.MilvusEmbeddingStore.connect_to_milvus")
+    def test_retrieve_with_rerank(self, mock_connect):
+        # the quantized index ranks "b" first, its full-precision vector ranks "a" first
+        rows = [("b", [0.9, 0.5], 0.99), ("a", [1.0, 0.1], 0.98), ("c", [0.0, 1.0], 0.1)]
+        hits = []
+        for v_id, vector, score in rows:
+            hit = MagicMock(score=score)
+            hit.entity.get.side_effect = {"pk": 1, "vertex_id": v_id, "vector_field": vector}.get
+            hits.append(hit)
+
+        embedding_store = MilvusEmbeddingStore(
+            embedding_service=MagicMock(),
+            host="localhost",
+            port=19530,
+            support_ai_instance=True,
+            **index_options({"quantization": "int8"}),
+        )
+        embedding_store.milvus = MagicMock(fields=["pk", "vertex_id", "vector_field"], _vector_field="vector_field")
+        embedding_store.milvus.col.search.return_value = [hits]
+        embedding_store.milvus._parse_document.side_effect = lambda d: Document(page_content="", metadata=d)
+
+        result = embedding_store.retrieve_similar_with_score([1.0, 0.0], top_k=1)
+
+        search = embedding_store.milvus.col.search.call_args.kwargs
+        self.assertEqual(search["limit"], 8)
+        self.assertIn("vector_field", search["output_fields"])
+        self.assertEqual([doc.metadata["vertex_id"] for doc, _ in result], ["a"])
+        self.assertNotIn("vector_field", result[0][0].metadata)
+
+    def test_index_options(self):
+        self.assertEqual(
+            index_options({}),
+            {"index_type": "HNSW", "index_params": {"M": 64, "efConstruction": 360}, "search_params": {}, "rerank_factor": 1},
+        )
+        pq = index_options({"quantization": "pq", "index_params": {"m": 32}, "search_params": {"nprobe": 8}})
+        self.assertEqual(pq["index_type"], "IVF_PQ")
+        self.assertEqual(pq["index_params"], {"nlist": 1024, "m": 32, "nbits": 8})
+        self.assertEqual(pq["search_params"], {"nprobe": 8})
+        self.assertEqual(pq["rerank_factor"], 4)
+        with self.assertRaises(ValueError):
+            index_options({"quantization": "int4"})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+
+from common.db.schema_cache import SchemaCache
+
+SCHEMA = {
+    "VertexTypes": [
+        {
+            "Name": "Person",
+            "PrimaryId": {"AttributeName": "id", "AttributeType": {"Name": "STRING"}},
+            "Attributes": [{"AttributeName": "age", "AttributeType": {"Name": "INT"}}],
+        },
+        {
+            "Name": "City",
+            "PrimaryId": {"AttributeName": "name", "AttributeType": {"Name": "STRING"}},
+            "Attributes": [],
+        },
+    ],
+    "EdgeTypes": [
+        {
+            "Name": "lives_in",
+            "FromVertexTypeName": "Person",
+            "ToVertexTypeName": "City",
+            "IsDirected": True,
+            "Attributes": [{"AttributeName": "since", "AttributeType": {"Name": "DATETIME"}}],
+        },
+        {
+            "Name": "knows",
+            "FromVertexTypeName": "*",
+            "ToVertexTypeName": "*",
+            "IsDirected": False,
+            "EdgePairs": [{"From": "Person", "To": "Person"}, {"From": "Person", "To": "City"}],
+            "Attributes": [],
+        },
+    ],
+}
+
+
+class FakeConn:
+    host = "http://tigergraph"
+    graphname = "Social"
+
+    def __init__(self, schema=SCHEMA):
+        self.schema = schema
+        self.calls = 0
+
+    def getSchema(self, udts=True, force=False):
+        self.calls += 1
+        return self.schema
+
+
+class TestSchemaCache(unittest.TestCase):
+    def test_snapshot(self):
+        schema = SchemaCache().get(FakeConn())
+        self.assertEqual(schema.vertex_types, ["Person", "City"])
+        self.assertEqual(schema.vertex_attrs("Person"), ["age"])
+        self.assertEqual(schema.edge_attrs("lives_in"), ["since"])
+        self.assertEqual(
+            schema.edges_info,
+            [
+                {"edge": "lives_in", "source": "Person", "target": "City"},
+                {"edge": "knows", "source": {"Person"}, "target": {"Person", "City"}},
+            ],
+        )
+        rep = schema.schema_rep
+        self.assertIn("Person\n\tPrimary Id Attribute: id\n\tAttributes: \n\t\tage of type INT", rep)
+        self.assertIn("City\n\tPrimary Id Attribute: name\n\tAttributes: \n\t\tNo attributes", rep)
+        self.assertIn("knows\n\tFrom Vertex: Person\n\tTo Vertex: City\n\tEdge direction: Undirected", rep)
+        self.assertIs(schema.schema_rep, rep)
+
+    def test_fetched_once_per_ttl(self):
+        cache = SchemaCache(ttl_seconds=60)
+        conn = FakeConn()
+        first = cache.get(conn)
+        self.assertIs(cache.get(FakeConn()), first)
+        self.assertEqual(conn.calls, 1)
+
+        cache.invalidate(conn)
+        self.assertIsNot(cache.get(conn), first)
+        self.assertEqual(conn.calls, 2)
+
+    def test_unchanged_version_keeps_snapshot(self):
+        cache = SchemaCache(ttl_seconds=60)
+        conn = FakeConn()
+        with patch("common.db.schema_cache.time.monotonic", return_value=0):
+            first = cache.get(conn)
+        with patch("common.db.schema_cache.time.monotonic", return_value=100):
+            # expired, but the schema is the same
+            self.assertIs(cache.get(conn), first)
+            self.assertEqual(conn.calls, 2)
+        conn.schema = {**SCHEMA, "VertexTypes": SCHEMA["VertexTypes"][:1]}
+        with patch("common.db.schema_cache.time.monotonic", return_value=200):
+            changed = cache.get(conn)
+        self.assertEqual(changed.vertex_types, ["Person"])
+        self.assertNotEqual(changed.version, first.version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from common.embeddings.search_results import ResultMerger, exact_scores, select, top_indices
+
+
+class TestTopIndices(unittest.TestCase):
+    def test_highest_first(self):
+        self.assertEqual(top_indices([0.1, 0.9, 0.5, 0.7], 2).tolist(), [1, 3])
+        self.assertEqual(top_indices([0.1, 0.9], 5).tolist(), [1, 0])
+        self.assertEqual(top_indices([], 3).tolist(), [])
+
+    def test_ties_keep_search_order(self):
+        self.assertEqual(top_indices([0.5, 0.5, 0.5], 3).tolist(), [0, 1, 2])
+
+
+class TestSelect(unittest.TestCase):
+    def test_at_least_top_k(self):
+        scores = [0.5, 0.2, 0.8, 0.1]
+        self.assertEqual(select(scores, 2, 0.9).tolist(), [2, 0])
+
+    def test_extends_past_top_k_above_threshold(self):
+        scores = [0.95, 0.5, 0.97, 0.92, 0.99, 0.3]
+        self.assertEqual(select(scores, 2, 0.9).tolist(), [4, 2, 0, 3])
+
+    def test_all_above_threshold(self):
+        scores = [0.95, 0.96, 0.97, 0.98]
+        self.assertEqual(select(scores, 2, 0.9).tolist(), [3, 2, 1, 0])
+
+
+class TestExactScores(unittest.TestCase):
+    def test_cosine_and_ip(self):
+        vectors = [[2.0, 0.0], [1.0, 1.0], [0.0, 0.0]]
+        cosine = exact_scores([1.0, 0.0], vectors)
+        self.assertEqual([round(s, 4) for s in cosine], [1.0, 0.7071, 0.0])
+        self.assertEqual(exact_scores([1.0, 0.0], vectors, "ip").tolist(), [2.0, 1.0, 0.0])
+
+    def test_rerank_reorders_candidates(self):
+        # approximate scores from a quantized index put the second candidate first
+        vectors = [[1.0, 0.1], [0.9, 0.5], [0.0, 1.0]]
+        scores = exact_scores([1.0, 0.0], vectors)
+        self.assertEqual(select(scores, 1, 0.99).tolist(), [0])
+
+    def test_unsupported_metric(self):
+        with self.assertRaises(ValueError):
+            exact_scores([1.0], [[1.0]], "L2")
+
+
+class TestResultMerger(unittest.TestCase):
+    def test_keeps_best_score_per_key(self):
+        merged = ResultMerger()
+        merged.add([("a", "Entity"), ("b", "Entity")], [0.5, 0.7])
+        merged.add([("a", "Entity"), ("a", "Chunk")], [0.9, 0.1])
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(
+            merged.top(2), [(("a", "Entity"), 0.9), (("b", "Entity"), 0.7)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
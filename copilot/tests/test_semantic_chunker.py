@@ -1,27 +1,62 @@
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
 from common.chunkers.semantic_chunker import SemanticChunker
 
 
+def topic_embeddings(texts):
+    # sentences about cats point one way, everything else the other
+    return [[1.0, 0.0] if "cat" in t else [0.0, 1.0] for t in texts]
+
+
 class TestSemanticChunker(unittest.TestCase):
-    @patch("common.embeddings.embedding_services.EmbeddingModel")
-    @patch("langchain_experimental.text_splitter.SemanticChunker.create_documents")
-    def test_chunk_single_string(self, create_documents, MockEmbeddingModel):
-        mock_emb_service = MockEmbeddingModel()
-
-        create_documents.return_value = [
-            Mock(page_content="Chunk 1"),
-            Mock(page_content="Chunk 2"),
-        ]
+    def setUp(self):
+        self.emb_service = Mock()
+        self.emb_service.embed_documents.side_effect = topic_embeddings
 
-        semantic_chunker = SemanticChunker(embedding_serivce=mock_emb_service)
-        input_string = "Chunk 1, Chunk 2, Chunk Unrelated"
-        expected_chunks = ["Chunk 1", "Chunk 2"]
+    def test_chunk_single_string(self):
+        semantic_chunker = SemanticChunker(
+            embedding_serivce=self.emb_service,
+            breakpoint_threshold_type="percentile",
+            breakpoint_threshold_amount=50,
+            buffer_size=0,
+        )
+        input_string = "A cat sat. The cat slept. Cars are fast. Cars are loud."
+        expected_chunks = ["A cat sat. The cat slept.", "Cars are fast. Cars are loud."]
         actual_chunks = semantic_chunker.chunk(input_string)
 
-        create_documents.assert_called_once_with([input_string])
         self.assertEqual(actual_chunks, expected_chunks)
 
+    def test_single_sentence_is_not_embedded(self):
+        semantic_chunker = SemanticChunker(embedding_serivce=self.emb_service)
+        self.assertEqual(semantic_chunker.chunk("Just one sentence"), ["Just one sentence"])
+        self.emb_service.embed_documents.assert_not_called()
+
+    def test_chunk_many_batches_across_documents(self):
+        semantic_chunker = SemanticChunker(
+            embedding_serivce=self.emb_service,
+            breakpoint_threshold_amount=50,
+            buffer_size=0,
+        )
+        docs = [
+            "A cat sat. A cat ran. Cars are fast.",
+            "Only one sentence",
+            "The cat slept. The cat ate. Cars are loud.",
+        ]
+        expected_chunks = [
+            ["A cat sat. A cat ran.", "Cars are fast."],
+            ["Only one sentence"],
+            ["The cat slept. The cat ate.", "Cars are loud."],
+        ]
+        self.assertEqual(semantic_chunker.chunk_many(docs), expected_chunks)
+        self.emb_service.embed_documents.assert_called_once()
+
+    def test_embeds_in_batches(self):
+        semantic_chunker = SemanticChunker(
+            embedding_serivce=self.emb_service, buffer_size=0, batch_size=2
+        )
+        semantic_chunker.chunk("A cat sat. The cat slept. Cars are fast. Cars are loud. Cats nap.")
+        self.assertEqual(self.emb_service.embed_documents.call_count, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,15 +1,18 @@
+import threading
+
 from common.chunkers import character_chunker, regex_chunker, semantic_chunker, markdown_chunker
+from common.chunkers.base_chunker import BaseChunker
 from common.config import doc_processing_config, embedding_service, llm_config
-from common.llm_services import (
-    AWS_SageMaker_Endpoint,
-    AWSBedrock,
-    AzureOpenAI,
-    GoogleVertexAI,
-    Groq,
-    HuggingFaceEndpoint,
-    Ollama,
-    OpenAI,
-)
+from common.config import get_llm_service as get_llm_service_from_config
+from common.llm_services import LLM_Model
+
+# chunker type -> chunker. Chunkers hold no per-document state, so one of each is reused
+chunkers: dict[str, BaseChunker] = {}
+
+# one LLM client for the whole service, so its HTTP connection pool is reused
+_llm_service: LLM_Model = None
+_llm_lock = threading.Lock()
+
 
 def get_chunker(chunker_type: str = ""):
     if not chunker_type:
@@ -40,22 +43,17 @@ def get_chunker(chunker_type: str = ""):
     return chunker
 
 
+def get_shared_chunker(chunker_type: str = "") -> BaseChunker:
+    if chunker_type not in chunkers:
+        chunkers[chunker_type] = get_chunker(chunker_type)
+    return chunkers[chunker_type]
+
+
 def get_llm_service():
-    if llm_config["completion_service"]["llm_service"].lower() == "openai":
-        llm_provider = OpenAI(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "azure":
-        llm_provider = AzureOpenAI(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "sagemaker":
-        llm_provider = AWS_SageMaker_Endpoint(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "vertexai":
-        llm_provider = GoogleVertexAI(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "bedrock":
-        llm_provider = AWSBedrock(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "groq":
-        llm_provider = Groq(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "ollama":
-        llm_provider = Ollama(llm_config["completion_service"])
-    elif llm_config["completion_service"]["llm_service"].lower() == "huggingface":
-        llm_provider = HuggingFaceEndpoint(llm_config["completion_service"])
-
-    return llm_provider
+    global _llm_service
+    if _llm_service is None:
+        with _llm_lock:
+            if _llm_service is None:
+                _llm_service = get_llm_service_from_config(llm_config)
+    return _llm_service
+
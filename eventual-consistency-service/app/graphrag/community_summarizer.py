@@ -28,15 +28,16 @@ class CommunitySummarizer:
         llm_service: LLM_Model,
     ):
         self.llm_service = llm_service
+        # built once and reused for every community
+        structured_llm = self.llm_service.model.with_structured_output(CommunitySummary)
+        self.chain = SUMMARIZE_PROMPT | structured_llm
 
     async def summarize(self, name: str, text: list[str]) -> CommunitySummary:
-        structured_llm = self.llm_service.model.with_structured_output(CommunitySummary)
-        chain = SUMMARIZE_PROMPT | structured_llm
 
         # remove iteration tags from name
         name = id_pat.sub("", name)
         try:
-            summary = await chain.ainvoke(
+            summary = await self.chain.ainvoke(
                 {
                     "entity_name": name,
                     "description_list": text,
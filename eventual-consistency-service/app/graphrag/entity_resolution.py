@@ -0,0 +1,323 @@
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Iterable, Iterator, Optional
+
+import Levenshtein as lev
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def edit_dist_check(a: str, b: str, edit_dist_threshold: float) -> bool:
+    """
+    Whether two entity names are close enough to be merged
+    (won't merge Apple and Google even if they're semantically similar)
+    """
+    a = a.lower()
+    b = b.lower()
+    # if the words are short, they should be the same
+    if len(a) < 5 and len(b) < 5:
+        return a == b
+
+    # edit_dist_threshold (as a percent) of word must match
+    threshold = int(min(len(a), len(b)) * (1 - edit_dist_threshold))
+    return lev.distance(a, b) < threshold
+
+
+def normalize(mat: np.ndarray) -> np.ndarray:
+    """
+    Scale the rows of a float32 matrix to unit length, in place
+    """
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    mat /= norms
+    return mat
+
+
+def _nearest_centroids(
+    mat: np.ndarray, centroids: np.ndarray, block_size: int, n: int = 1
+) -> np.ndarray:
+    """
+    The `n` nearest centroids of each row, nearest first
+    """
+    assign = np.empty((len(mat), n), dtype=np.int64)
+    for start in range(0, len(mat), block_size):
+        sims = mat[start : start + block_size] @ centroids.T
+        if n == 1:
+            assign[start : start + block_size, 0] = np.argmax(sims, axis=1)
+            continue
+        top = np.argpartition(-sims, n - 1, axis=1)[:, :n]
+        order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1)
+        assign[start : start + block_size] = np.take_along_axis(top, order, axis=1)
+    return assign
+
+
+def _kmeans(
+    mat: np.ndarray, nlist: int, block_size: int, iterations: int = 8, seed: int = 0
+) -> np.ndarray:
+    """
+    Spherical k-means on a sample of the (unit-norm) rows, returns nlist unit-norm centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample = mat[np.sort(rng.choice(len(mat), min(len(mat), nlist * 32), replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroids(sample, centroids, block_size)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        # a centroid that lost all its points stays where it was
+        filled = np.bincount(assign, minlength=nlist) > 0
+        centroids[filled] = normalize(sums[filled])
+    return centroids
+
+
+def _exact_blocks(mat: np.ndarray, block_size: int) -> Iterator[tuple[np.ndarray, Optional[np.ndarray]]]:
+    # every vector against all of them; None stands for all rows
+    for start in range(0, len(mat), block_size):
+        yield np.arange(start, min(start + block_size, len(mat))), None
+
+
+def _ivf_blocks(
+    mat: np.ndarray, nlist: int, nprobe: int, block_size: int
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Inverted-file partition of the rows: the vectors are clustered, and the vectors of each
+    cluster are only compared with those of the `nprobe` clusters closest to it (itself included).
+    As neighbours, vectors are also listed under their second nearest cluster, so that
+    close vectors on either side of a cluster boundary still meet.
+    """
+    centroids = _kmeans(mat, nlist, block_size)
+    assign = _nearest_centroids(mat, centroids, block_size, n=min(2, nlist))
+    members = _inverted_lists(assign[:, 0], nlist)
+    listed = _inverted_lists(assign.ravel(), nlist, len(assign[0]))
+
+    nprobe = min(nprobe, nlist)
+    for c_start in range(0, nlist, block_size):
+        c_sims = centroids[c_start : c_start + block_size] @ centroids.T
+        probes = np.argpartition(-c_sims, nprobe - 1, axis=1)[:, :nprobe]
+        for c, probe in enumerate(probes, start=c_start):
+            if len(members[c]) == 0:
+                continue
+            neighbours = np.unique(np.concatenate([listed[p] for p in probe]))
+            for start in range(0, len(members[c]), block_size):
+                yield members[c][start : start + block_size], neighbours
+
+
+def _inverted_lists(assign: np.ndarray, nlist: int, per_row: int = 1) -> list[np.ndarray]:
+    # the rows assigned to each cluster (assign holds `per_row` clusters per row, flattened)
+    order = np.argsort(assign, kind="stable")
+    bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+    rows = order // per_row
+    return [rows[bounds[c] : bounds[c + 1]] for c in range(nlist)]
+
+
+def _candidates(
+    ids: list[str],
+    vectors,
+    k: int,
+    threshold_similarity: float,
+    edit_dist_threshold_pct: float,
+    block_size: int,
+    exact_limit: int,
+    nlist: Optional[int],
+    nprobe: int,
+) -> Iterator[tuple[str, str]]:
+    """
+    Yields (entity, neighbour) for every neighbour among an entity's `k` nearest
+    that is at least `threshold_similarity` cosine-similar and passes the name check.
+
+    Up to `exact_limit` vectors, the search is exact: `block_size` query vectors at a time
+    against all of them. Past that, it is approximate: the vectors are split into `nlist`
+    clusters (4 * sqrt(n) by default) and each cluster is only searched against its `nprobe`
+    nearest clusters, so the work grows as n * sqrt(n) instead of n^2.
+
+    `vectors` is best passed as a float32 matrix, which is normalized in place rather than copied.
+    """
+    if len(ids) < 2:
+        return
+
+    mat = normalize(np.asarray(vectors, dtype=np.float32))
+    if len(mat) <= exact_limit:
+        blocks = _exact_blocks(mat, block_size)
+    else:
+        nlist = nlist or int(4 * np.sqrt(len(mat)))
+        blocks = _ivf_blocks(mat, min(nlist, len(mat)), nprobe, block_size)
+
+    # +1: an entity's own vector is always its nearest neighbour
+    k = k + 1
+    threshold = threshold_similarity - 1e-6
+    for rows_q, rows_n in blocks:
+        sims = mat[rows_q] @ (mat if rows_n is None else mat[rows_n]).T
+        # most pairs fall below the threshold, so only rank the ones above it
+        rows, cols = np.nonzero(sims >= threshold)
+        row_starts = np.searchsorted(rows, np.arange(sims.shape[0] + 1))
+        for r in range(sims.shape[0]):
+            candidates = cols[row_starts[r] : row_starts[r + 1]]
+            if len(candidates) > k:
+                scores = sims[r, candidates]
+                candidates = candidates[np.argpartition(-scores, k - 1)[:k]]
+            if rows_n is not None:
+                candidates = rows_n[candidates]
+
+            v_id = ids[rows_q[r]]
+            for c in candidates.tolist():
+                other = ids[c]
+                if other != v_id and edit_dist_check(
+                    other, v_id, edit_dist_threshold_pct
+                ):
+                    yield v_id, other
+
+
+def find_similar(
+    ids: list[str],
+    vectors,
+    k: int = 10,
+    threshold_similarity: float = 0.90,
+    edit_dist_threshold_pct: float = 0.75,
+    block_size: int = 1024,
+    exact_limit: int = 20000,
+    nlist: Optional[int] = None,
+    nprobe: int = 16,
+) -> dict[str, set[str]]:
+    """
+    For every entity, find the entities among its `k` nearest neighbours that are at
+    least `threshold_similarity` cosine-similar and pass the name check.
+    `ids` and `vectors` are parallel: an entity can have several vectors (one per description).
+
+    Returns entity id -> similar entity ids (not including itself)
+    """
+    similar = {v_id: set() for v_id in ids}
+    for v_id, other in _candidates(
+        ids, vectors, k, threshold_similarity, edit_dist_threshold_pct,
+        block_size, exact_limit, nlist, nprobe,
+    ):
+        similar[v_id].add(other)
+    return similar
+
+
+def find_pairs(
+    ids: list[str],
+    vectors,
+    k: int = 10,
+    threshold_similarity: float = 0.90,
+    edit_dist_threshold_pct: float = 0.75,
+    block_size: int = 1024,
+    exact_limit: int = 20000,
+    nlist: Optional[int] = None,
+    nprobe: int = 16,
+) -> set[tuple[str, str]]:
+    """
+    Same search as find_similar, as a set of unordered pairs: (a, b) with a < b,
+    so a pair found from both sides is only kept once
+    """
+    return {
+        (min(v_id, other), max(v_id, other))
+        for v_id, other in _candidates(
+            ids, vectors, k, threshold_similarity, edit_dist_threshold_pct,
+            block_size, exact_limit, nlist, nprobe,
+        )
+    }
+
+
+class DisjointSet:
+    """
+    Union-find over entity ids, with path compression and union by size
+    """
+
+    def __init__(self, items: Iterable[str] = ()):
+        self.parent = {}
+        self.size = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item: str):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item: str) -> str:
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # point the whole path at the root
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: str, b: str):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def components(self) -> list[list[str]]:
+        groups = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return list(groups.values())
+
+
+def canonical_id(members: Iterable[str]) -> str:
+    """
+    The id a group of entities resolves to: the longest one, ties broken alphabetically
+    """
+    return min(members, key=lambda v: (-len(v), v))
+
+
+def resolve_components(
+    entity_ids: Iterable[str], pairs: Iterable[tuple[str, str]]
+) -> dict[str, list[str]]:
+    """
+    Merge entities transitively: every connected component of the similarity pairs
+    becomes one resolved entity.
+
+    Pairs involving entities that aren't in `entity_ids` are ignored.
+
+    Returns resolved entity id -> the entities that resolve to it
+    """
+    ds = DisjointSet(entity_ids)
+    for a, b in pairs:
+        if a in ds.parent and b in ds.parent:
+            ds.union(a, b)
+    return {canonical_id(c): sorted(c) for c in ds.components()}
+
+
+def entity_set_digest(entity_ids: Iterable[str]) -> str:
+    """
+    Fingerprint of a set of entity ids, to tell whether saved pairs were found for the same entities
+    """
+    h = hashlib.sha256()
+    for v_id in sorted(set(entity_ids)):
+        h.update(v_id.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def save_pairs(path: str, pairs: Iterable[tuple[str, str]], entity_ids: Iterable[str]):
+    """
+    Save the pairs found for `entity_ids`, so an interrupted run can resume without searching again
+    """
+    with open(path, "w") as f:
+        json.dump({"entities": entity_set_digest(entity_ids), "pairs": sorted(pairs)}, f)
+
+
+def load_pairs(path: str, entity_ids: Iterable[str]) -> Optional[list[tuple[str, str]]]:
+    """
+    The pairs saved at `path`, or None if they were found for a different set of entities
+    (or the file can't be read)
+    """
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Can't read the entity pairs in {path}: {e}")
+        return None
+    if not isinstance(saved, dict) or saved.get("entities") != entity_set_digest(entity_ids):
+        return None
+    return [tuple(p) for p in saved["pairs"]]
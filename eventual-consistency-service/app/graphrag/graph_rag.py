@@ -1,22 +1,25 @@
 import asyncio
 import json
 import logging
+import os
 import time
 import traceback
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import httpx
-from aiochannel import Channel, ChannelClosed
-from graphrag import workers
+import numpy as np
+from aiochannel import Channel, ChannelClosed, ChannelEmpty
+from graphrag import entity_resolution, profiler, workers
 from graphrag.util import (
     check_all_ents_resolved,
     check_vertex_has_desc,
     check_embedding_rebuilt,
+    entity_desc_cache,
     http_timeout,
     init,
     load_q,
-    loading_event,
     make_headers,
+    stream_doc_contents,
     stream_ids,
     tg_sem,
     upsert_batch,
@@ -24,10 +27,11 @@ from graphrag.util import (
 )
 from pyTigerGraph import AsyncTigerGraphConnection
 
-from common.config import embedding_service
+from common.config import doc_processing_config, embedding_service
 from common.config import milvus_config, embedding_store_type, reuse_embedding
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.extractors.BaseExtractor import BaseExtractor
+from common.metrics.prometheus_metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +44,26 @@ async def stream_docs(
 ):
     """
     Streams the document contents into the docs_chan
+    Contents are fetched `batch_size` documents per query, and up to `prefetch`
+    batches are fetched ahead of the one being handed to docs_chan
+    (see doc_processing_config["fetch_config"]).
     """
+    fetch_config = doc_processing_config.get("fetch_config", {})
+    batch_size = fetch_config.get("batch_size", 100)
+    prefetch = fetch_config.get("prefetch", 2)
+
+    async def send(fetch: asyncio.Task):
+        res = await fetch
+        if res["error"]:
+            # continue to the next batch.
+            # These docs will not be marked as processed, so the ecc will process it eventually.
+            return
+        for doc in res["docs"]:
+            logger.info(f"""stream_docs writes {doc["v_id"]} to docs""")
+            await docs_chan.put(doc)
+
     logger.info("streaming docs")
+    fetches = deque()
     for i in range(ttl_batches):
         doc_ids = await stream_ids(conn, "Document", i, ttl_batches)
         if doc_ids["error"]:
@@ -49,19 +71,17 @@ async def stream_docs(
             # These docs will not be marked as processed, so the ecc will process it eventually.
             continue
 
-        for d in doc_ids["ids"]:
-            try:
-                async with tg_sem:
-                    res = await conn.runInstalledQuery(
-                        "StreamDocContent",
-                        params={"doc": d},
-                    )
-                logger.info(f"stream_docs writes {d} to docs")
-                await docs_chan.put(res[0]["DocContent"][0])
-            except Exception as e:
-                exc = traceback.format_exc()
-                logger.error(f"Error retrieving doc: {d} --> {e}\n{exc}")
-                continue  # try retrieving the next doc
+        ids = doc_ids["ids"]
+        for j in range(0, len(ids), batch_size):
+            fetches.append(
+                asyncio.create_task(stream_doc_contents(conn, ids[j : j + batch_size]))
+            )
+            # keep `prefetch` fetches running while the oldest one is consumed
+            if len(fetches) > prefetch:
+                await send(fetches.popleft())
+
+    while fetches:
+        await send(fetches.popleft())
 
     logger.info("stream_docs done")
     # close the docs chan -- this function is the only sender
@@ -77,17 +97,25 @@ async def chunk_docs(
     extract_chan: Channel,
 ):
     """
-    Creates and starts one worker for each document
+    Creates and starts one worker for each batch of documents
     in the docs channel.
     """
+    batch_size = doc_processing_config.get("chunker_config", {}).get("batch_size", 16)
+
     logger.info("Reading from docs channel")
     doc_tasks = []
     async with asyncio.TaskGroup() as grp:
         while True:
             try:
-                content = await docs_chan.get()
+                docs = [await docs_chan.get()]
+                # take whatever else is already waiting, so it's chunked together
+                while len(docs) < batch_size:
+                    try:
+                        docs.append(docs_chan.get_nowait())
+                    except (ChannelEmpty, ChannelClosed):
+                        break
                 task = grp.create_task(
-                    workers.chunk_doc(conn, content, upsert_chan, embed_chan, extract_chan)
+                    workers.chunk_docs(conn, docs, upsert_chan, embed_chan, extract_chan)
                 )
                 doc_tasks.append(task)
             except ChannelClosed:
@@ -130,105 +158,210 @@ async def upsert(upsert_chan: Channel):
 
 
 async def load(conn: AsyncTigerGraphConnection):
-    logger.info("Reading from load_q")
+    """
+    Groups the vertices and edges in load_q into batches and upserts them
+    A batch is sent once it holds `batch_size` items, once its oldest item has
+    waited `linger_seconds`, or when a flush is requested (see doc_processing_config["load_config"]).
+
+    Up to `max_in_flight` batches are upserted at once. When they are all busy the
+    loader stops reading, load_q fills up and the upserting workers wait on it.
+    If upserts slow down past `target_latency` seconds, the loader pauses for the
+    excess before sending the next batch, and backs off further on errors.
+    """
+    load_config = doc_processing_config.get("load_config", {})
+    batch_size = load_config.get("batch_size", 500)
+    linger_seconds = load_config.get("linger_seconds", 1)
+    max_in_flight = load_config.get("max_in_flight", 2)
+    target_latency = load_config.get("target_latency", 2)
+    max_pause = load_config.get("max_pause", 30)
+
     dd = lambda: defaultdict(dd)  # infinite default dict
-    batch_size = 500
-    # while the load q is still open or has contents
-    while not load_q.closed() or not load_q.empty():
-        if load_q.closed():
-            logger.info(
-                f"load queue closed. Flushing load_q (final load for this stage)"
-            )
-        # if there's `batch_size` entities in the channel, load it
-        # or if the channel is closed, flush it
-        if load_q.qsize() >= batch_size or load_q.closed() or load_q.should_flush():
-            batch = {
-                "vertices": defaultdict(dict[str, any]),
-                "edges": dd(),
-            }
-            n_verts = 0
-            n_edges = 0
-            size = (
-                load_q.qsize()
-                if load_q.closed() or load_q.should_flush()
-                else batch_size
-            )
-            for _ in range(size):
-                t, elem = await load_q.get()
-                if t == "FLUSH":
+    window = asyncio.Semaphore(max_in_flight)
+    latency = None  # moving average of upsert latency
+    pause = 0
+    in_flight = 0
+
+    def new_batch():
+        return {"vertices": defaultdict(dict[str, any]), "edges": dd()}, 0, 0
+
+    async def load_batch(data: str, n_items: int):
+        nonlocal latency, pause, in_flight
+        in_flight += 1
+        metrics.ecc_stage_in_flight.labels("load").set(in_flight)
+        try:
+            start = time.perf_counter()
+            res = await upsert_batch(conn, data)
+            end = time.perf_counter()
+            elapsed = end - start
+            profiler.observe_call("load", elapsed)
+            prof = profiler.current_profiler.get()
+            if prof is not None:
+                prof.add_span("upsert batch", "load", start, end, items=n_items)
+            latency = elapsed if latency is None else 0.8 * latency + 0.2 * elapsed
+            if res is not None and res.get("error"):
+                pause = min(max(pause * 2, 1), max_pause)
+            else:
+                pause = min(max(latency - target_latency, 0), max_pause)
+        finally:
+            in_flight -= 1
+            metrics.ecc_stage_in_flight.labels("load").set(in_flight)
+            window.release()
+
+    async def flush(grp: asyncio.TaskGroup, batch: dict, n_verts: int, n_edges: int):
+        if n_verts == 0 and n_edges == 0:
+            return
+        data = json.dumps(batch)
+        if pause > 0:
+            logger.info(f"Upserts are slow (avg {latency:.2f}s), pausing loader for {pause:.2f}s")
+            await asyncio.sleep(pause)
+        await window.acquire()
+        logger.info(
+            f"Upserting batch size of {n_verts + n_edges}. ({n_verts} verts | {n_edges} edges. {len(data.encode())/1000:,} kb)"
+        )
+        profiler.count("load", n_verts + n_edges)
+        grp.create_task(load_batch(data, n_verts + n_edges))
+
+    logger.info("Reading from load_q")
+    batch, n_verts, n_edges = new_batch()
+    deadline = None
+    async with asyncio.TaskGroup() as grp:
+        while True:
+            try:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+                wait_start = time.perf_counter()
+                try:
+                    t, elem = await load_q.get(timeout)
+                finally:
+                    profiler.observe_wait("load", "get", time.perf_counter() - wait_start)
+                metrics.ecc_stage_queue_depth.labels("load").set(load_q.qsize())
+            except TimeoutError:
+                # linger deadline passed: send whatever has been gathered
+                t, elem = "FLUSH", None
+            except ChannelClosed:
+                logger.info("load queue closed. Flushing load_q (final load for this stage)")
+                break
+
+            match t:
+                case "vertices":
+                    vt, v_id, attr = elem
+                    batch[t][vt][v_id] = attr
+                    n_verts += 1
+                case "edges":
+                    src_v_type, src_v_id, edge_type, tgt_v_type, tgt_v_id, attrs = (
+                        elem
+                    )
+                    batch[t][src_v_type][src_v_id][edge_type][tgt_v_type][
+                        tgt_v_id
+                    ] = attrs
+                    n_edges += 1
+                case "FLUSH":
                     logger.debug(f"flush received: {t}")
                     load_q._should_flush = False
-                    break
-                match t:
-                    case "vertices":
-                        vt, v_id, attr = elem
-                        batch[t][vt][v_id] = attr
-                        n_verts += 1
-                    case "edges":
-                        src_v_type, src_v_id, edge_type, tgt_v_type, tgt_v_id, attrs = (
-                            elem
-                        )
-                        batch[t][src_v_type][src_v_id][edge_type][tgt_v_type][
-                            tgt_v_id
-                        ] = attrs
-                        n_edges += 1
-                    case _:
-                        logger.debug(f"Unexpected data {t} -> {elem} in load_q")
-
-            data = json.dumps(batch)
-            logger.info(
-                f"Upserting batch size of {size}. ({n_verts} verts | {n_edges} edges. {len(data.encode())/1000:,} kb)"
-            )
+                case _:
+                    logger.debug(f"Unexpected data {t} -> {elem} in load_q")
 
-            loading_event.clear()
-            if n_verts >0 or n_edges >0:
-                await upsert_batch(conn, data)
-                await asyncio.sleep(5)
-            loading_event.set()
-        else:
-            await asyncio.sleep(1)
+            if t == "FLUSH" or n_verts + n_edges >= batch_size:
+                await flush(grp, batch, n_verts, n_edges)
+                batch, n_verts, n_edges = new_batch()
+                deadline = None
+            elif deadline is None:
+                deadline = time.monotonic() + linger_seconds
 
-    # TODO: flush q if it's not empty
-    if not load_q.empty():
-        raise Exception(f"load_q not empty: {load_q.qsize()}", flush=True)
+        await flush(grp, batch, n_verts, n_edges)
+
+    logger.info("load done")
 
 
 async def embed(
     embed_chan: Channel, index_stores: dict[str, EmbeddingStore], graphname: str
 ):
     """
-    Creates and starts one worker for each embed job
+    Groups embed jobs into batches and starts one worker for each batch
     chan expects:
     (v_id, content, index_name) <- q.get()
+
+    A batch is sent once it holds `batch_size` items, or once its oldest
+    item has waited `linger_seconds` (see doc_processing_config["embed_config"]).
+
+    With reuse_embedding, an id is only embedded once per run, and each batch
+    checks which of its ids already have embeddings with one request.
     """
+    embed_config = doc_processing_config.get("embed_config", {})
+    batch_size = embed_config.get("batch_size", 64)
+    linger_seconds = embed_config.get("linger_seconds", 0.5)
+
+    # store key -> (embedding_store, [v_ids], [contents])
+    batches = {}
+    deadline = None
+    # store key -> ids of this run that are embedded or queued for it
+    embedded = defaultdict(set)
+
+    def flush(grp: asyncio.TaskGroup, key: str):
+        embedding_store, v_ids, contents = batches.pop(key)
+        logger.info(f"Embed batch of {len(v_ids)} to {key}")
+        grp.create_task(
+            workers.embed(
+                embedding_service,
+                embedding_store,
+                v_ids,
+                contents,
+                embedded[key] if reuse_embedding else None,
+            )
+        )
+
     logger.info("Reading from embed channel")
     async with asyncio.TaskGroup() as grp:
         # consume task queue
         while True:
             try:
-                (v_id, content, index_name) = await embed_chan.get()
-                if embedding_store_type == "tigergraph":
-                    embedding_store = index_stores["tigergraph"]
-                    v_id = (v_id, index_name)
-                else:
-                    embedding_store = index_stores[f"{graphname}_{index_name}"]
-                logger.info(f"Embed to {graphname}_{index_name}: {v_id}")
-                if reuse_embedding and embedding_store.has_embeddings([v_id]):
-                    logger.info(f"Embeddings for {v_id} already exists, skipping to save cost")
-                    continue
-                grp.create_task(
-                    workers.embed(
-                        embedding_service,
-                        embedding_store,
-                        v_id,
-                        content,
-                    )
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+                (v_id, content, index_name) = await asyncio.wait_for(
+                    embed_chan.get(), timeout
                 )
+            except TimeoutError:
+                # linger deadline passed: send whatever has been gathered
+                for key in list(batches):
+                    flush(grp, key)
+                deadline = None
+                continue
             except ChannelClosed:
                 break
             except Exception:
                 raise
 
+            if embedding_store_type == "tigergraph":
+                key = "tigergraph"
+                v_id = (v_id, index_name)
+            else:
+                key = f"{graphname}_{index_name}"
+            embedding_store = index_stores[key]
+            logger.info(f"Embed to {graphname}_{index_name}: {v_id}")
+            if reuse_embedding:
+                if v_id in embedded[key]:
+                    logger.debug(f"{v_id} is already embedded in this run, skipping")
+                    continue
+                embedded[key].add(v_id)
+
+            if key not in batches:
+                batches[key] = (embedding_store, [], [])
+            batches[key][1].append(v_id)
+            batches[key][2].append(content)
+            if deadline is None:
+                deadline = time.monotonic() + linger_seconds
+
+            if len(batches[key][1]) >= batch_size:
+                flush(grp, key)
+                if len(batches) == 0:
+                    deadline = None
+
+        # the channel is closed, send the remaining partial batches
+        for key in list(batches):
+            flush(grp, key)
+
     logger.info(f"embed done")
 
 
@@ -305,20 +438,116 @@ async def resolve_entities(
         Groups what should be the same entity into a resolved entity (e.g. V_type and VType should be merged)
 
     Copies edges between entities to their respective ResolvedEntities
+
+    The entities' vectors are fetched `page_size` entities per request, each page kept as
+    a float32 matrix, then the similarity search runs over all of them at once in-process:
+    exact up to `exact_limit` vectors, past that an inverted-file search of each vector's
+    `nprobe` nearest clusters (see doc_processing_config["resolve_config"] and entity_resolution).
+
+    With `mode: "transitive"` the similar pairs are merged with union-find, so each
+    connected group of entities becomes one ResolvedEntity with a deterministic id,
+    and every RESOLVES_TO edge is written once. If `pairs_dir` is set, the graph's pairs
+    are saved there until the entities are resolved, so an interrupted run resumes
+    without repeating the search. Saved pairs are only used for the same set of entities.
+    Otherwise (`mode: "neighbourhood"`) each entity is merged with its own neighbours.
     """
+    resolve_config = doc_processing_config.get("resolve_config", {})
+    page_size = resolve_config.get("page_size", 1000)
+    transitive = resolve_config.get("mode", "neighbourhood") == "transitive"
+    pairs_dir = resolve_config.get("pairs_dir")
+    pairs_path = None
+    if transitive and pairs_dir is not None:
+        pairs_path = os.path.join(pairs_dir, f"{conn.graphname}_entity_pairs.json")
+    search_args = {
+        "k": resolve_config.get("k", 10),
+        "threshold_similarity": resolve_config.get("threshold_similarity", 0.90),
+        "edit_dist_threshold_pct": resolve_config.get("edit_dist_threshold_pct", 0.75),
+        "block_size": resolve_config.get("block_size", 1024),
+        "exact_limit": resolve_config.get("exact_limit", 20000),
+        "nlist": resolve_config.get("nlist"),
+        "nprobe": resolve_config.get("nprobe", 16),
+    }
+    # an earlier run of this graph was interrupted after its search: the vectors are only
+    # fetched if its pairs turn out to be for other entities
+    resume = pairs_path is not None and os.path.exists(pairs_path)
+
+    entities = []
+    entity_ids = []
     async with asyncio.TaskGroup() as grp:
+        fetches = []
+        page = []
         # for every entity
         while True:
             try:
                 entity_id = await entity_chan.get()
-                grp.create_task(
-                    workers.resolve_entity(conn, upsert_chan, emb_store, entity_id)
-                )
-                logger.debug(f"Added Entity to resolve: {entity_id}")
             except ChannelClosed:
                 break
             except Exception:
                 raise
+            entity_ids.append(entity_id[0] if isinstance(entity_id, tuple) else entity_id)
+            if resume:
+                entities.append(entity_id)
+                continue
+            page.append(entity_id)
+            if len(page) >= page_size:
+                fetches.append(grp.create_task(workers.fetch_entity_vectors(emb_store, page)))
+                page = []
+        if len(page) > 0:
+            fetches.append(grp.create_task(workers.fetch_entity_vectors(emb_store, page)))
+    entity_ids = list(dict.fromkeys(entity_ids))
+
+    pairs = None
+    if resume:
+        pairs = entity_resolution.load_pairs(pairs_path, entity_ids)
+        if pairs is None:
+            logger.info(f"The pairs in {pairs_path} are for other entities, searching again")
+            async with asyncio.TaskGroup() as grp:
+                fetches = [
+                    grp.create_task(workers.fetch_entity_vectors(emb_store, entities[i : i + page_size]))
+                    for i in range(0, len(entities), page_size)
+                ]
+
+    ids, pages = [], []
+    for fetch in fetches:
+        page_ids, page_vectors = fetch.result()
+        if page_vectors is not None:
+            ids.extend(page_ids)
+            pages.append(page_vectors)
+    del fetches
+    vectors = np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.float32)
+    del pages
+
+    if transitive:
+        if pairs is not None:
+            logger.info(f"Resolving {len(entity_ids)} entities from pairs in {pairs_path}")
+        else:
+            logger.info(f"Resolving {len(entity_ids)} entities ({len(vectors)} vectors)")
+            pairs = await asyncio.to_thread(
+                entity_resolution.find_pairs, ids, vectors, **search_args
+            )
+            if pairs_path is not None:
+                os.makedirs(pairs_dir, exist_ok=True)
+                entity_resolution.save_pairs(pairs_path, pairs, entity_ids)
+        resolved = entity_resolution.resolve_components(entity_ids, pairs)
+        logger.info(f"Merging {len(entity_ids)} entities into {len(resolved)} resolved entities")
+        for resolved_entity_id, members in resolved.items():
+            await workers.upsert_resolved_entity(
+                conn, upsert_chan, resolved_entity_id, members
+            )
+        if pairs_path is not None:
+            # resolved: the next run searches its own entities
+            os.remove(pairs_path)
+    else:
+        logger.info(f"Resolving {len(entity_ids)} entities ({len(vectors)} vectors)")
+        similar = await asyncio.to_thread(
+            entity_resolution.find_similar, ids, vectors, **search_args
+        )
+        # entities without vectors resolve to themselves
+        for entity_id in entity_ids:
+            await workers.resolve_entity(
+                conn, upsert_chan, entity_id, similar.get(entity_id, set())
+            )
+
     logger.info("closing upsert_chan")
     upsert_chan.close()
     logger.info("resolve_entities done")
@@ -476,9 +705,28 @@ async def run(graphname: str, conn: AsyncTigerGraphConnection):
             - upsert everything to the graph
         - Resolve Entities
             Ex: "Vincent van Gogh" and "van Gogh" should be resolved to "Vincent van Gogh"
+
+    Each phase and stage is timed, and a timeline of the run is written out
+    at the end (see doc_processing_config["profile_config"] and profiler.RunProfiler).
     """
+    prof = profiler.RunProfiler(graphname)
+    token = profiler.current_profiler.set(prof)
+    try:
+        await _run(graphname, conn, prof)
+    finally:
+        profiler.current_profiler.reset(token)
+        profile_config = doc_processing_config.get("profile_config", {})
+        if profile_config.get("enabled", True):
+            try:
+                prof.write(profile_config.get("path"))
+            except Exception:
+                logger.error(f"Could not write the graphrag timeline:\n{traceback.format_exc()}")
 
-    extractor, index_stores = await init(conn)
+
+async def _run(graphname: str, conn: AsyncTigerGraphConnection, prof: profiler.RunProfiler):
+    async with prof.span("init"):
+        extractor, index_stores = await init(conn)
+    entity_desc_cache.pop(graphname, None)
     init_start = time.perf_counter()
 
     doc_process_switch = True
@@ -486,25 +734,35 @@ async def run(graphname: str, conn: AsyncTigerGraphConnection):
     community_detection_switch = True
     if doc_process_switch:
         logger.info("Doc Processing Start")
-        docs_chan = Channel(1)
-        embed_chan = Channel()
-        upsert_chan = Channel()
-        extract_chan = Channel()
-        async with asyncio.TaskGroup() as grp:
+        # channels are named after the stage that consumes them
+        docs_chan = profiler.ProfiledChannel(
+            "chunk",
+            doc_processing_config.get("fetch_config", {}).get("buffer_size", 200),
+        )
+        embed_chan = profiler.ProfiledChannel("embed")
+        upsert_chan = profiler.ProfiledChannel("upsert")
+        extract_chan = profiler.ProfiledChannel("extract")
+        async with prof.span("doc processing"), asyncio.TaskGroup() as grp:
             # get docs
-            grp.create_task(stream_docs(conn, docs_chan, 100))
+            grp.create_task(prof.stage("stream_docs", stream_docs(conn, docs_chan, 100)))
             # process docs
             grp.create_task(
-                chunk_docs(conn, docs_chan, embed_chan, upsert_chan, extract_chan)
+                prof.stage(
+                    "chunk",
+                    chunk_docs(conn, docs_chan, embed_chan, upsert_chan, extract_chan),
+                )
             )
             # upsert chunks
-            grp.create_task(upsert(upsert_chan))
-            grp.create_task(load(conn))
+            grp.create_task(prof.stage("upsert", upsert(upsert_chan)))
+            grp.create_task(prof.stage("load", load(conn)))
             # embed
-            grp.create_task(embed(embed_chan, index_stores, graphname))
+            grp.create_task(prof.stage("embed", embed(embed_chan, index_stores, graphname)))
             # extract entities
             grp.create_task(
-                extract(extract_chan, upsert_chan, embed_chan, extractor, conn)
+                prof.stage(
+                    "extract",
+                    extract(extract_chan, upsert_chan, embed_chan, extractor, conn),
+                )
             )
     logger.info("Join docs_chan")
     await docs_chan.join()
@@ -516,11 +774,14 @@ async def run(graphname: str, conn: AsyncTigerGraphConnection):
     await upsert_chan.join()
     init_end = time.perf_counter()
     logger.info("Doc Processing End")
+    # entity descriptions are only merged during doc processing
+    entity_desc_cache.pop(graphname, None)
 
     # Type Resolution
     type_start = time.perf_counter()
     logger.info("Type Processing Start")
-    res = await add_rels_between_types(conn)
+    async with prof.span("type resolution"):
+        res = await add_rels_between_types(conn)
     if res.get("error", False):
         logger.error(f"Error adding relationships between types: {res}")
     else:
@@ -536,31 +797,37 @@ async def run(graphname: str, conn: AsyncTigerGraphConnection):
             while not await check_embedding_rebuilt(conn, "Entity"):
                 logger.info(f"Waiting for embedding to finish rebuilding")
                 await asyncio.sleep(1)
-        entities_chan = Channel()
-        upsert_chan = Channel()
+        entities_chan = profiler.ProfiledChannel("resolve")
+        upsert_chan = profiler.ProfiledChannel("upsert")
         load_q.reopen()
-        async with asyncio.TaskGroup() as grp:
-            grp.create_task(stream_entities(conn, entities_chan, 50))
+        async with prof.span("entity resolution"), asyncio.TaskGroup() as grp:
+            grp.create_task(
+                prof.stage("stream_entities", stream_entities(conn, entities_chan, 50))
+            )
             if embedding_store_type == "tigergraph":
                 embedding_store = index_stores["tigergraph"]
             else:
                 embedding_store = index_stores[f"{conn.graphname}_Entity"]
             grp.create_task(
-                resolve_entities(
-                    conn,
-                    embedding_store,
-                    entities_chan,
-                    upsert_chan,
+                prof.stage(
+                    "resolve",
+                    resolve_entities(
+                        conn,
+                        embedding_store,
+                        entities_chan,
+                        upsert_chan,
+                    ),
                 )
             )
-            grp.create_task(upsert(upsert_chan))
-            grp.create_task(load(conn))
+            grp.create_task(prof.stage("upsert", upsert(upsert_chan)))
+            grp.create_task(prof.stage("load", load(conn)))
         logger.info("Join entities_chan")
         await entities_chan.join()
         logger.info("Join upsert_chan")
         await upsert_chan.join()
         #Resolve relationsihps
-        await resolve_relationships(conn)
+        async with prof.span("resolve relationships"):
+            await resolve_relationships(conn)
 
     entity_end = time.perf_counter()
     logger.info("Entity Processing End")
@@ -572,21 +839,24 @@ async def run(graphname: str, conn: AsyncTigerGraphConnection):
     community_start = time.perf_counter()
     if community_detection_switch:
         logger.info("Community Processing Start")
-        comm_process_chan = Channel()
-        upsert_chan = Channel()
-        embed_chan = Channel()
+        comm_process_chan = profiler.ProfiledChannel("community")
+        upsert_chan = profiler.ProfiledChannel("upsert")
+        embed_chan = profiler.ProfiledChannel("embed")
         load_q.reopen()
-        async with asyncio.TaskGroup() as grp:
+        async with prof.span("community detection"), asyncio.TaskGroup() as grp:
             # run louvain
             # get the communities
-            grp.create_task(communities(conn, comm_process_chan))
+            grp.create_task(prof.stage("louvain", communities(conn, comm_process_chan)))
             # summarize each community
             grp.create_task(
-                summarize_communities(conn, comm_process_chan, upsert_chan, embed_chan)
+                prof.stage(
+                    "community",
+                    summarize_communities(conn, comm_process_chan, upsert_chan, embed_chan),
+                )
             )
-            grp.create_task(upsert(upsert_chan))
-            grp.create_task(load(conn))
-            grp.create_task(embed(embed_chan, index_stores, graphname))
+            grp.create_task(prof.stage("upsert", upsert(upsert_chan)))
+            grp.create_task(prof.stage("load", load(conn)))
+            grp.create_task(prof.stage("embed", embed(embed_chan, index_stores, graphname)))
         logger.info("Join comm_process_chan")
         await comm_process_chan.join()
         logger.info("Join embed_chan")
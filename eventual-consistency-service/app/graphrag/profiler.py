@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from aiochannel import Channel
+
+from common.logs.log import get_log_config
+from common.metrics.prometheus_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# the profiler of the run the current task belongs to (inherited by the tasks it creates)
+current_profiler: ContextVar[Optional["RunProfiler"]] = ContextVar(
+    "graphrag_profiler", default=None
+)
+
+
+class RunProfiler:
+    """
+    Collects per-stage timings for one graphrag.run and writes them out as a
+    timeline in the Chrome trace event format (open it in chrome://tracing or
+    https://ui.perfetto.dev) with a per-stage summary alongside.
+
+    The same measurements are exported to Prometheus as they happen:
+        ecc_stage_items_total             items handled by a stage
+        ecc_stage_wait_seconds            time blocked, by kind:
+                                            get     waiting on an empty input channel
+                                            put     waiting on a full output channel (backpressure)
+                                            limiter waiting for a concurrency slot
+        ecc_stage_call_duration_seconds   latency of the stage's downstream calls
+        ecc_stage_duration_seconds        wall time of a whole stage
+    """
+
+    def __init__(self, graphname: str):
+        self.graphname = graphname
+        self.start = time.perf_counter()
+        self.events = []
+        self.items = defaultdict(int)
+        self.waits = defaultdict(float)
+        self.calls = defaultdict(lambda: [0, 0.0])
+
+    def _ts(self, t: float) -> float:
+        # trace timestamps are in microseconds
+        return round((t - self.start) * 1e6, 1)
+
+    def add_span(self, name: str, track: str, start: float, end: float, **args):
+        self.events.append(
+            {
+                "name": name,
+                "cat": track,
+                "ph": "X",
+                "ts": self._ts(start),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": self.graphname,
+                "tid": track,
+                "args": args,
+            }
+        )
+
+    @asynccontextmanager
+    async def span(self, name: str, track: str = "phases"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, track, start, time.perf_counter())
+
+    async def stage(self, name: str, coro):
+        """
+        Await a pipeline stage coroutine, recording it on its own timeline track
+        (stages run side by side, so they can't share one)
+        """
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            end = time.perf_counter()
+            self.add_span(name, f"stage: {name}", start, end)
+            metrics.ecc_stage_duration_seconds.labels(name).observe(end - start)
+
+    def summary(self) -> dict:
+        stages = set(self.items) | {s for s, _ in self.waits} | set(self.calls)
+        summary = {}
+        for s in sorted(stages):
+            n_calls, call_time = self.calls.get(s, (0, 0.0))
+            summary[s] = {
+                "items": self.items.get(s, 0),
+                "wait_seconds": {
+                    kind: round(t, 3) for (stage, kind), t in self.waits.items() if stage == s
+                },
+                "calls": n_calls,
+                "call_seconds": round(call_time, 3),
+                "avg_call_seconds": round(call_time / n_calls, 3) if n_calls else None,
+            }
+        return summary
+
+    def write(self, path: str = None) -> str:
+        if path is None:
+            log_dir = get_log_config().get("log_file_path", "/tmp/logs")
+            path = os.path.join(
+                log_dir, f"graphrag_timeline_{self.graphname}_{int(time.time())}.json"
+            )
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": self.events,
+                    "displayTimeUnit": "ms",
+                    "summary": self.summary(),
+                },
+                f,
+            )
+        logger.info(f"Wrote graphrag timeline to {path}")
+        return path
+
+
+def count(stage: str, n: int = 1):
+    metrics.ecc_stage_items_total.labels(stage).inc(n)
+    p = current_profiler.get()
+    if p is not None:
+        p.items[stage] += n
+
+
+def observe_wait(stage: str, kind: str, seconds: float):
+    metrics.ecc_stage_wait_seconds.labels(stage, kind).observe(seconds)
+    p = current_profiler.get()
+    if p is not None:
+        p.waits[(stage, kind)] += seconds
+
+
+def observe_call(stage: str, seconds: float):
+    metrics.ecc_stage_call_duration_seconds.labels(stage).observe(seconds)
+    p = current_profiler.get()
+    if p is not None:
+        p.calls[stage][0] += 1
+        p.calls[stage][1] += seconds
+
+
+class ProfiledChannel(Channel):
+    """
+    Channel that reports the items passing through it and how long its
+    consumers (get) and producers (put) were blocked on it
+    """
+
+    def __init__(self, name: str, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.name = name
+
+    async def get(self):
+        start = time.perf_counter()
+        try:
+            return await super().get()
+        finally:
+            observe_wait(self.name, "get", time.perf_counter() - start)
+
+    def get_nowait(self):
+        item = super().get_nowait()
+        count(self.name)
+        return item
+
+    async def put(self, item):
+        start = time.perf_counter()
+        try:
+            return await super().put(item)
+        finally:
+            observe_wait(self.name, "put", time.perf_counter() - start)
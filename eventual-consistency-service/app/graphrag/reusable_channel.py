@@ -1,4 +1,7 @@
-from asyncio import Queue
+import asyncio
+from asyncio import Event, Queue
+
+from aiochannel import ChannelClosed
 
 
 class ReuseableChannel:
@@ -6,13 +9,42 @@ class ReuseableChannel:
         self.maxsize = maxsize
         self.q = Queue(maxsize)
         self._closed = False
+        self._closed_event = Event()
         self._should_flush = False
 
     async def put(self, item: any) -> None:
+        # blocks while the channel is full, which pushes back on the producers
         await self.q.put(item)
 
-    async def get(self) -> any:
-        return await self.q.get()
+    async def get(self, timeout: float = None) -> any:
+        """
+        Get the next item.
+        Raises TimeoutError if nothing arrives within `timeout` seconds,
+        and ChannelClosed once the channel is closed and drained.
+        """
+        while True:
+            if not self.q.empty():
+                return self.q.get_nowait()
+            if self._closed:
+                raise ChannelClosed()
+
+            # wait for either an item or the channel closing
+            getter = asyncio.ensure_future(self.q.get())
+            closer = asyncio.ensure_future(self._closed_event.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    {getter, closer},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                closer.cancel()
+                if not getter.done():
+                    getter.cancel()
+            if getter in done:
+                return getter.result()
+            if closer not in done:
+                raise TimeoutError()
 
     def closed(self):
         return self._closed
@@ -29,9 +61,11 @@ class ReuseableChannel:
 
     def close(self):
         self._closed = True
+        self._closed_event.set()
 
     def qsize(self) -> int:
         return self.q.qsize()
 
     def reopen(self):
         self._closed = False
+        self._closed_event.clear()
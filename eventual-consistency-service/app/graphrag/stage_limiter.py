@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import httpx
+
+from common.metrics.prometheus_metrics import metrics
+from graphrag import profiler
+
+logger = logging.getLogger(__name__)
+
+
+def is_overload(e: BaseException) -> bool:
+    """
+    Whether an error means the downstream service is overloaded (rate limits, timeouts)
+    """
+    if isinstance(e, (TimeoutError, httpx.TimeoutException)):
+        return True
+    if getattr(e, "status_code", None) == 429:
+        return True
+    msg = str(e).lower()
+    return "429" in msg or "rate limit" in msg or "timed out" in msg or "timeout" in msg
+
+
+class StageLimiter:
+    """
+    Limits how many workers of a pipeline stage run at once. Used like a semaphore:
+
+        async with limiter:
+            ...
+
+    With `adaptive=True` the limit follows AIMD: it grows by one after every
+    `window` calls whose p95 latency stays within `tolerance` of the best p95
+    seen so far, and is cut by `backoff` on overload errors (429s, timeouts)
+    or when the p95 rises past that bound.
+
+    The stage's in-flight count, waiting count and current limit are exported to Prometheus,
+    and the time spent waiting for a slot and holding one are reported to the run profiler.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        limit: int,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: int = None,
+        window: int = 20,
+        tolerance: float = 1.5,
+        backoff: float = 0.5,
+    ):
+        self.stage = stage
+        self.limit = limit
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else limit * 4
+        self.window = window
+        self.tolerance = tolerance
+        self.backoff = backoff
+
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = asyncio.Condition()
+        self._latencies = deque(maxlen=window)
+        self._best_p95 = None
+        self._started = {}
+        metrics.ecc_stage_concurrency_limit.labels(stage).set(limit)
+
+    async def __aenter__(self):
+        self.waiting += 1
+        wait_start = time.monotonic()
+        metrics.ecc_stage_queue_depth.labels(self.stage).set(self.waiting)
+        try:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.in_flight < self.limit)
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+            metrics.ecc_stage_queue_depth.labels(self.stage).set(self.waiting)
+            profiler.observe_wait(self.stage, "limiter", time.monotonic() - wait_start)
+        metrics.ecc_stage_in_flight.labels(self.stage).set(self.in_flight)
+        self._started.setdefault(asyncio.current_task(), []).append(time.monotonic())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        task = asyncio.current_task()
+        start = self._started[task].pop() if self._started.get(task) else None
+        if task in self._started and len(self._started[task]) == 0:
+            del self._started[task]
+        if start is not None:
+            profiler.observe_call(self.stage, time.monotonic() - start)
+        if exc is not None:
+            self.record_error(exc)
+        elif start is not None:
+            self._record_latency(time.monotonic() - start)
+
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+        metrics.ecc_stage_in_flight.labels(self.stage).set(self.in_flight)
+
+    def record_error(self, e: BaseException):
+        """
+        Report an error that was handled inside the stage, so overloads still slow it down
+        """
+        if self.adaptive and is_overload(e):
+            self._set_limit(int(self.limit * self.backoff), f"overloaded ({e})")
+            self._latencies.clear()
+
+    def _record_latency(self, latency: float):
+        if not self.adaptive:
+            return
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window:
+            return
+
+        p95 = sorted(self._latencies)[int(0.95 * (len(self._latencies) - 1))]
+        self._latencies.clear()
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+
+        if p95 > self._best_p95 * self.tolerance:
+            self._set_limit(int(self.limit * self.backoff), f"p95 rose to {p95:.2f}s")
+        else:
+            self._set_limit(self.limit + 1)
+
+    def _set_limit(self, limit: int, reason: str = None):
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        if limit == self.limit:
+            return
+        if reason is not None:
+            logger.info(f"{self.stage} concurrency {self.limit} -> {limit}: {reason}")
+        # waiters are woken by the notify in __aexit__, the only place the limit grows
+        self.limit = limit
+        metrics.ecc_stage_concurrency_limit.labels(self.stage).set(limit)
+
+
+def from_config(config: dict, stage: str, default: int) -> StageLimiter:
+    """
+    Build a stage's limiter from doc_processing_config["concurrency_config"]
+    A stage is either set to a number, or to a dict of StageLimiter arguments, e.g.
+        {"extract": {"limit": 20, "adaptive": true, "max_limit": 64}}
+    """
+    stage_config = config.get(stage, default)
+    if isinstance(stage_config, dict):
+        stage_config = dict(stage_config)
+        limit = stage_config.pop("limit", default)
+        return StageLimiter(stage, limit, **stage_config)
+    return StageLimiter(stage, stage_config)
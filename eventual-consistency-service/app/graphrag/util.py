@@ -2,24 +2,25 @@ import asyncio
 import base64
 import logging
 import re
+import time
 import traceback
 from glob import glob
+from typing import Iterable
 
+import ecc_util
 import httpx
-from graphrag import reusable_channel, workers
+from graphrag import profiler, reusable_channel, stage_limiter, workers
 from pyTigerGraph import AsyncTigerGraphConnection
 
 from common.config import (
     doc_processing_config,
     embedding_service,
-    get_llm_service,
-    llm_config,
     milvus_config,
     embedding_store_type,
 )
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.tigergraph_embedding_store import TigerGraphEmbeddingStore
-from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore, index_options
 from common.extractors import GraphExtractor, LLMEntityRelationshipExtractor
 from common.extractors.BaseExtractor import BaseExtractor
 from common.logs.logwriter import LogWriter
@@ -28,12 +29,15 @@ logger = logging.getLogger(__name__)
 
 http_timeout = httpx.Timeout(15.0)
 
-tg_sem = asyncio.Semaphore(2)
-load_q = reusable_channel.ReuseableChannel()
+concurrency_config = doc_processing_config.get("concurrency_config", {})
+tg_sem = stage_limiter.from_config(concurrency_config, "tigergraph", 2)
+# bounded so that upserting workers wait on the loader when it falls behind
+load_q = reusable_channel.ReuseableChannel(
+    doc_processing_config.get("load_config", {}).get("queue_size", 5000)
+)
 
-# will pause workers until the event is false
-loading_event = asyncio.Event()
-loading_event.set() # set the event to true to allow the workers to run
+# graphname -> {entity id -> descriptions}, for the duration of a run
+entity_desc_cache: dict[str, dict[str, list[str]]] = {}
 
 async def install_queries(
     requried_queries: list[str],
@@ -78,12 +82,14 @@ async def init(
     requried_queries = [
         "common/gsql/graphRAG/StreamIds",
         "common/gsql/graphRAG/StreamDocContent",
+        "common/gsql/graphRAG/StreamDocContents",
         "common/gsql/graphRAG/SetEpochProcessing",
         "common/gsql/graphRAG/ResolveRelationships",
         "common/gsql/graphRAG/get_community_children",
         "common/gsql/graphRAG/entities_have_resolution",
         "common/gsql/graphRAG/communities_have_desc",
         "common/gsql/graphRAG/get_vertices_or_remove",
+        "common/gsql/graphRAG/get_entity_descriptions",
         "common/gsql/graphRAG/louvain/graphrag_louvain_init",
         "common/gsql/graphRAG/louvain/graphrag_louvain_communities",
         "common/gsql/graphRAG/louvain/modularity",
@@ -99,7 +105,7 @@ async def init(
     if doc_processing_config.get("extractor") == "graphrag":
         extractor = GraphExtractor()
     elif doc_processing_config.get("extractor") == "llm":
-        extractor = LLMEntityRelationshipExtractor(get_llm_service(llm_config))
+        extractor = LLMEntityRelationshipExtractor(ecc_util.get_llm_service())
     else:
         raise ValueError("Invalid extractor type")
 
@@ -131,6 +137,7 @@ async def init(
                     text_field=milvus_config.get("text_field", "document_content"),
                     vertex_field=vertex_field,
                     drop_old=False,
+                    **index_options(milvus_config),
                 )
 
                 LogWriter.info(f"Initializing {name}")
@@ -186,6 +193,27 @@ async def stream_ids(
         return {"error": True, "message": str(e)}
 
 
+async def stream_doc_contents(
+    conn: AsyncTigerGraphConnection, doc_ids: list[str]
+) -> dict[str, str | list[dict]]:
+    try:
+        async with tg_sem:
+            res = await conn.runInstalledQuery(
+                "StreamDocContents",
+                params={"docs": doc_ids},
+                usePost=True,
+            )
+        docs = res[0]["DocContent"]
+        logger.debug(f"Fetched content of {len(docs)} docs")
+        return {"error": False, "docs": docs}
+
+    except Exception as e:
+        exc = traceback.format_exc()
+        LogWriter.error(f"/{conn.graphname}/query/StreamDocContents\nException Trace:\n{exc}")
+
+        return {"error": True, "message": str(e)}
+
+
 def map_attrs(attributes: dict):
     # map attrs
     attrs = {}
@@ -222,8 +250,19 @@ async def upsert_vertex(
 ):
     logger.debug(f"Upsert vertex: {vertex_id} as {vertex_type}")
     vertex_id = vertex_id.replace(" ", "_")
+    if vertex_type == "Entity" and "description" in attributes:
+        cache_entity_desc(conn, vertex_id, attributes["description"])
     attrs = map_attrs(attributes)
-    await load_q.put(("vertices", (vertex_type, vertex_id, attrs)))
+    await enqueue_load(("vertices", (vertex_type, vertex_id, attrs)))
+
+
+async def enqueue_load(item: tuple):
+    """
+    Put an item on load_q, reporting how long the loader's backpressure held it up
+    """
+    start = time.perf_counter()
+    await load_q.put(item)
+    profiler.observe_wait("load", "put", time.perf_counter() - start)
 
 
 async def upsert_batch(conn: AsyncTigerGraphConnection, data: str):
@@ -234,6 +273,7 @@ async def upsert_batch(conn: AsyncTigerGraphConnection, data: str):
         except Exception as e:
             err = traceback.format_exc()
             logger.error(f"Upsert err with {data}:\n{err}")
+            tg_sem.record_error(e)
             return {"error": True, "message": str(e)}
 
 
@@ -251,6 +291,58 @@ async def check_vertex_exists(conn, v_id: str):
         return {"error": False, "resp": res}
 
 
+def cache_entity_desc(conn, v_id: str, desc: list[str]) -> list[str]:
+    """
+    Merge descriptions into the run's entity description cache (write-through)
+    Returns the merged descriptions, newest first.
+    """
+    cache = entity_desc_cache.setdefault(conn.graphname, {})
+    merged = list(dict.fromkeys([*desc, *cache.get(v_id, [])]))
+    cache[v_id] = merged
+    return merged
+
+
+async def get_entity_desc(conn, v_id: str) -> list[str]:
+    """
+    Get an entity's known descriptions, only reading from the graph on a cache miss
+    """
+    cache = entity_desc_cache.setdefault(conn.graphname, {})
+    if v_id not in cache:
+        exists = await check_vertex_exists(conn, v_id)
+        desc = []
+        if not exists.get("error", False):
+            desc = exists["resp"][0]["attributes"]["description"]
+        # a concurrent write may have landed while we were waiting
+        cache_entity_desc(conn, v_id, desc)
+    return cache[v_id]
+
+
+async def prefetch_entity_desc(conn, v_ids: Iterable[str]):
+    """
+    Load the descriptions of the uncached entities in one query
+    """
+    cache = entity_desc_cache.setdefault(conn.graphname, {})
+    missing = list({v_id for v_id in v_ids if v_id not in cache})
+    if len(missing) == 0:
+        return
+
+    async with tg_sem:
+        try:
+            res = await conn.runInstalledQuery(
+                "get_entity_descriptions",
+                params={"ids": missing},
+                usePost=True,
+            )
+        except Exception:
+            logger.error(f"Prefetch descriptions err:\n{traceback.format_exc()}")
+            return
+
+    descs = res[0]["@@descriptions"]
+    for v_id in missing:
+        # entities that aren't in the graph yet have no descriptions
+        cache_entity_desc(conn, v_id, descs.get(v_id, []))
+
+
 async def upsert_edge(
     conn: AsyncTigerGraphConnection,
     src_v_type: str,
@@ -267,7 +359,7 @@ async def upsert_edge(
     logger.debug(f"Upsert edge: {src_v_id} -[{edge_type}]-> {tgt_v_id}")
     src_v_id = src_v_id.replace(" ", "_")
     tgt_v_id = tgt_v_id.replace(" ", "_")
-    await load_q.put(
+    await enqueue_load(
         (
             "edges",
             (
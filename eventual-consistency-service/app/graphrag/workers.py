@@ -4,17 +4,19 @@ import logging
 import time
 import json
 import traceback
+from collections import defaultdict
 from urllib.parse import quote_plus
 from typing import Iterable, List, Optional, Tuple
 
 import ecc_util
 import httpx
+import numpy as np
 from aiochannel import Channel
-from graphrag import community_summarizer, util
+from graphrag import community_summarizer, entity_resolution, stage_limiter, util
 from langchain_community.graphs.graph_document import GraphDocument, Node
 from pyTigerGraph import AsyncTigerGraphConnection
 
-from common.config import milvus_config
+from common.config import doc_processing_config, milvus_config
 from common.embeddings.embedding_services import EmbeddingModel
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.extractors import BaseExtractor, LLMEntityRelationshipExtractor
@@ -54,40 +56,54 @@ INSTALL QUERY {query_name}
     return {"result": res, "error": False}
 
 
-chunk_sem = asyncio.Semaphore(20)
+chunk_sem = stage_limiter.from_config(util.concurrency_config, "chunk", 20)
 
 
-async def chunk_doc(
+async def chunk_docs(
     conn: AsyncTigerGraphConnection,
-    doc: dict[str, str],
+    docs: list[dict[str, str]],
     upsert_chan: Channel,
     embed_chan: Channel,
     extract_chan: Channel,
 ):
     """
-    Chunks a document.
+    Chunks a batch of documents.
+    Documents of the same ctype are chunked together, so chunkers that embed
+    (semantic) can batch the embedding calls across documents.
     Places the resulting chunks into the upsert channel (to be upserted to TG)
     and the embed channel (to be embedded and written to the vector store)
     """
 
-    # if loader is running, wait until it's done
-    if not util.loading_event.is_set():
-        logger.info("Chunk worker waiting for loading event to finish")
-        await util.loading_event.wait()
-
     async with chunk_sem:
-        if "ctype" in doc["attributes"]:
-            chunker_type = doc["attributes"]["ctype"].lower().strip()
-        else:
-            chunker_type = ""
-        chunker = ecc_util.get_chunker(chunker_type)
-        # decode the text return from tigergraph as it was encoded when written into jsonl file for uploading
-        chunks = chunker.chunk(doc["attributes"]["text"].encode('utf-8').decode('unicode_escape'))
+        by_type = defaultdict(list)
+        for doc in docs:
+            if "ctype" in doc["attributes"]:
+                chunker_type = doc["attributes"]["ctype"].lower().strip()
+            else:
+                chunker_type = ""
+            by_type[chunker_type].append(doc)
+
+        doc_chunks = []
+        for chunker_type, typed_docs in by_type.items():
+            chunker = ecc_util.get_shared_chunker(chunker_type)
+            # decode the text return from tigergraph as it was encoded when written into jsonl file for uploading
+            texts = [
+                doc["attributes"]["text"].encode('utf-8').decode('unicode_escape')
+                for doc in typed_docs
+            ]
+            # chunkers are synchronous (and may call the embedding service), keep them off the event loop
+            chunks = await asyncio.to_thread(chunker.chunk_many, texts)
+            doc_chunks.extend(
+                (doc, chunker_type, c) for doc, c in zip(typed_docs, chunks)
+            )
+
+    v_ids = []
+    for doc, chunker_type, chunks in doc_chunks:
         v_id = util.process_id(doc["v_id"])
         if v_id != doc["v_id"]:
             logger.info(f"""Cloning doc/content {doc["v_id"]} -> {v_id}""")
             await upsert_chan.put((upsert_doc, (conn, v_id, chunker_type, doc["attributes"]["text"])))
-       
+
         logger.info(f"Chunking {v_id}")
         for i, chunk in enumerate(chunks):
             chunk_id = f"{v_id}_chunk_{i}"
@@ -104,8 +120,9 @@ async def chunk_doc(
             # send chunks to be embedded
             logger.info("chunk writes to embed_chan")
             await embed_chan.put((chunk_id, chunk, "DocumentChunk"))
+        v_ids.append(v_id)
 
-    return v_id
+    return v_ids
 
 
 async def upsert_doc(conn: AsyncTigerGraphConnection, doc_id, ctype, content_text):
@@ -158,55 +175,76 @@ async def upsert_chunk(conn: AsyncTigerGraphConnection, doc_id, chunk_id, chunk)
         )
 
 
-embed_sem = asyncio.Semaphore(20)
+embed_sem = stage_limiter.from_config(util.concurrency_config, "embed", 20)
 
 
 async def embed(
     embed_svc: EmbeddingModel,
     embed_store: EmbeddingStore,
-    v_id: str | Tuple[str, str],
-    content: str,
+    v_ids: List[str | Tuple[str, str]],
+    contents: List[str],
+    embedded: set = None,
 ):
     """
+    Embeds a batch of vertices with one call to the embedding service
+    and writes them to the vector store with one insert.
+
+    When `embedded` (the run's set of ids queued for embedding) is given, embeddings
+    are reused: vertices that already have one are looked up in one request and skipped.
+
     Args:
-        graphname: str
-            the name of the graph the documents are in
         embed_svc: EmbeddingModel
             The class used to vectorize text
         embed_store:
             The class used to store the vectore to a vector DB
-        v_id: str
-            the vertex id that will be embedded
-        content: str
-            the content of the document/chunk
-        index_name: str
-            the vertex index to write to
+        v_ids: list[str]
+            the vertex ids that will be embedded
+        contents: list[str]
+            the content of each document/chunk (same order as v_ids)
+        embedded: set
+            ids of the run that are embedded or queued for it
     """
-    async with embed_sem:
-        logger.info(f"Embedding {v_id}")
+    if embedded is not None:
+        try:
+            existing = await embed_store.aget_embedded_ids(v_ids)
+        except Exception as e:
+            logger.error(f"Failed to check existing embeddings for {len(v_ids)} vertices: {e}")
+            existing = set()
+        if existing:
+            logger.info(f"Embeddings for {len(existing)} vertices already exist, skipping to save cost")
+            keep = [i for i, v_id in enumerate(v_ids) if v_id not in existing]
+            v_ids = [v_ids[i] for i in keep]
+            contents = [contents[i] for i in keep]
+            if len(v_ids) == 0:
+                return
 
-        # if loader is running, wait until it's done
-        if not util.loading_event.is_set():
-            logger.info("Embed worker waiting for loading event to finish")
-            await util.loading_event.wait()
+    async with embed_sem:
+        logger.info(f"Embedding {len(v_ids)} vertices: {v_ids}")
         try:
-            await embed_store.aadd_embeddings([(content, [])], [{vertex_field: v_id}])
+            await embed_store.aadd_embeddings(
+                [(content, []) for content in contents],
+                [{vertex_field: v_id} for v_id in v_ids],
+            )
         except Exception as e:
-            logger.error(f"Failed to add embeddings for {v_id}: {e}")
+            # EmbeddingFailed names the ids that failed, the others were registered
+            failed = getattr(e, "failed", v_ids)
+            logger.error(f"Failed to add embeddings for {failed}: {e}")
+            embed_sem.record_error(e)
+            if embedded is not None:
+                # not embedded after all: let a later occurrence try again
+                embedded.difference_update(failed)
 
 
 async def get_vert_desc(conn, v_id, node: Node):
     desc = [node.properties.get("description", "")]
-    exists = await util.check_vertex_exists(conn, v_id)
     # if vertex exists, get description content and append this description to it
-    if not exists.get("error", False):
-        # deduplicate descriptions
-        desc.extend(exists["resp"][0]["attributes"]["description"])
-        desc = list(set(desc))
-    return desc
+    # (served from the run's description cache, so the graph is read at most once per entity)
+    await util.get_entity_desc(conn, v_id)
+    # deduplicate descriptions, keeping this node's description first
+    return list(util.cache_entity_desc(conn, v_id, desc))
 
 
-extract_sem = asyncio.Semaphore(20)
+extract_sem = stage_limiter.from_config(util.concurrency_config, "extract", 20)
 
 
 async def extract(
@@ -217,11 +255,6 @@ async def extract(
     chunk: str,
     chunk_id: str,
 ):
-    # if loader is running, wait until it's done
-    if not util.loading_event.is_set():
-        logger.info("Extract worker waiting for loading event to finish")
-        await util.loading_event.wait()
-
     async with extract_sem:
         try:
             extracted: list[GraphDocument] = await extractor.aextract(chunk)
@@ -230,8 +263,19 @@ async def extract(
             )
         except Exception as e:
             logger.error(f"Failed to extract chunk {chunk_id}: {e}")
+            extract_sem.record_error(e)
             extracted = []
 
+        if doc_processing_config.get("extract_config", {}).get("prefetch_descriptions", True):
+            # look up the descriptions of every entity in the chunk with one query
+            v_ids = []
+            for doc in extracted:
+                v_ids.extend(str(node.id) for node in doc.nodes)
+                for edge in doc.relationships:
+                    v_ids.extend([edge.source.id, edge.target.id])
+            v_ids = [v_id for v_id in map(util.process_id, v_ids) if len(v_id) > 0]
+            await util.prefetch_entity_desc(conn, v_ids)
+
         # upsert nodes and edges to the graph
         for doc in extracted:
             for i, node in enumerate(doc.nodes):
@@ -404,92 +448,105 @@ async def extract(
                 # right now, we're not embedding relationships in graphrag
 
 
-resolve_sem = asyncio.Semaphore(20)
+resolve_sem = stage_limiter.from_config(util.concurrency_config, "resolve", 20)
 
 
-async def resolve_entity(
-    conn: AsyncTigerGraphConnection,
-    upsert_chan: Channel,
+async def fetch_entity_vectors(
     embed_store: EmbeddingStore,
-    entity_id: str | Tuple[str, str],
-):
+    entity_ids: list[str | Tuple[str, str]],
+) -> Tuple[list[str], Optional[np.ndarray]]:
     """
-    get all vectors of E (one name can have multiple discriptions)
-    get ents close to E
-    for e in ents:
-        if e is 95% similar to E and edit_dist(E,e) <=3:
-            merge
-            mark e as processed
-
-    mark as processed
+    Fetch the vectors of a page of entities in one request.
+    Returns the id of each vector and the vectors as a unit-norm float32 matrix
+    (None if there are none), so the page's lists of floats can be freed right away.
     """
-
-    # if loader is running, wait until it's done
-    if not util.loading_event.is_set():
-        logger.info("Entity Resolution worker waiting for loading event to finish")
-        await util.loading_event.wait()
-
     async with resolve_sem:
         try:
-            logger.info(f"Resolving Entity {entity_id}")
-            results = await embed_store.aget_k_closest(entity_id)
-            logger.info(f"Resolving Entity {entity_id} to {results}")
-
-        except Exception:
+            vectors = await embed_store.aget_embeddings(entity_ids)
+            logger.info(f"Fetched {len(vectors)} vectors for {len(entity_ids)} entities")
+        except Exception as e:
             err = traceback.format_exc()
             logger.error(err)
-            return
+            resolve_sem.record_error(e)
+            return [], None
+    if len(vectors) == 0:
+        return [], None
+    mat = np.array([vector for _, vector in vectors], dtype=np.float32)
+    return [v_id for v_id, _ in vectors], entity_resolution.normalize(mat)
 
-        if len(results) == 0:
-            logger.error(
-                f"aget_k_closest should, minimally, return the entity itself.\n{results}"
-            )
-            raise Exception()
 
-        # merge all entities into the ResolvedEntity vertex
-        # use the longest v_id as the resolved entity's v_id
-        if isinstance(entity_id, tuple):
-          resolved_entity_id = entity_id[0]
-        else:
-          resolved_entity_id = entity_id
-        for v in results:
-            if len(v) > len(resolved_entity_id):
-                resolved_entity_id = v
+async def resolve_entity(
+    conn: AsyncTigerGraphConnection,
+    upsert_chan: Channel,
+    entity_id: str,
+    similar: set[str],
+):
+    """
+    Merge an entity and the entities found similar to it
+    (see entity_resolution.find_similar) into a ResolvedEntity
+    """
+    # merge all entities into the ResolvedEntity vertex
+    # use the longest v_id as the resolved entity's v_id
+    resolved_entity_id = entity_id
+    for v in sorted(similar):
+        if len(v) > len(resolved_entity_id):
+            resolved_entity_id = v
+
+    logger.debug(f"Merging {similar} to ResolvedEntity {resolved_entity_id}")
+    await upsert_resolved_entity(conn, upsert_chan, resolved_entity_id, [entity_id, *similar])
+
 
-        logger.debug(f"Merging {results} to ResolvedEntity {resolved_entity_id}")
-        # upsert the resolved entity
+async def upsert_resolved_entity(
+    conn: AsyncTigerGraphConnection,
+    upsert_chan: Channel,
+    resolved_entity_id: str,
+    entity_ids: Iterable[str],
+):
+    """
+    Upsert a ResolvedEntity and the RESOLVES_TO edges of the entities merged into it
+    """
+    await upsert_chan.put(
+        (
+            util.upsert_vertex,  # func to call
+            (
+                conn,
+                "ResolvedEntity",  # v_type
+                resolved_entity_id,  # v_id
+                {  # attrs
+                },
+            ),
+        )
+    )
+
+    # create RESOLVES_TO edges from each entity to the ResolvedEntity
+    for v in entity_ids:
         await upsert_chan.put(
             (
-                util.upsert_vertex,  # func to call
+                util.upsert_edge,
                 (
                     conn,
-                    "ResolvedEntity",  # v_type
-                    resolved_entity_id,  # v_id
-                    {  # attrs
-                    },
+                    "Entity",  # src_type
+                    v,  # src_id
+                    "RESOLVES_TO",  # edge_type
+                    "ResolvedEntity",  # tgt_type
+                    resolved_entity_id,  # tgt_id
+                    None,  # attributes
                 ),
             )
         )
 
-        # create RESOLVES_TO edges from each entity to the ResolvedEntity
-        for v in results:
-            await upsert_chan.put(
-                (
-                    util.upsert_edge,
-                    (
-                        conn,
-                        "Entity",  # src_type
-                        v,  # src_id
-                        "RESOLVES_TO",  # edge_type
-                        "ResolvedEntity",  # tgt_type
-                        resolved_entity_id,  # tgt_id
-                        None,  # attributes
-                    ),
-                )
-            )
+
+comm_sem = stage_limiter.from_config(util.concurrency_config, "community", 20)
+_community_summarizer = None
 
 
-comm_sem = asyncio.Semaphore(20)
+def get_community_summarizer() -> community_summarizer.CommunitySummarizer:
+    global _community_summarizer
+    if _community_summarizer is None:
+        _community_summarizer = community_summarizer.CommunitySummarizer(
+            ecc_util.get_llm_service()
+        )
+    return _community_summarizer
 
 
 async def process_community(
@@ -507,10 +564,6 @@ async def process_community(
 
     embed summaries
     """
-    # if loader is running, wait until it's done
-    if not util.loading_event.is_set():
-        logger.info("Process Community worker waiting for loading event to finish")
-        await util.loading_event.wait()
 
     async with comm_sem:
         logger.info(f"Processing Community: {comm_id}")
@@ -523,13 +576,13 @@ async def process_community(
         if len(children) == 1:
             summary = children[0]
         else:
-            llm = ecc_util.get_llm_service()
-            summarizer = community_summarizer.CommunitySummarizer(llm)
+            summarizer = get_community_summarizer()
             summary = await summarizer.summarize(comm_id, children)
             if summary["error"]:
                 summary = await summarizer.summarize(comm_id, children)
                 if summary["error"]:
                     logger.error(f"Failed to summarize community {comm_id} with message {summary['message']}")
+                    comm_sem.record_error(Exception(summary["message"]))
                 summary = "Should ignore due to summary error."
             else:
                 summary = summary["summary"]
@@ -28,7 +28,7 @@ from common.config import (
 from common.db.connections import elevate_db_connection_to_token
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.tigergraph_embedding_store import TigerGraphEmbeddingStore
-from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore, index_options
 from common.logs.logwriter import LogWriter
 from common.metrics.tg_proxy import TigerGraphConnectionProxy
 from common.py_schemas.schemas import SupportAIMethod
@@ -117,6 +117,7 @@ def initialize_eventual_consistency_checker(
                         text_field=milvus_config.get("text_field", "document_content"),
                         vertex_field=vertex_field,
                         alias=milvus_config.get("alias", "default"),
+                        **index_options(milvus_config),
                     )
 
         if doc_processing_config.get("extractor") == "llm":
@@ -177,6 +178,13 @@ def root():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/{graphname}/consistency_status/{ecc_method}")
 def consistency_status(
     graphname: str,
@@ -21,7 +21,7 @@ from common.config import (
 )
 from common.embeddings.base_embedding_store import EmbeddingStore
 from common.embeddings.tigergraph_embedding_store import TigerGraphEmbeddingStore
-from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore
+from common.embeddings.milvus_embedding_store import MilvusEmbeddingStore, index_options
 from common.extractors import GraphExtractor, LLMEntityRelationshipExtractor
 from common.extractors.BaseExtractor import BaseExtractor
 from common.logs.logwriter import LogWriter
@@ -126,6 +126,7 @@ async def init(
                     text_field=milvus_config.get("text_field", "document_content"),
                     vertex_field=vertex_field,
                     drop_old=False,
+                    **index_options(milvus_config),
                 )
 
                 LogWriter.info(f"Initializing {name}")
@@ -70,7 +70,7 @@ async def chunk_doc(
         chunker_type = doc["attributes"]["ctype"].lower().strip()
     else:
         chunker_type = ""
-    chunker = ecc_util.get_chunker(chunker_type)
+    chunker = ecc_util.get_shared_chunker(chunker_type)
     chunks = chunker.chunk(doc["attributes"]["text"])
     v_id = util.process_id(doc["v_id"])
     logger.info(f"Chunking {v_id}")
@@ -0,0 +1,191 @@
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from graphrag.entity_resolution import (
+    DisjointSet,
+    canonical_id,
+    find_pairs,
+    find_similar,
+    load_pairs,
+    resolve_components,
+    save_pairs,
+)
+
+
+def at_angle(degrees):
+    return [math.cos(math.radians(degrees)), math.sin(math.radians(degrees))]
+
+
+# cos(25 degrees): vectors up to 25 degrees apart are similar
+THRESHOLD = 0.906
+
+
+class TestFindPairs(unittest.TestCase):
+    def test_similar_names_and_vectors(self):
+        ids = ["Apple Computer", "Apple Computers", "Banana Republic"]
+        vectors = [at_angle(0), at_angle(10), at_angle(90)]
+        self.assertEqual(
+            find_pairs(ids, vectors, threshold_similarity=THRESHOLD),
+            {("Apple Computer", "Apple Computers")},
+        )
+
+    def test_name_check(self):
+        # close vectors, but the names are too far apart to be the same entity
+        ids = ["Apple", "Google", "IBM", "ibm"]
+        vectors = [at_angle(0), at_angle(1), at_angle(2), at_angle(3)]
+        self.assertEqual(find_pairs(ids, vectors, threshold_similarity=THRESHOLD), {("IBM", "ibm")})
+
+    def test_own_vectors_not_paired(self):
+        # an entity can have several vectors, one per description
+        ids = ["Apple Computer", "Apple Computer"]
+        vectors = [at_angle(0), at_angle(5)]
+        self.assertEqual(find_pairs(ids, vectors, threshold_similarity=THRESHOLD), set())
+
+    def test_chain(self):
+        # a~b and b~c, but a and c are 40 degrees apart
+        ids = ["Apple Computer", "Apple Computers", "Apple Computers."]
+        vectors = [at_angle(0), at_angle(20), at_angle(40)]
+        self.assertEqual(
+            find_pairs(ids, vectors, threshold_similarity=THRESHOLD),
+            {("Apple Computer", "Apple Computers"), ("Apple Computers", "Apple Computers.")},
+        )
+
+    def test_same_as_find_similar(self):
+        ids = [f"Entity number {i}" for i in range(12)]
+        vectors = [at_angle(i * 7) for i in range(12)]
+        similar = find_similar(ids, vectors, k=2, threshold_similarity=THRESHOLD, block_size=5)
+        pairs = find_pairs(ids, vectors, k=2, threshold_similarity=THRESHOLD, block_size=5)
+        self.assertEqual(
+            pairs,
+            {(min(a, b), max(a, b)) for a, others in similar.items() for b in others},
+        )
+        # k caps the neighbours of each entity
+        self.assertTrue(all(len(others) <= 2 for others in similar.values()))
+
+    def test_float32_matrix(self):
+        ids = ["Apple Computer", "Apple Computers", "Banana Republic"]
+        vectors = np.array([at_angle(0), at_angle(10), at_angle(90)], dtype=np.float32) * 3
+        self.assertEqual(
+            find_pairs(ids, vectors, threshold_similarity=THRESHOLD),
+            {("Apple Computer", "Apple Computers")},
+        )
+        # normalized in place instead of copied
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+
+
+class TestApproximateSearch(unittest.TestCase):
+    def clustered(self, n_topics=300, dim=32, seed=1):
+        # a few spellings of each entity close to its topic, the topics far apart
+        rng = np.random.default_rng(seed)
+        ids, vectors = [], []
+        for t in range(n_topics):
+            topic = rng.standard_normal(dim)
+            topic /= np.linalg.norm(topic)
+            for suffix in ["", "s", " Inc"][: 1 + t % 3]:
+                noise = rng.standard_normal(dim)
+                ids.append(f"Entity number {t:04d}{suffix}")
+                vectors.append(topic + 0.05 * noise / np.linalg.norm(noise))
+        return ids, np.array(vectors, dtype=np.float32)
+
+    def test_same_pairs_as_exact(self):
+        ids, vectors = self.clustered()
+        exact = find_pairs(ids, vectors.copy(), exact_limit=len(ids))
+        approx = find_pairs(ids, vectors.copy(), exact_limit=0, nlist=40, nprobe=4, block_size=64)
+        # "<name>" ~ "<name>s" for 200 of the topics (" Inc" is too far from either by name)
+        self.assertEqual(len(exact), 200)
+        self.assertEqual(approx, exact)
+
+    def test_single_probe(self):
+        # each cluster only searched against itself still finds pairs within it
+        ids, vectors = self.clustered(n_topics=60)
+        exact = find_pairs(ids, vectors.copy(), exact_limit=len(ids))
+        approx = find_pairs(ids, vectors.copy(), exact_limit=0, nlist=10, nprobe=1)
+        self.assertTrue(approx <= exact)
+        self.assertGreater(len(approx), 0.9 * len(exact))
+
+
+class TestDisjointSet(unittest.TestCase):
+    def test_transitive(self):
+        ds = DisjointSet(["a", "b", "c", "d"])
+        ds.union("a", "b")
+        ds.union("b", "c")
+        self.assertEqual(ds.find("a"), ds.find("c"))
+        self.assertNotEqual(ds.find("a"), ds.find("d"))
+        self.assertEqual(sorted(sorted(c) for c in ds.components()), [["a", "b", "c"], ["d"]])
+
+    def test_union_by_size(self):
+        ds = DisjointSet()
+        ds.union("a", "b")
+        ds.union("a", "c")
+        # the bigger set's root stays the root
+        ds.union("d", "c")
+        self.assertEqual(ds.find("d"), ds.find("a"))
+        self.assertEqual(ds.size[ds.find("a")], 4)
+
+    def test_path_compression(self):
+        ds = DisjointSet(["a", "b", "c", "d"])
+        ds.parent.update({"a": "b", "b": "c", "c": "d"})
+        self.assertEqual(ds.find("a"), "d")
+        self.assertEqual(ds.parent["a"], "d")
+        self.assertEqual(ds.parent["b"], "d")
+
+
+class TestResolveComponents(unittest.TestCase):
+    def test_chain_is_one_entity(self):
+        resolved = resolve_components(
+            ["Apple Computer", "Apple Computers", "Apple Computers.", "Banana"],
+            [("Apple Computer", "Apple Computers"), ("Apple Computers", "Apple Computers.")],
+        )
+        self.assertEqual(
+            resolved,
+            {
+                "Apple Computers.": ["Apple Computer", "Apple Computers", "Apple Computers."],
+                "Banana": ["Banana"],
+            },
+        )
+
+    def test_from_find_pairs(self):
+        ids = ["Apple Computer", "Apple Computers", "Apple Computers."]
+        pairs = find_pairs(ids, [at_angle(0), at_angle(20), at_angle(40)], threshold_similarity=THRESHOLD)
+        self.assertEqual(list(resolve_components(ids, pairs)), ["Apple Computers."])
+
+    def test_unknown_entities_ignored(self):
+        resolved = resolve_components(["a", "b"], [("a", "x"), ("x", "b")])
+        self.assertEqual(resolved, {"a": ["a"], "b": ["b"]})
+
+    def test_canonical_id(self):
+        # the longest id, ties broken alphabetically
+        self.assertEqual(canonical_id(["IBM", "IBM Corp", "I.B.M."]), "IBM Corp")
+        self.assertEqual(canonical_id(["Tiger B", "Tiger A"]), "Tiger A")
+
+
+class TestSavedPairs(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "Social_entity_pairs.json")
+
+    def test_same_entities(self):
+        save_pairs(self.path, {("b", "c"), ("a", "b")}, ["a", "b", "c", "d"])
+        # the order the entities arrive in doesn't matter
+        self.assertEqual(load_pairs(self.path, ["d", "c", "b", "a", "a"]), [("a", "b"), ("b", "c")])
+
+    def test_other_entities(self):
+        save_pairs(self.path, {("a", "b")}, ["a", "b", "c"])
+        # an entity added since the pairs were found
+        self.assertIsNone(load_pairs(self.path, ["a", "b", "c", "e"]))
+        self.assertIsNone(load_pairs(self.path, ["a", "b"]))
+
+    def test_unreadable(self):
+        self.assertIsNone(load_pairs(self.path, ["a"]))
+        with open(self.path, "w") as f:
+            f.write("[[\"a\", \"b\"]")
+        self.assertIsNone(load_pairs(self.path, ["a", "b"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, patch
+
+from graphrag import stage_limiter
+from graphrag.stage_limiter import StageLimiter, is_overload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestIsOverload(unittest.TestCase):
+    def test_overload_errors(self):
+        self.assertTrue(is_overload(TimeoutError()))
+        self.assertTrue(is_overload(Exception("Error code: 429 - Too Many Requests")))
+        self.assertTrue(is_overload(Exception("Rate limit reached for requests")))
+        self.assertTrue(is_overload(Mock(status_code=429)))
+        self.assertFalse(is_overload(ValueError("bad input")))
+
+
+class TestStageLimiter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        p = patch.object(stage_limiter, "time", self.clock)
+        p.start()
+        self.addCleanup(p.stop)
+
+    async def call(self, limiter, latency, error=None):
+        try:
+            async with limiter:
+                self.clock.now += latency
+                if error is not None:
+                    raise error
+        except Exception:
+            pass
+
+    async def test_limits_concurrency(self):
+        limiter = StageLimiter("test", 2)
+        running = []
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with limiter:
+                running.append(1)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        await asyncio.gather(*[work() for _ in range(6)])
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_shrinks_on_overload(self):
+        limiter = StageLimiter("test", 8, adaptive=True, min_limit=2)
+        limiter.record_error(TimeoutError())
+        self.assertEqual(limiter.limit, 4)
+        # errors raised inside the limiter count too
+        await self.call(limiter, 0.1, Exception("429 Too Many Requests"))
+        self.assertEqual(limiter.limit, 2)
+        limiter.record_error(TimeoutError())
+        self.assertEqual(limiter.limit, 2)
+
+    async def test_other_errors_ignored(self):
+        limiter = StageLimiter("test", 8, adaptive=True)
+        limiter.record_error(ValueError("bad input"))
+        await self.call(limiter, 0.1, KeyError("missing"))
+        self.assertEqual(limiter.limit, 8)
+
+    async def test_grows_back(self):
+        limiter = StageLimiter("test", 4, adaptive=True, max_limit=6, window=5)
+        limiter.record_error(TimeoutError())
+        self.assertEqual(limiter.limit, 2)
+
+        for expected in [3, 4, 5, 6, 6]:
+            for _ in range(5):
+                await self.call(limiter, 0.1)
+            self.assertEqual(limiter.limit, expected)
+
+    async def test_shrinks_when_slower(self):
+        limiter = StageLimiter("test", 4, adaptive=True, window=5)
+        for _ in range(5):
+            await self.call(limiter, 0.1)
+        self.assertEqual(limiter.limit, 5)
+        # p95 past tolerance * the best p95 seen
+        for _ in range(5):
+            await self.call(limiter, 0.2)
+        self.assertEqual(limiter.limit, 2)
+
+    async def test_not_adaptive(self):
+        limiter = StageLimiter("test", 4)
+        limiter.record_error(TimeoutError())
+        for _ in range(40):
+            await self.call(limiter, 0.1)
+        self.assertEqual(limiter.limit, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
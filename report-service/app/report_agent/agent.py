@@ -1,3 +1,4 @@
+from common.db.schema_cache import get_schema
 from common.metrics.tg_proxy import TigerGraphConnectionProxy
 from common.llm_services.base_llm import LLM_Model
 from common.py_schemas.tool_io_schemas import ReportSections, ReportSection
@@ -20,34 +21,7 @@ class TigerGraphReportAgent:
         self.llm = llm_provider
 
     def _get_schema(self):
-        verts = self.conn.getVertexTypes()
-        edges = self.conn.getEdgeTypes()
-        vertex_schema = []
-        for vert in verts:
-            primary_id = self.conn.getVertexType(vert)["PrimaryId"]["AttributeName"]
-            attributes = "\n\t\t".join([attr["AttributeName"] + " of type " + attr["AttributeType"]["Name"] for attr in self.conn.getVertexType(vert)["Attributes"]])
-            if attributes == "":
-                attributes = "No attributes"
-            vertex_schema.append(f"{vert}\n\tPrimary Id Attribute: {primary_id}\n\tAttributes: \n\t\t{attributes}")
-
-        edge_schema = []
-        for edge in edges:
-            from_vertex = self.conn.getEdgeType(edge)["FromVertexTypeName"]
-            to_vertex = self.conn.getEdgeType(edge)["ToVertexTypeName"]
-            #reverse_edge = conn.getEdgeType(edge)["Config"].get("REVERSE_EDGE")
-            attributes = "\n\t\t".join([attr["AttributeName"] + " of type " + attr["AttributeType"]["Name"] for attr in self.conn.getVertexType(vert)["Attributes"]])
-            if attributes == "":
-                attributes = "No attributes"
-            edge_schema.append(f"{edge}\n\tFrom Vertex: {from_vertex}\n\tTo Vertex: {to_vertex}\n\tAttributes: \n\t\t{attributes}") #\n\tReverse Edge: \n\t\t{reverse_edge}")
-
-        schema_rep = f"""The schema of the graph is as follows:
-        Vertex Types:
-        {chr(10).join(vertex_schema)}
-
-        Edge Types:
-        {chr(10).join(edge_schema)}
-        """
-        return schema_rep
+        return get_schema(self.conn).schema_rep
 
     def generate_sections(self,
                           persona: str,